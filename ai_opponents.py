@@ -0,0 +1,219 @@
+import math
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+import pygame
+
+from asset_manager import AssetManager
+from batch_simulation import BatchSimulation
+from car import Car
+import constants
+from track import TrackCollision
+from track_distance import TrackDistanceField
+from track_progress import RACING_LINE_CORRIDOR_STEP, TrackProgress
+
+
+STEERING_DEADBAND: float = 1.5  # Degrees either side of the target heading the driver doesn't bother steering for
+WALL_PROBE_STEPS: float = 20.0  # Physics steps ahead at the car's current speed to check for walls
+WALL_MARGIN: float = 40.0  # Pixels from a wall at which the driver starts steering away from it
+WALL_STEERING: float = 1.5  # How strongly a wall pushes the target heading, against 1 for the racing line
+BRAKE_MARGIN: float = 0.5  # Pixels per step above the target speed before the driver brakes rather than coasting
+
+
+def get_grid_poses(track: TrackCollision, progress: TrackProgress, num_cars: int) -> npt.NDArray[np.float64]:
+    """Returns the (x, y, angle) of each slot of a starting grid lined up along the centerline behind the start line,
+    two cars to a row either side of the middle"""
+    start_distance: float = progress.get_lap_distance(constants.START_X[track.name], constants.START_Y[track.name])
+    if math.isnan(start_distance):
+        start_distance = 0.0
+    poses: npt.NDArray[np.float64] = np.empty((num_cars, 3), dtype=np.float64)
+    for i in range(num_cars):
+        distance: float = start_distance - (i // 2 + 1) * constants.AI_GRID_ROW_SPACING
+        x, y = progress.get_centerline_point(distance)
+        angle: float = progress.get_centerline_angle(distance)
+        # To the right of the direction of travel for odd slots, to the left for even ones
+        side: float = constants.AI_GRID_COLUMN_OFFSET if i % 2 else -constants.AI_GRID_COLUMN_OFFSET
+        poses[i] = (x + math.cos(math.radians(angle)) * side, y + math.sin(math.radians(angle)) * side, angle)
+    return poses
+
+
+class AIDriver:
+    """Works out the inputs for a batch of cars in one vectorized step, steering each towards a point on the racing
+    line a little way ahead of it (pure pursuit) and away from any wall it is heading for"""
+
+    def __init__(self, simulation: BatchSimulation, progress: TrackProgress, distances: TrackDistanceField,
+                 racing_line: npt.NDArray[np.float64], tier: dict[str, float],
+                 lane_offsets: npt.NDArray[np.float64]) -> None:
+        self.simulation: BatchSimulation = simulation
+        self.progress: TrackProgress = progress
+        self.distances: TrackDistanceField = distances
+        num_cars: int = simulation.num_cars
+
+        # The racing line's points, the normal to the right of each, and the lap distance each is alongside
+        self.racing_line: npt.NDArray[np.float64] = racing_line[:, :2]
+        direction: npt.NDArray[np.float64] = (np.roll(self.racing_line, -1, axis=0)
+                                              - np.roll(self.racing_line, 1, axis=0))
+        heading: npt.NDArray[np.float64] = np.arctan2(direction[:, 0], -direction[:, 1])
+        self.racing_line_normal: npt.NDArray[np.float64] = np.stack([np.cos(heading), np.sin(heading)], axis=1)
+        self.line_distance: npt.NDArray[np.float64] = racing_line[:, 2]
+        self.lookahead_points: int = max(1, round(tier["lookahead"] / progress.cell_size))
+
+        # How far to either side of each point of the line a car can keep to its lane, before the lane would run closer
+        # to a wall than the line itself is allowed to; lanes close up over the stretch before such a point
+        self.lane_offsets: npt.NDArray[np.float64] = lane_offsets
+        lane_steps: npt.NDArray[np.float64] = np.arange(0.0, np.abs(lane_offsets).max(initial=0.0)
+                                                        + RACING_LINE_CORRIDOR_STEP, RACING_LINE_CORRIDOR_STEP)
+        self.lane_room: list[npt.NDArray[np.float64]] = []
+        for side in (-1.0, 1.0):
+            lane_x = self.racing_line[:, 0, None] + self.racing_line_normal[:, 0, None] * side * lane_steps
+            lane_y = self.racing_line[:, 1, None] + self.racing_line_normal[:, 1, None] * side * lane_steps
+            is_clear = np.logical_and.accumulate(
+                distances.get_wall_distance_array(lane_x, lane_y) >= constants.AI_WALL_CLEARANCE, axis=1)
+            room: npt.NDArray[np.float64] = lane_steps[np.maximum(is_clear.sum(axis=1) - 1, 0)]
+            for offset in range(1, self.lookahead_points + 1):
+                room = np.minimum(room, np.roll(room, -offset))
+            self.lane_room.append(room)
+
+        # Each car down the grid aims a little slower than the one in front, so the field spreads out
+        grid_position: npt.NDArray[np.float64] = np.arange(num_cars) / max(num_cars - 1, 1)
+        self.top_speed: npt.NDArray[np.float64] = (simulation.stats["base_max_speed"] * tier["top_speed"]
+                                                   * (1 - constants.AI_TOP_SPEED_SPREAD * grid_position))
+
+    def get_input_bits(self) -> npt.NDArray[np.uint8]:
+        """Returns one bitmask of constants.INPUT_* flags for each car in the batch, for its next physics step"""
+        cars: npt.NDArray = self.simulation.cars
+        x = cars["x"]
+        y = cars["y"]
+        speed = cars["speed"]
+        car_radians = np.radians(cars["car_angle"])
+        num_points: int = self.racing_line.shape[0]
+
+        lap_distance = np.nan_to_num(self.progress.get_lap_distance_array(x, y))
+        index = np.searchsorted(self.line_distance, lap_distance) % num_points
+
+        # Aim for the car's lane of the racing line a little way ahead
+        target_index = (index + self.lookahead_points) % num_points
+        room = np.where(self.lane_offsets > 0, self.lane_room[1][target_index], self.lane_room[0][target_index])
+        lane = np.copysign(np.minimum(np.abs(self.lane_offsets), room), self.lane_offsets)
+        target = self.racing_line[target_index] + self.racing_line_normal[target_index] * lane[:, None]
+        aim_x = target[:, 0] - x
+        aim_y = target[:, 1] - y
+        aim_length = np.maximum(np.hypot(aim_x, aim_y), 1e-9)
+
+        # Pushed back away from any wall the car is heading for
+        probe_distance = np.abs(speed) * WALL_PROBE_STEPS
+        probe_x = x + np.sin(car_radians) * probe_distance
+        probe_y = y - np.cos(car_radians) * probe_distance
+        wall_distance = self.distances.get_wall_distance_array(probe_x, probe_y)
+        wall_x, wall_y = self.distances.get_wall_gradient_array(probe_x, probe_y)
+        push = np.minimum(np.maximum((WALL_MARGIN - wall_distance) / WALL_MARGIN, 0.0), 1.0) * WALL_STEERING
+        aim_x = aim_x / aim_length + wall_x * push
+        aim_y = aim_y / aim_length + wall_y * push
+
+        # Car angles are clockwise from straight up (see CarPhysics.update_position)
+        heading_error = (np.degrees(np.arctan2(aim_x, -aim_y)) - cars["car_angle"] + 180) % 360 - 180
+        input_bits = np.where(heading_error > STEERING_DEADBAND, constants.INPUT_RIGHT,
+                              np.where(heading_error < -STEERING_DEADBAND, constants.INPUT_LEFT, 0))
+
+        # Cars turn on the same circle at any speed, so there's nothing to gain by slowing for corners
+        input_bits |= np.where(speed < self.top_speed, constants.INPUT_FORWARD,
+                               np.where(speed > self.top_speed + BRAKE_MARGIN, constants.INPUT_BACKWARD, 0))
+        return input_bits.astype(np.uint8)
+
+
+def load_track_fields(track: TrackCollision) -> tuple[TrackProgress, TrackDistanceField]:
+    """Returns the track's progress field (with its racing line) and distance fields, which the AI drives by"""
+    distances: TrackDistanceField = TrackDistanceField.load(track)
+    return TrackProgress.load(track, distances), distances
+
+
+def create_race(track: TrackCollision, progress: TrackProgress, distances: TrackDistanceField, difficulty: str,
+                car_configs: list[dict]) -> tuple[BatchSimulation, AIDriver]:
+    """Returns a batch of AI cars lined up on the starting grid and the driver for them, racing at a difficulty tier"""
+    num_cars: int = len(car_configs)
+    simulation: BatchSimulation = BatchSimulation(track, car_configs, constants.NUM_LAPS[track.name],
+                                                  get_grid_poses(track, progress, num_cars))
+    # Each car keeps to the side of the racing line it started on
+    lane_offsets: npt.NDArray[np.float64] = np.where(np.arange(num_cars) % 2 == 1, constants.AI_GRID_COLUMN_OFFSET,
+                                                     -constants.AI_GRID_COLUMN_OFFSET)
+    driver: AIDriver = AIDriver(simulation, progress, distances, progress.racing_line,
+                                constants.AI_DIFFICULTY_TIERS[difficulty], lane_offsets)
+    return simulation, driver
+
+
+class AIOpponents:
+    """The AI cars racing against the player: their physics stepped as one batch, the driver steering all of them, and
+    a Car for drawing each"""
+
+    def __init__(self, screen: pygame.Surface, track: TrackCollision, difficulty: str, player_style_index: int,
+                 num_cars: int = constants.NUM_AI_OPPONENTS, assets: Optional[AssetManager] = None) -> None:
+        if assets is not None:
+            progress, distances = assets.get(("ai_track_fields", track.name), lambda: load_track_fields(track))
+        else:
+            progress, distances = load_track_fields(track)
+
+        # The same cars the player can pick, in every style but the player's (where there are others)
+        car_configs: list[dict] = [constants.CAR_DEFINITIONS[i % len(constants.CAR_DEFINITIONS)]
+                                   for i in range(num_cars)]
+        style_indices: list[int] = [(player_style_index + 1 + i % max(len(config["styles"]) - 1, 1))
+                                    % len(config["styles"]) for i, config in enumerate(car_configs)]
+
+        self.simulation, self.driver = create_race(track, progress, distances, difficulty, car_configs)
+        self.cars: list[Car] = [Car(screen, track.name, False, config, style_index, {}, assets)
+                                for config, style_index in zip(car_configs, style_indices)]
+
+    @staticmethod
+    def preload(track_name: str, assets: AssetManager) -> None:
+        """Starts loading the fields the AI drives by in the background, ready for when the race is created"""
+        assets.preload(("ai_track_fields", track_name), lambda: load_track_fields(TrackCollision(track_name)),
+                       group=track_name)
+
+    def start_race(self) -> None:
+        """Lets the AI cars drive (called when the countdown reaches "Go!")"""
+        self.simulation.start_race()
+
+    def step(self) -> None:
+        """Advances every AI car by one physics step"""
+        self.simulation.step(self.driver.get_input_bits())
+
+    def draw(self, camera_x: float, camera_y: float, alpha: float) -> None:
+        """Draws every AI car, interpolated alpha of the way from the previous physics step"""
+        cars: npt.NDArray = self.simulation.cars
+        for car, (x, y, car_angle, prev_x, prev_y, prev_car_angle) in zip(
+                self.cars, zip(cars["x"].tolist(), cars["y"].tolist(), cars["car_angle"].tolist(),
+                               cars["prev_x"].tolist(), cars["prev_y"].tolist(), cars["prev_car_angle"].tolist())):
+            car.x, car.y, car.car_angle = x, y, car_angle
+            car.prev_x, car.prev_y, car.prev_car_angle = prev_x, prev_y, prev_car_angle
+            car.draw(camera_x, camera_y, alpha)
+
+
+def benchmark(track_name: str, difficulty: str, num_cars: int) -> None:
+    """Races a grid of AI cars without a display, printing their finish times and the cost of each physics step"""
+    track: TrackCollision = TrackCollision(track_name)
+    progress, distances = load_track_fields(track)
+    car_configs: list[dict] = [constants.CAR_DEFINITIONS[i % len(constants.CAR_DEFINITIONS)] for i in range(num_cars)]
+    simulation, driver = create_race(track, progress, distances, difficulty, car_configs)
+
+    simulation.start_race()
+    max_steps: int = constants.PHYSICS_FPS * 60 * constants.NUM_LAPS[track_name]
+    start: float = time.perf_counter()
+    steps: int = 0
+    while steps < max_steps and not simulation.cars["is_finished"].all():
+        simulation.step(driver.get_input_bits())
+        steps += 1
+    elapsed: float = time.perf_counter() - start
+    finish_times: npt.NDArray[np.float64] = np.where(simulation.cars["is_finished"], simulation.get_elapsed_times(),
+                                                     np.inf)
+    print(f"{track_name:<20} {difficulty:<7} {num_cars:3d} cars  finished {int(np.isfinite(finish_times).sum()):3d}  "
+          f"best {finish_times.min():7.2f} s  worst {finish_times.max():7.2f} s  "
+          f"{elapsed / steps * 1000:6.3f} ms/step")
+
+
+if __name__ == "__main__":
+    track_names: list[str] = sys.argv[1:] or constants.TRACK_NAMES
+    for name in track_names:
+        for tier_name in constants.AI_DIFFICULTY_TIERS:
+            benchmark(name, tier_name, constants.NUM_AI_OPPONENTS)
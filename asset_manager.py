@@ -0,0 +1,190 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import math
+import time
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+import numpy as np
+import pygame
+
+import constants
+
+T = TypeVar("T")
+
+PRELOAD_SCALE_BAND_ROWS: int = 128  # Destination rows scaled at a time while preloading an image
+
+
+def _scale_in_bands(image: pygame.Surface, size: tuple[int, int]) -> pygame.Surface:
+    """Scales like pygame.transform.scale, but a band of rows at a time, letting other threads run in between
+
+    A single large scale (and allocating its zeroed result) holds the GIL for tens of milliseconds, which would stall
+    the menus while a track preloads. The result is written into a surface backed by an uninitialised NumPy buffer."""
+    width, height = size
+    source_width, source_height = image.get_size()
+    if image.get_bytesize() not in (3, 4):
+        return pygame.transform.scale(image, size)
+    buffer: np.ndarray = np.empty((height, width, image.get_bytesize()), dtype=np.uint8)
+    scaled: pygame.Surface = pygame.image.frombuffer(buffer, size, "RGB" if image.get_bytesize() == 3 else "RGBA")
+    if scaled.get_masks() != image.get_masks():
+        return pygame.transform.scale(image, size)
+
+    # Bands start on rows where the source and destination grids line up, so the result matches a single scale
+    common_factor: int = math.gcd(source_height, height)
+    band_rows: int = max(1, PRELOAD_SCALE_BAND_ROWS // (height // common_factor)) * (source_height // common_factor)
+    for source_y in range(0, source_height, band_rows):
+        rows: int = min(band_rows, source_height - source_y)
+        band: pygame.Rect = pygame.Rect(0, source_y * height // source_height, width, rows * height // source_height)
+        pygame.transform.scale(image.subsurface((0, source_y, source_width, rows)), band.size, scaled.subsurface(band))
+        time.sleep(0)  # Yield the GIL
+    return scaled
+
+
+class AssetManager:
+    """Loads images, fonts, sounds and derived track data once per session and shares them between screens and
+    races, evicting the least recently used assets when their estimated size goes over the memory budget"""
+
+    def __init__(self, memory_budget_bytes: int = constants.ASSET_MEMORY_BUDGET_MB * 1024 * 1024) -> None:
+        self.memory_budget_bytes: int = memory_budget_bytes
+        self.memory_used_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self._assets: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+
+        # Assets being loaded in the background, with the step (if any) that has to finish them on the main thread and
+        # the group (if any) they were preloaded for. The size of each one that has finished loading but hasn't been
+        # picked up yet is counted against the budget too
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asset-preload")
+        self._pending: dict[Hashable, tuple[Future, Optional[Callable[[Any], Any]], Optional[Hashable]]] = {}
+        self._pending_sizes: dict[Hashable, int] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], T]) -> T:
+        """Returns the asset cached under key, calling loader to create it if it isn't cached
+
+        If the asset is being preloaded, waits for the background load instead of starting another"""
+        if key in self._assets:
+            self._assets.move_to_end(key)
+            self.hits += 1
+            return self._assets[key][0]
+
+        if key in self._pending:
+            future, finish, _ = self._pending.pop(key)
+            self.memory_used_bytes -= self._pending_sizes.pop(key, 0)
+            self.hits += 1
+            asset: T = future.result()
+            if finish is not None:
+                asset = finish(asset)
+        else:
+            self.misses += 1
+            asset = loader()
+        size: int = self._estimate_size(asset)
+        self._assets[key] = (asset, size)
+        self.memory_used_bytes += size
+        self._evict()
+        return asset
+
+    def preload(self, key: Hashable, loader: Callable[[], Any], finish: Optional[Callable[[Any], Any]] = None,
+                group: Optional[Hashable] = None) -> None:
+        """Starts loading an asset on the background thread so a later get() for the same key doesn't have to
+
+        finish runs on the main thread when the asset is picked up, for work that can't happen on another thread.
+        Preloads in a group can be dropped together with cancel_preloads() if they turn out not to be needed."""
+        self._count_finished_preloads()
+        if key not in self._assets and key not in self._pending:
+            self._pending[key] = (self._executor.submit(loader), finish, group)
+
+    def cancel_preloads(self, group: Hashable) -> None:
+        """Drops the preloads in a group that haven't been picked up, stopping any that haven't started yet"""
+        for key in [key for key, (_, _, pending_group) in self._pending.items() if pending_group == group]:
+            future, _, _ = self._pending.pop(key)
+            future.cancel()  # A load that is already running can't be stopped, but its result is thrown away
+            self.memory_used_bytes -= self._pending_sizes.pop(key, 0)
+
+    def load_image(self, image_path: str, is_alpha: bool, width: Optional[int] = None,
+                   height: Optional[int] = None) -> pygame.Surface:
+        """Loads an image converted to the display format, scaled to (width, height) if given
+
+        The surface is shared, so callers must not draw onto it or change its alpha"""
+
+        def loader() -> pygame.Surface:
+            image: pygame.Surface = pygame.image.load(image_path)
+            image = image.convert_alpha() if is_alpha else image.convert()
+            if width is not None and height is not None:
+                image = pygame.transform.scale(image, (width, height))
+            return image
+
+        return self.get(("image", image_path, is_alpha, width, height), loader)
+
+    def preload_image(self, image_path: str, is_alpha: bool, width: Optional[int] = None,
+                      height: Optional[int] = None, group: Optional[Hashable] = None) -> None:
+        """Decodes and scales an image in the background for a later load_image() with the same arguments"""
+
+        def loader() -> pygame.Surface:
+            image: pygame.Surface = pygame.image.load(image_path)
+            if width is not None and height is not None:
+                image = _scale_in_bands(image, (width, height))
+            return image
+
+        def finish(image: pygame.Surface) -> pygame.Surface:
+            # Converting needs the display, so it is left for the main thread
+            return image.convert_alpha() if is_alpha else image.convert()
+
+        self.preload(("image", image_path, is_alpha, width, height), loader, finish, group)
+
+    def load_font(self, font_path: str, size: int, bold: bool = False) -> pygame.font.Font:
+        """Loads a font at the given size (fonts that differ in style are cached separately)"""
+
+        def loader() -> pygame.font.Font:
+            font: pygame.font.Font = pygame.font.Font(font_path, size)
+            font.set_bold(bold)
+            return font
+
+        return self.get(("font", font_path, size, bold), loader)
+
+    def load_sound(self, sound_path: str) -> pygame.mixer.Sound:
+        """Loads a sound effect (its volume is shared by everything that plays it)"""
+        return self.get(("sound", sound_path), lambda: pygame.mixer.Sound(sound_path))
+
+    def clear(self) -> None:
+        """Drops every cached asset and any preloads that haven't been picked up"""
+        for future, _, _ in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._pending_sizes.clear()
+        self._assets.clear()
+        self.memory_used_bytes = 0
+
+    def _count_finished_preloads(self) -> None:
+        """Counts the size of each preload that has finished loading since the last check against the budget"""
+        for key, (future, _, _) in self._pending.items():
+            if key in self._pending_sizes or not future.done() or future.cancelled() or future.exception() is not None:
+                continue
+            self._pending_sizes[key] = self._estimate_size(future.result())
+            self.memory_used_bytes += self._pending_sizes[key]
+
+    def _evict(self) -> None:
+        """Drops the least recently used assets until the cache (and any finished preloads waiting to be picked up) fits
+        in the budget, always keeping the newest"""
+        self._count_finished_preloads()
+        while self.memory_used_bytes > self.memory_budget_bytes and len(self._assets) > 1:
+            _, (_, size) = self._assets.popitem(last=False)
+            self.memory_used_bytes -= size
+
+    @classmethod
+    def _estimate_size(cls, asset: Any) -> int:
+        """Estimates the memory an asset holds, in bytes"""
+        if isinstance(asset, pygame.Surface):
+            return asset.get_pitch() * asset.get_height()
+        if isinstance(asset, np.ndarray):
+            return asset.nbytes
+        if isinstance(asset, pygame.mixer.Sound):
+            mixer_settings: Optional[tuple[int, int, int]] = pygame.mixer.get_init()
+            if mixer_settings is None:
+                return 0
+            frequency, sample_format, channels = mixer_settings
+            return int(asset.get_length() * frequency * channels * (abs(sample_format) // 8))
+        if isinstance(asset, (list, tuple)):
+            return sum(cls._estimate_size(item) for item in asset)
+        if hasattr(asset, "__dict__"):
+            # Derived track data, such as the fields the AI drives by, is held in NumPy arrays
+            return sum(cls._estimate_size(value) for value in vars(asset).values() if isinstance(value, np.ndarray))
+        return 0
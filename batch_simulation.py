@@ -0,0 +1,244 @@
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+import constants
+from track import LapGate, TrackCollision
+
+
+# One record per simulated car. Mirrors the attributes of car.CarPhysics and simulation.LapTracker.
+CAR_STATE_DTYPE: np.dtype = np.dtype([
+    ("x", np.float64),
+    ("y", np.float64),
+    ("car_angle", np.float64),
+    ("move_angle", np.float64),
+    ("speed", np.float64),
+    ("max_speed", np.float64),
+    ("prev_x", np.float64),
+    ("prev_y", np.float64),
+    ("prev_car_angle", np.float64),
+    ("respawn_x", np.float64),
+    ("respawn_y", np.float64),
+    ("respawn_angle", np.float64),
+    ("step_count", np.int32),
+    ("finish_time", np.float64),
+    ("current_lap", np.int16),
+    ("next_sector", np.int16),
+    ("is_off_road", np.bool_),
+    ("is_drifting", np.bool_),
+    ("is_race_active", np.bool_),
+    ("is_finished", np.bool_),
+])
+
+# Per-car constants derived from the car's stats, kept apart from the state so a reset doesn't touch them
+CAR_STATS_DTYPE: np.dtype = np.dtype([
+    ("base_max_speed", np.float64),
+    ("acceleration", np.float64),
+    ("turn_speed", np.float64),
+])
+
+
+class BatchSimulation:
+    """Steps many cars around the same track at once, matching car.CarPhysics and simulation.RaceSimulation"""
+
+    def __init__(self, track: TrackCollision, car_configs: list[dict], num_laps: int,
+                 start_poses: Optional[npt.NDArray[np.float64]] = None) -> None:
+        self.track: TrackCollision = track
+        self.num_laps: int = num_laps
+        self.num_cars: int = len(car_configs)
+
+        self.stats: npt.NDArray = np.zeros(self.num_cars, dtype=CAR_STATS_DTYPE)
+        for i, car_config in enumerate(car_configs):
+            stats = car_config["stats"]
+            self.stats[i] = (constants.BASE_MAX_SPEED + (stats["Speed"] * constants.SPEED_STAT_MULTIPLIER),
+                             constants.BASE_ACCELERATION + (stats["Acceleration"] * constants.ACCEL_STAT_MULTIPLIER),
+                             constants.BASE_TURN_SPEED + (stats["Handling"] * constants.HANDLING_STAT_MULTIPLIER))
+
+        self.start_x: float = constants.START_X[track.name]
+        self.start_y: float = constants.START_Y[track.name]
+        self.start_angle: float = constants.START_ROTATION[track.name]
+        # The (x, y, angle) each car lines up at, the start line by default (respawning after crossing the finish line
+        # still goes back to the start line)
+        if start_poses is None:
+            start_poses = np.tile((self.start_x, self.start_y, self.start_angle), (self.num_cars, 1))
+        self.start_poses: npt.NDArray[np.float64] = np.asarray(start_poses, dtype=np.float64)
+
+        # The gate ending each sector and the respawn point it sets, as arrays indexed by each car's next_sector
+        gates: list[LapGate] = track.sector_gates
+        self.finish_sector: int = len(gates) - 1
+        self.gate_start: npt.NDArray[np.float64] = np.array([gate.start for gate in gates], dtype=np.float64)
+        self.gate_normal: npt.NDArray[np.float64] = np.array([gate.normal for gate in gates], dtype=np.float64)
+        self.gate_tangent: npt.NDArray[np.float64] = np.array([gate.tangent for gate in gates], dtype=np.float64)
+        self.gate_length: npt.NDArray[np.float64] = np.array([gate.length for gate in gates], dtype=np.float64)
+        self.sector_respawn: npt.NDArray[np.float64] = np.array(
+            [(x, y, angle) for (x, y), angle in
+             zip(track.checkpoint_respawn_points, constants.CHECKPOINT_ANGLES[track.name])]
+            + [(self.start_x, self.start_y, self.start_angle)], dtype=np.float64)
+
+        self.cars: npt.NDArray = np.zeros(self.num_cars, dtype=CAR_STATE_DTYPE)
+        self.reset()
+
+    def reset(self) -> None:
+        """Puts every car back on its start point with the race not yet started"""
+        cars: npt.NDArray = self.cars
+        cars[:] = 0
+        for field in ("x", "prev_x", "respawn_x"):
+            cars[field] = self.start_poses[:, 0]
+        for field in ("y", "prev_y", "respawn_y"):
+            cars[field] = self.start_poses[:, 1]
+        for field in ("car_angle", "move_angle", "prev_car_angle", "respawn_angle"):
+            cars[field] = self.start_poses[:, 2]
+        cars["max_speed"] = self.stats["base_max_speed"]
+        cars["current_lap"] = 1
+
+    def start_race(self) -> None:
+        """Lets every car that hasn't finished respond to input"""
+        self.cars["is_race_active"] = ~self.cars["is_finished"]
+
+    def step(self, input_bits: npt.NDArray[np.uint8]) -> None:
+        """Advances every car by one physics step, given one bitmask of constants.INPUT_* flags per car"""
+        cars: npt.NDArray = self.cars
+        base_max_speed: npt.NDArray[np.float64] = self.stats["base_max_speed"]
+        acceleration: npt.NDArray[np.float64] = self.stats["acceleration"]
+        x = cars["x"]
+        y = cars["y"]
+        speed = cars["speed"]
+        car_angle = cars["car_angle"]
+        move_angle = cars["move_angle"]
+        active = cars["is_race_active"]
+
+        cars["prev_x"] = x
+        cars["prev_y"] = y
+        cars["prev_car_angle"] = car_angle
+
+        # Set the max speed from the terrain under each car (CarPhysics.set_max_speed)
+        is_off_road = (self.track.get_terrain_array(x, y) & constants.TERRAIN_OFF_ROAD) != 0
+        cars["is_off_road"] = is_off_road
+        max_speed = np.where(is_off_road, np.maximum(speed - acceleration, base_max_speed * 0.5),
+                             np.where(cars["is_drifting"], np.minimum(base_max_speed * 2, base_max_speed * 1.1),
+                                      base_max_speed))
+        cars["max_speed"] = max_speed
+
+        # Apply input (CarPhysics.apply_input). Inactive cars behave as if no keys are held and keep their drift flag.
+        input_bits = np.where(active, input_bits, 0)
+        forward = (input_bits & constants.INPUT_FORWARD) != 0
+        backward = (input_bits & constants.INPUT_BACKWARD) != 0
+        coasting_speed = np.copysign(np.maximum(np.abs(speed) - constants.FRICTION, 0), speed)
+        speed = np.where(forward, speed + acceleration, np.where(backward, speed - acceleration, coasting_speed))
+
+        turn_factor = self.stats["turn_speed"] * (speed / base_max_speed)
+        car_angle = (car_angle - np.where(input_bits & constants.INPUT_LEFT, turn_factor, 0.0)
+                     + np.where(input_bits & constants.INPUT_RIGHT, turn_factor, 0.0))
+
+        error = car_angle - move_angle
+        abs_error = np.abs(error)
+        cars["is_drifting"] = np.where(active, abs_error > constants.MIN_DRIFT_ANGLE, cars["is_drifting"])
+        delta_angle = np.where(active & (abs_error > constants.MAX_DRIFT_ANGLE), abs_error - constants.MAX_DRIFT_ANGLE,
+                               np.where(input_bits & constants.INPUT_DRIFT, constants.DRIFT_RECOVERY_SPEED,
+                                        2 * constants.DRIFT_RECOVERY_SPEED))
+        move_angle = move_angle + np.copysign(delta_angle, error)
+
+        # Clamp the speed and move (CarPhysics.update_position)
+        speed = np.clip(speed, -max_speed / 2.0, max_speed)
+        move_radians = np.radians(move_angle)
+        x = x + np.sin(move_radians) * speed
+        y = y - np.cos(move_radians) * speed
+
+        cars["speed"] = speed
+        cars["car_angle"] = car_angle
+        cars["move_angle"] = move_angle
+        cars["x"] = x
+        cars["y"] = y
+
+        if not active.any():
+            return
+        cars["step_count"] += active
+
+        # Respawn cars that left the map (RaceSimulation.step)
+        respawned = active & ((self.track.get_terrain_array(x, y) & constants.TERRAIN_OUT_OF_BOUNDS) != 0)
+        if respawned.any():
+            cars["x"][respawned] = cars["respawn_x"][respawned]
+            cars["y"][respawned] = cars["respawn_y"][respawned]
+            cars["speed"][respawned] = 0.0
+            cars["car_angle"][respawned] = cars["respawn_angle"][respawned]
+            cars["move_angle"][respawned] = cars["respawn_angle"][respawned]
+            cars["prev_x"][respawned] = cars["respawn_x"][respawned]
+            cars["prev_y"][respawned] = cars["respawn_y"][respawned]
+            cars["prev_car_angle"][respawned] = cars["respawn_angle"][respawned]
+
+        self._update_laps(active)
+
+    def _update_laps(self, active: npt.NDArray[np.bool_]) -> None:
+        """Checks every active car's move against the gate ending its current sector (LapTracker.update)"""
+        cars: npt.NDArray = self.cars
+        x0 = cars["prev_x"]
+        y0 = cars["prev_y"]
+        x1 = cars["x"]
+        y1 = cars["y"]
+
+        # Each car only checks the gate ending its current sector, so one gate is tested per car whatever the number of
+        # sectors (LapGate.get_crossing_fraction_array with every car's own gate)
+        sector = cars["next_sector"]
+        start = self.gate_start[sector]
+        normal = self.gate_normal[sector]
+        tangent = self.gate_tangent[sector]
+        distance_before = (x0 - start[:, 0]) * normal[:, 0] + (y0 - start[:, 1]) * normal[:, 1]
+        distance_after = (x1 - start[:, 0]) * normal[:, 0] + (y1 - start[:, 1]) * normal[:, 1]
+        crossed = active & (distance_before < 0) & (distance_after >= 0)
+        if not crossed.any():
+            return
+        crossing_fraction = distance_before / np.where(crossed, distance_before - distance_after, 1.0)
+        along = ((x0 + (x1 - x0) * crossing_fraction - start[:, 0]) * tangent[:, 0]
+                 + (y0 + (y1 - y0) * crossing_fraction - start[:, 1]) * tangent[:, 1])
+        crossed &= (along >= 0) & (along < self.gate_length[sector])
+        if not crossed.any():
+            return
+
+        respawn = self.sector_respawn[sector[crossed]]
+        cars["respawn_x"][crossed] = respawn[:, 0]
+        cars["respawn_y"][crossed] = respawn[:, 1]
+        cars["respawn_angle"][crossed] = respawn[:, 2]
+
+        crossed_finish = crossed & (sector == self.finish_sector)
+        cars["next_sector"] += crossed
+        cars["next_sector"][crossed_finish] = 0
+        cars["current_lap"] += crossed_finish
+
+        finished = crossed_finish & (cars["current_lap"] > self.num_laps)
+        cars["is_finished"] |= finished
+        cars["is_race_active"] &= ~finished
+        cars["finish_time"][finished] = ((cars["step_count"][finished] - 1) / constants.PHYSICS_FPS
+                                         + crossing_fraction[finished] / constants.PHYSICS_FPS)
+
+    def get_elapsed_times(self) -> npt.NDArray[np.float64]:
+        """Returns each car's race time in seconds for the steps simulated so far, or the time it crossed the finish
+        line once it has finished"""
+        return np.where(self.cars["is_finished"], self.cars["finish_time"],
+                        self.cars["step_count"] / constants.PHYSICS_FPS)
+
+
+def benchmark(track_name: str, num_cars: int, num_steps: int) -> None:
+    """Times a batch of cars weaving down a track, printing the number of car steps simulated per second"""
+    track: TrackCollision = TrackCollision(track_name)
+    car_configs: list[dict] = [constants.CAR_DEFINITIONS[i % len(constants.CAR_DEFINITIONS)] for i in range(num_cars)]
+    simulation: BatchSimulation = BatchSimulation(track, car_configs, constants.NUM_LAPS[track_name])
+
+    # Stagger each car's weave so the batch spreads across the track
+    periods: npt.NDArray[np.int64] = 30 + np.arange(num_cars) % 120
+    simulation.start_race()
+    start: float = time.perf_counter()
+    for i in range(num_steps):
+        turn = np.where((i // periods) % 2 == 1, constants.INPUT_LEFT, constants.INPUT_RIGHT)
+        simulation.step((constants.INPUT_FORWARD | turn).astype(np.uint8))
+    elapsed: float = time.perf_counter() - start
+    print(f"{track_name:<20} {num_cars:6d} cars  {num_steps / elapsed:8.0f} steps/s  "
+          f"{num_cars * num_steps / elapsed:12.0f} car steps/s")
+
+
+if __name__ == "__main__":
+    track_name: str = sys.argv[1] if len(sys.argv) > 1 else constants.TRACK_NAMES[0]
+    for count in (1, 10, 100, 1000, 10000):
+        benchmark(track_name, count, 1000)
@@ -1,17 +1,30 @@
-import csv
 import math
+import sys
+import time
+from typing import Optional
+
 import pygame
 
+from asset_manager import AssetManager
 import constants
+from replay import ReplayRecorder
 
 
-class Car:
-    """Represents the player's car, handling its state, movement, input, and drawing"""
+def render_rotated_sprites(style_name: str, opacity: int) -> list[pygame.Surface]:
+    """Renders the car sprite rotated through a full turn in constants.CAR_ROTATION_STEP steps"""
+    sprite: pygame.Surface = pygame.image.load(constants.CAR_IMAGE_PATH.format(car_type=style_name)).convert_alpha()
+    sprite = pygame.transform.scale(sprite, (constants.CAR_WIDTH, constants.CAR_HEIGHT))
+    if opacity < 255:
+        # Bake the opacity into the per-pixel alpha so each frame is a plain alpha blit
+        sprite.fill((255, 255, 255, opacity), special_flags=pygame.BLEND_RGBA_MULT)
+    num_steps: int = round(360 / constants.CAR_ROTATION_STEP)
+    return [pygame.transform.rotate(sprite, -i * constants.CAR_ROTATION_STEP) for i in range(num_steps)]
 
-    def __init__(self, screen: pygame.Surface, track_name: str, is_ghost: bool, car_config: dict,
-                 style_index: int, key_bindings: dict) -> None:
-        self.screen: pygame.Surface = screen
-        self.key_bindings = key_bindings
+
+class CarPhysics:
+    """Represents a car's state and movement, with no dependency on a display"""
+
+    def __init__(self, track_name: str, car_config: dict) -> None:
 
         # Load properties from config
         stats = car_config["stats"]
@@ -20,11 +33,6 @@ class Car:
                     stats["Acceleration"] * constants.ACCEL_STAT_MULTIPLIER)
         self.turn_speed: float = constants.BASE_TURN_SPEED + (stats["Handling"] * constants.HANDLING_STAT_MULTIPLIER)
 
-        # Get style info
-        style = car_config["styles"][style_index]
-        self.style_name = style["name"]
-        self.color = style["color"]
-
         # Store start values
         self.start_x: float = constants.START_X[track_name]
         self.start_y: float = constants.START_Y[track_name]
@@ -39,22 +47,20 @@ class Car:
         self.move_angle: float = self.car_angle
         self.speed: float = 0.0
 
+        # Previous physics state, used to interpolate between physics steps when drawing
+        self.prev_x: float = self.x
+        self.prev_y: float = self.y
+        self.prev_car_angle: float = self.car_angle
+
         # State
         self.is_off_road: bool = False
         self.is_drifting: bool = False
 
-        # Set initial respawn point (updated in Race class)
+        # Set initial respawn point (updated by the lap tracker)
         self.respawn_x: float = self.start_x
         self.respawn_y: float = self.start_y
         self.respawn_angle: float = self.start_angle
 
-        self.width: int = constants.CAR_WIDTH
-        self.height: int = constants.CAR_HEIGHT
-        self.opacity: int = 128 if is_ghost else 255
-
-        self.sprite = pygame.image.load(constants.CAR_IMAGE_PATH.format(car_type=self.style_name)).convert_alpha()
-        self.sprite = pygame.transform.scale(self.sprite, (self.width, self.height))
-
     def set_max_speed(self) -> None:
         """Sets the maximum speed of the car based on if it is drifting and if it is off-road"""
         self.max_speed = self.base_max_speed
@@ -63,8 +69,8 @@ class Car:
         elif self.is_drifting:
             self.max_speed = min(self.base_max_speed * 2, self.max_speed * 1.1)
 
-    def handle_input(self, keys: pygame.key.ScancodeWrapper, is_race_active: bool) -> None:
-        """Processes keyboard input to adjust speed and angle"""
+    def apply_input(self, input_bits: int, is_race_active: bool) -> None:
+        """Adjusts speed and angle from a bitmask of constants.INPUT_* flags"""
         if not is_race_active:
             self.speed = math.copysign(max(abs(self.speed) - constants.FRICTION, 0), self.speed)
             error = self.car_angle - self.move_angle
@@ -72,9 +78,9 @@ class Car:
             self.move_angle += math.copysign(delta_angle, error)
             return
 
-        if keys[self.key_bindings[constants.KEY_ACTION_FORWARD]]:
+        if input_bits & constants.INPUT_FORWARD:
             self.speed += self.acceleration
-        elif keys[self.key_bindings[constants.KEY_ACTION_BACKWARD]]:
+        elif input_bits & constants.INPUT_BACKWARD:
             self.speed -= self.acceleration
         else:
             self.speed = math.copysign(max(abs(self.speed) - constants.FRICTION, 0), self.speed)
@@ -82,9 +88,9 @@ class Car:
         # Directly change the car angle (which direction the car is facing)
         # Use calculated turn_speed instead of global constant
         turn_factor: float = self.turn_speed * (self.speed / self.base_max_speed)
-        if keys[self.key_bindings[constants.KEY_ACTION_LEFT]]:
+        if input_bits & constants.INPUT_LEFT:
             self.car_angle -= turn_factor
-        if keys[self.key_bindings[constants.KEY_ACTION_RIGHT]]:
+        if input_bits & constants.INPUT_RIGHT:
             self.car_angle += turn_factor
 
         # The move angle (the direction the car is going) should lag behind the car angle.
@@ -95,7 +101,7 @@ class Car:
         if abs(error) > constants.MAX_DRIFT_ANGLE:
             delta_angle = abs(error) - constants.MAX_DRIFT_ANGLE
         # When drifting (space), the move angle should lag more.
-        elif keys[self.key_bindings[constants.KEY_ACTION_DRIFT]]:
+        elif input_bits & constants.INPUT_DRIFT:
             delta_angle = constants.DRIFT_RECOVERY_SPEED
         else:
             delta_angle = 2 * constants.DRIFT_RECOVERY_SPEED
@@ -108,18 +114,19 @@ class Car:
         self.x += float(math.sin(math.radians(self.move_angle)) * self.speed)
         self.y -= float(math.cos(math.radians(self.move_angle)) * self.speed)
 
-    def draw(self, camera_x: float, camera_y: float) -> None:
-        """Draws the car on the track"""
-        rotated_image = pygame.transform.rotate(self.sprite, -self.car_angle)
-        rotated_image.set_alpha(self.opacity)
+    def save_previous_state(self) -> None:
+        """Stores the current physics state before it is advanced by another step"""
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.prev_car_angle = self.car_angle
 
-        # Calculate the car's position *on the screen*
-        screen_x = self.x - camera_x
-        screen_y = self.y - camera_y
-
-        # Center the rect on its screen-space coordinates
-        rect = rotated_image.get_rect(center=(screen_x, screen_y))
-        self.screen.blit(rotated_image, rect)
+    def get_render_state(self, alpha: float) -> tuple[float, float, float]:
+        """Interpolates the position and angle between the previous and current physics steps"""
+        # The angle turns the short way round, as ghost angles wrap to [0, 360) and would spin from 359 to 1 otherwise
+        delta_angle: float = (self.car_angle - self.prev_car_angle + 180) % 360 - 180
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha,
+                self.prev_car_angle + delta_angle * alpha)
 
     def respawn(self) -> None:
         """Resets the car to the last known respawn point"""
@@ -128,6 +135,7 @@ class Car:
         self.speed = 0.0
         self.car_angle = self.respawn_angle
         self.move_angle = self.respawn_angle
+        self.save_previous_state()
 
     def set_respawn_point(self, x: float, y: float, angle: float) -> None:
         """Updates the car's respawn location"""
@@ -135,8 +143,93 @@ class Car:
         self.respawn_y = y
         self.respawn_angle = angle
 
-    def log_properties(self, track_name: str) -> None:
-        """Write the car's position and angle to the .csv file"""
-        with open(constants.REPLAY_FILE_PATH.format(track_name=track_name), "a", newline="") as replay_file:
-            csv_writer = csv.writer(replay_file)
-            csv_writer.writerow([self.x, self.y, self.move_angle, self.car_angle])
\ No newline at end of file
+
+class Car(CarPhysics):
+    """Represents the player's car, adding keyboard input and drawing to the car's physics"""
+
+    def __init__(self, screen: pygame.Surface, track_name: str, is_ghost: bool, car_config: dict,
+                 style_index: int, key_bindings: dict, assets: Optional[AssetManager] = None) -> None:
+        super().__init__(track_name, car_config)
+        self.screen: pygame.Surface = screen
+        self.key_bindings = key_bindings
+
+        # Get style info
+        style = car_config["styles"][style_index]
+        self.style_name = style["name"]
+        self.color = style["color"]
+
+        self.width: int = constants.CAR_WIDTH
+        self.height: int = constants.CAR_HEIGHT
+        self.opacity: int = constants.GHOST_OPACITY if is_ghost else 255
+
+        # Shared through the asset manager so restarting a race reuses the rotations
+        if assets is not None:
+            self.rotated_sprites: list[pygame.Surface] = assets.get(
+                ("car_sprites", self.style_name, self.opacity, constants.CAR_ROTATION_STEP),
+                lambda: render_rotated_sprites(self.style_name, self.opacity))
+        else:
+            self.rotated_sprites = render_rotated_sprites(self.style_name, self.opacity)
+        self.sprite: pygame.Surface = self.rotated_sprites[0]
+
+    def get_input_bits(self, keys: pygame.key.ScancodeWrapper) -> int:
+        """Converts the pressed keys into a bitmask of constants.INPUT_* flags using the key bindings"""
+        input_bits: int = 0
+        for action, input_bit in constants.INPUT_BITS.items():
+            if keys[self.key_bindings[action]]:
+                input_bits |= input_bit
+        return input_bits
+
+    def draw(self, camera_x: float, camera_y: float, alpha: float = 1.0) -> None:
+        """Draws the car on the track, interpolated alpha of the way from the previous physics step"""
+        render_x, render_y, render_angle = self.get_render_state(alpha)
+        rotation_index: int = round(render_angle / constants.CAR_ROTATION_STEP) % len(self.rotated_sprites)
+        rotated_image = self.rotated_sprites[rotation_index]
+
+        # Calculate the car's position *on the screen*
+        screen_x = render_x - camera_x
+        screen_y = render_y - camera_y
+
+        # Center the rect on its screen-space coordinates
+        rect = rotated_image.get_rect(center=(screen_x, screen_y))
+        self.screen.blit(rotated_image, rect)
+
+    def log_properties(self, replay_recorder: ReplayRecorder) -> None:
+        """Record the car's position and angle for the replay"""
+        replay_recorder.record(self.x, self.y, self.move_angle, self.car_angle)
+
+
+def benchmark_draw(style_name: str, opacity: int, screen: pygame.Surface, num_draws: int) -> None:
+    """Times drawing a car sprite at changing angles, rotating it every draw (as before the rotations were cached)
+    against picking a pre-rotated sprite, printing microseconds per draw"""
+    sprite: pygame.Surface = pygame.image.load(constants.CAR_IMAGE_PATH.format(car_type=style_name)).convert_alpha()
+    sprite = pygame.transform.scale(sprite, (constants.CAR_WIDTH, constants.CAR_HEIGHT))
+    angles: list[float] = [(i * 7.3) % 360 for i in range(num_draws)]
+    centre: tuple[float, float] = (constants.WIDTH / 2, constants.HEIGHT / 2)
+
+    start: float = time.perf_counter()
+    for angle in angles:
+        rotated_image: pygame.Surface = pygame.transform.rotate(sprite, -angle)
+        if opacity < 255:
+            rotated_image.set_alpha(opacity)
+        screen.blit(rotated_image, rotated_image.get_rect(center=centre))
+    rotate_us: float = (time.perf_counter() - start) / num_draws * 1e6
+
+    start = time.perf_counter()
+    rotated_sprites: list[pygame.Surface] = render_rotated_sprites(style_name, opacity)
+    render_ms: float = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for angle in angles:
+        rotated_image = rotated_sprites[round(angle / constants.CAR_ROTATION_STEP) % len(rotated_sprites)]
+        screen.blit(rotated_image, rotated_image.get_rect(center=centre))
+    cached_us: float = (time.perf_counter() - start) / num_draws * 1e6
+
+    print(f"{style_name:<16} opacity {opacity:3d}  rotate {rotate_us:6.1f} us  cached {cached_us:6.1f} us  "
+          f"({len(rotated_sprites)} rotations rendered in {render_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    pygame.init()
+    display: pygame.Surface = pygame.display.set_mode((constants.WIDTH, constants.HEIGHT))
+    draws: int = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    benchmark_draw(constants.CAR_DEFINITIONS[0]["styles"][0]["name"], 255, display, draws)
+    benchmark_draw(constants.GHOST_CAR_DEFINITION["styles"][0]["name"], constants.GHOST_OPACITY, display, draws)
@@ -16,7 +16,7 @@ class CarSelection:
         self.save_manager = save_manager
 
         # --- Load Background ---
-        self.background_image: pygame.Surface = utilities.load_image(constants.CAR_SELECTION_IMAGE_PATH.format(image_name="default"), False, constants.WIDTH, constants.HEIGHT)
+        self.background_image: pygame.Surface = self.game.assets.load_image(constants.CAR_SELECTION_IMAGE_PATH.format(image_name="default"), False, constants.WIDTH, constants.HEIGHT)
 
         # --- Load Car Sprites ---
         self.car_sprites: dict[str, pygame.Surface] = {}
@@ -29,7 +29,7 @@ class CarSelection:
                 style_name = style["name"]
                 if style_name not in self.car_sprites:
                     try:
-                        self.car_sprites[style_name] = utilities.load_image(constants.CAR_IMAGE_PATH.format(car_type=style_name), True, sprite_width, sprite_height)
+                        self.car_sprites[style_name] = self.game.assets.load_image(constants.CAR_IMAGE_PATH.format(car_type=style_name), True, sprite_width, sprite_height)
                     except pygame.error as e:
                         print(f"Error loading car sprite {style_name}: {e}")
                         fallback = pygame.Surface((150, 300))
@@ -39,9 +39,9 @@ class CarSelection:
         # --- Load UI Elements ---
         arrow_width: int = 64
         arrow_height: int = arrow_width
-        self.arrow_left_img: pygame.Surface = utilities.load_image(constants.CAR_SELECTION_ARROW_LEFT_PATH, True, arrow_width, arrow_height)
-        self.arrow_right_img: pygame.Surface = utilities.load_image(constants.CAR_SELECTION_ARROW_RIGHT_PATH, True, arrow_width, arrow_height)
-        self.garage_door: pygame.Surface = utilities.load_image(constants.GENERAL_IMAGE_PATH.format(name="garage"), False, constants.WIDTH, constants.HEIGHT)
+        self.arrow_left_img: pygame.Surface = self.game.assets.load_image(constants.CAR_SELECTION_ARROW_LEFT_PATH, True, arrow_width, arrow_height)
+        self.arrow_right_img: pygame.Surface = self.game.assets.load_image(constants.CAR_SELECTION_ARROW_RIGHT_PATH, True, arrow_width, arrow_height)
+        self.garage_door: pygame.Surface = self.game.assets.load_image(constants.GENERAL_IMAGE_PATH.format(name="garage"), False, constants.WIDTH, constants.HEIGHT)
 
         # --- State ---
         self.current_car_index: int = 0
@@ -49,10 +49,10 @@ class CarSelection:
         self.last_hovered: str = "none"
 
         # --- Fonts ---
-        self.name_font: pygame.font.Font = pygame.font.Font(constants.TEXT_FONT_PATH, 70)
-        self.stats_header_font: pygame.font.Font = pygame.font.Font(constants.TEXT_FONT_PATH, 50)
-        self.stats_label_font: pygame.font.Font = pygame.font.Font(constants.FALLBACK_FONT_PATH, 30)
-        self.button_font: pygame.font.Font = pygame.font.Font(constants.TEXT_FONT_PATH, 40)
+        self.name_font: pygame.font.Font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 70)
+        self.stats_header_font: pygame.font.Font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 50)
+        self.stats_label_font: pygame.font.Font = self.game.assets.load_font(constants.FALLBACK_FONT_PATH, 30)
+        self.button_font: pygame.font.Font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 40)
 
         # --- Define Button Rects ---
         center_x, center_y = constants.WIDTH // 2, constants.HEIGHT // 2
@@ -71,10 +71,10 @@ class CarSelection:
         self.back_button_width: int = 100
         self.back_button_height: int = self.back_button_width
         self.back_button_y: int = constants.HEIGHT - self.back_button_height - self.back_button_x
-        self.back_default_image: pygame.Surface = utilities.load_image(
+        self.back_default_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_left_default"), True, self.back_button_width,
             self.back_button_height)
-        self.back_hover_image: pygame.Surface = utilities.load_image(
+        self.back_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_left_hover"), True, self.back_button_width,
             self.back_button_height)
         self.back_button_rect: pygame.Rect = pygame.Rect(self.back_button_x, self.back_button_y,
@@ -85,10 +85,10 @@ class CarSelection:
         # Select Button
         self.select_button_x: int = constants.WIDTH - self.back_button_width - self.back_button_x
         self.select_button_y: int = constants.HEIGHT - self.back_button_height - self.back_button_x
-        self.select_default_image: pygame.Surface = utilities.load_image(
+        self.select_default_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_right_default"), True, self.back_button_width,
             self.back_button_height)
-        self.select_hover_image: pygame.Surface = utilities.load_image(
+        self.select_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_right_hover"), True, self.back_button_width,
             self.back_button_height)
         self.select_button_rect: pygame.Rect = pygame.Rect(self.select_button_x, self.select_button_y, self.back_button_width, self.back_button_height)
@@ -98,7 +98,7 @@ class CarSelection:
         self.color_buttons: list[tuple[pygame.Rect, int]] = []
 
         # --- Sound ---
-        self.hover_sound: pygame.mixer.Sound = pygame.mixer.Sound(constants.HOVER_SOUND_PATH)
+        self.hover_sound: pygame.mixer.Sound = self.game.assets.load_sound(constants.HOVER_SOUND_PATH)
         self.hover_sound.set_volume(self.save_manager.get_volumes()["sfx"])
 
         # Transitions
@@ -189,12 +189,12 @@ class CarSelection:
         stats_x = constants.WIDTH - 400
         stats_y = 250
 
-        header_surf = self.stats_header_font.render("Stats", True, constants.TEXT_COLOR)
+        header_surf = self.game.text_cache.render(self.stats_header_font, "Stats", True, constants.TEXT_COLOR)
         self.screen.blit(header_surf, (stats_x, stats_y))
         stats_y += header_surf.get_height() + 30
 
         for stat_name, stat_value in car_data["stats"].items():
-            label_surf = self.stats_label_font.render(stat_name, True, (255, 255, 255))
+            label_surf = self.game.text_cache.render(self.stats_label_font, stat_name, True, (255, 255, 255))
             self.screen.blit(label_surf, (stats_x, stats_y))
             stats_y += label_surf.get_height() + 10
 
@@ -207,6 +207,10 @@ class CarSelection:
 
             stats_y += bar_bg_rect.height + 25
 
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """Always asks for a full redraw, as the car and its stats change with most input"""
+        return None
+
     def draw(self) -> None:
         self.screen.blit(self.background_image, (0, 0))
 
@@ -223,7 +227,7 @@ class CarSelection:
         sprite_to_draw = self.car_sprites.get(current_style["name"])
 
         # Draw Name
-        name_surf = self.name_font.render(car_data["name"], True, constants.TEXT_COLOR)
+        name_surf = self.game.text_cache.render(self.name_font, car_data["name"], True, constants.TEXT_COLOR)
         self.screen.blit(name_surf, (70, 250))
 
         # Draw Car
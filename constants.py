@@ -9,6 +9,21 @@ FALLBACK_FONT_PATH: str = "assets/fonts/60s-scoreboard.otf"
 WIDTH: int = 1408
 HEIGHT: int = 792
 GAME_TITLE: str = "RC Rumble Racing"
+SCALE_QUALITY_NEAREST: str = "nearest"  # How the game is scaled up to the window: sharp pixels
+SCALE_QUALITY_SMOOTH: str = "smooth"  # Or filtered, which is slower
+DEFAULT_SCALE_QUALITY: str = SCALE_QUALITY_NEAREST
+TEXT_CACHE_SIZE: int = 256  # Rendered strings kept by the text cache
+
+# Race timing
+PHYSICS_FPS: int = 60  # Fixed simulation rate, also the rate replays are recorded at
+PHYSICS_STEP_MS: float = 1000 / PHYSICS_FPS
+RENDER_FPS: int = 60  # Frame rate cap while racing, 0 for uncapped
+MAX_PHYSICS_STEPS_PER_FRAME: int = 5  # Slow down instead of spiralling when a frame takes far too long
+
+# Frame pacing outside of racing
+MENU_FPS: int = 60
+IDLE_FPS: int = 5  # Frame rate of menus and the pause screen once nothing is happening
+IDLE_AFTER_MS: int = 1000  # Time without input or animation before dropping to IDLE_FPS
 
 # Screen Names
 TITLE_SCREEN_NAME: str = "title_screen"
@@ -24,6 +39,13 @@ RACE_SCREEN_NAME: str = "race_screen"
 EXIT_GAME_CODE: str = "exit_game"
 NO_ACTION_CODE: str = ""
 
+# Simulation Event Codes
+RESPAWN_EVENT_CODE: str = "respawn"
+CHECKPOINT_EVENT_CODE: str = "checkpoint"
+NEXT_LAP_EVENT_CODE: str = "next_lap"
+FINAL_LAP_EVENT_CODE: str = "final_lap"
+RACE_FINISHED_EVENT_CODE: str = "race_finished"
+
 # Save System
 SAVE_FILE_PATH: str = "save_data.json"
 
@@ -50,11 +72,26 @@ DEFAULT_KEY_BINDINGS: dict[str, int] = {
     KEY_ACTION_TOGGLE_GHOST: pygame.K_g,
 }
 
+# Input bitmask used by the physics, replays and headless simulation
+INPUT_FORWARD: int = 1 << 0
+INPUT_BACKWARD: int = 1 << 1
+INPUT_LEFT: int = 1 << 2
+INPUT_RIGHT: int = 1 << 3
+INPUT_DRIFT: int = 1 << 4
+INPUT_BITS: dict[str, int] = {
+    KEY_ACTION_FORWARD: INPUT_FORWARD,
+    KEY_ACTION_BACKWARD: INPUT_BACKWARD,
+    KEY_ACTION_LEFT: INPUT_LEFT,
+    KEY_ACTION_RIGHT: INPUT_RIGHT,
+    KEY_ACTION_DRIFT: INPUT_DRIFT,
+}
+
 # Settings Menu
 SETTINGS_ICON_PATH: str = "assets/images/general/setting_icon.png"
 
 # General
 GENERAL_IMAGE_PATH: str = "assets/images/general/{name}.png"
+ASSET_MEMORY_BUDGET_MB: int = 512  # Images, sounds and track data kept loaded between screens and races
 
 # Cursor
 CURSOR_WIDTH: int = 40
@@ -69,6 +106,7 @@ CLICK_SOUND_PATH: str = "assets/audio/general/click.mp3"
 HOVER_SOUND_PATH: str = "assets/audio/general/hover.mp3"
 INTRO_VIDEO_PATH: str = "assets/videos/intro.mp4"
 INTRO_AUDIO_PATH: str = "assets/videos/intro.mp3"
+INTRO_FRAME_BUFFERS: int = 8  # Intro video frames that can be decoded ahead of the one on screen
 
 # Track selection screen
 TRACK_SELECTION_IMAGE_PATH: str = "assets/images/track_selection/{number}_{type}.png"
@@ -98,16 +136,31 @@ NUM_LAPS: dict[str, int] = {TRACK_NAMES[0]: 3,
                             TRACK_NAMES[1]: 3,
                             TRACK_NAMES[2]: 3,
                             TRACK_NAMES[3]: 3}
-CHECKPOINT_LOCATIONS: dict[str, pygame.Rect] = {TRACK_NAMES[0]: pygame.Rect(2256, 944, 200, 50),
-                                                TRACK_NAMES[1]: pygame.Rect(1621, 644, 50, 300),
-                                                TRACK_NAMES[2]: pygame.Rect(1056, 994, 200, 50),
-                                                TRACK_NAMES[3]: pygame.Rect(3950, 1350, 250, 50)}
-
-# Angle to face when respawning at the checkpoint
-CHECKPOINT_ANGLES: dict[str, int] = {TRACK_NAMES[0]: 180,
-                                     TRACK_NAMES[1]: 90,
-                                     TRACK_NAMES[2]: 180,
-                                     TRACK_NAMES[3]: 180}
+# Checkpoints in the order they are passed each lap, splitting it into sectors that end at each checkpoint and at
+# the finish line. They are spaced roughly evenly by driving distance, with more on the longer fiery_furnace lap, and
+# reach across the off-road beside the road so that cutting a corner can't miss one
+CHECKPOINT_LOCATIONS: dict[str, list[pygame.Rect]] = {TRACK_NAMES[0]: [pygame.Rect(1591, 708, 50, 432),
+                                                                       pygame.Rect(2105, 944, 443, 50),
+                                                                       pygame.Rect(1599, 1139, 50, 359)],
+                                                      TRACK_NAMES[1]: [pygame.Rect(932, 1010, 477, 50),
+                                                                       pygame.Rect(1621, 569, 50, 449),
+                                                                       pygame.Rect(2284, 925, 308, 50)],
+                                                      TRACK_NAMES[2]: [pygame.Rect(1990, 538, 50, 486),
+                                                                       pygame.Rect(945, 994, 394, 50),
+                                                                       pygame.Rect(1542, 1139, 50, 353)],
+                                                      TRACK_NAMES[3]: [pygame.Rect(1892, 1021, 50, 418),
+                                                                       pygame.Rect(2692, 395, 50, 396),
+                                                                       pygame.Rect(3385, 1178, 233, 50),
+                                                                       pygame.Rect(3838, 939, 259, 50),
+                                                                       pygame.Rect(3950, 1350, 250, 50),
+                                                                       pygame.Rect(2854, 1763, 50, 416),
+                                                                       pygame.Rect(2065, 1966, 50, 387)]}
+
+# Angle to face when respawning at each checkpoint, which is also the direction it must be crossed in
+CHECKPOINT_ANGLES: dict[str, list[int]] = {TRACK_NAMES[0]: [95, 180, 270],
+                                           TRACK_NAMES[1]: [0, 90, 180],
+                                           TRACK_NAMES[2]: [265, 180, 85],
+                                           TRACK_NAMES[3]: [90, 90, 0, 180, 180, 270, 280]}
 
 FINISH_LINE_LOCATIONS: dict[str, pygame.Rect] = {TRACK_NAMES[0]: pygame.Rect(1068, 994, 180, 50),
                                                 TRACK_NAMES[1]: pygame.Rect(1736, 1184, 50, 180),
@@ -119,10 +172,33 @@ TRACK_IMAGE_SCALE_FACTOR: dict[str, tuple[float, float]] = {TRACK_NAMES[0]: (2.5
                                                             TRACK_NAMES[3]: (3.5, 3.5)}
 TRACK_IMAGE_PATH: str = "assets/images/tracks/{track_name}/{image_type}.png"
 TRACK_IMAGE_TYPES: list[str] = ["track_image", "track_image_mask"]
+TRACK_MASK_CACHE_PATH: str = "assets/images/tracks/{track_name}/track_mask_cache.npz"
+TRACK_PROGRESS_CACHE_PATH: str = "assets/images/tracks/{track_name}/track_progress_cache.npz"
+TRACK_PROGRESS_CELL_SIZE: int = 8  # Pixels along each side of a progress grid cell
+TRACK_PROGRESS_OFF_ROAD_COST: float = 100.0  # How much further a pixel of off-road counts as when following the lap
+TRACK_DISTANCE_CACHE_PATH: str = "assets/images/tracks/{track_name}/track_distance_cache.npz"
+TRACK_DISTANCE_CELL_SIZE: int = 4  # Pixels along each side of a distance field cell
+TRACK_DISTANCE_MAX: int = 256  # Pixels from an edge beyond which the distance fields stop counting
+
+# Terrain bits, stored two per pixel (white is off-road, red is out of bounds, anywhere off the map is both)
+TERRAIN_ROAD: int = 0
+TERRAIN_OFF_ROAD: int = 1
+TERRAIN_OUT_OF_BOUNDS: int = 2
+TERRAIN_OFF_MAP: int = TERRAIN_OFF_ROAD | TERRAIN_OUT_OF_BOUNDS
+TERRAIN_BITS_PER_PIXEL: int = 2
+TERRAIN_PIXELS_PER_BYTE: int = 8 // TERRAIN_BITS_PER_PIXEL
+# Pixels are packed along y: y >> TERRAIN_BYTE_SHIFT is the byte a pixel is in, y & TERRAIN_SLOT_MASK its slot in that
+# byte, slot << TERRAIN_SLOT_BIT_SHIFT the bit its terrain starts at, and TERRAIN_VALUE_MASK keeps just its bits
+TERRAIN_BYTE_SHIFT: int = TERRAIN_PIXELS_PER_BYTE.bit_length() - 1
+TERRAIN_SLOT_MASK: int = TERRAIN_PIXELS_PER_BYTE - 1
+TERRAIN_SLOT_BIT_SHIFT: int = TERRAIN_BITS_PER_PIXEL.bit_length() - 1
+TERRAIN_VALUE_MASK: int = (1 << TERRAIN_BITS_PER_PIXEL) - 1
 
 # Car parameters
 CAR_WIDTH: int = 30
 CAR_HEIGHT: int = 60
+CAR_ROTATION_STEP: float = 2.0  # Angular resolution of the pre-rotated car sprites, in degrees
+GHOST_OPACITY: int = 128
 
 # Physics Base Values (Used to calculate actual stats from the 1-10 ratings)
 # Formula: Actual = Base + (Stat * Multiplier)
@@ -192,6 +268,12 @@ GHOST_CAR_DEFINITION = {
     }]
 }
 
+# Split times against the ghost, shown under the race timer after each checkpoint
+SPLIT_DELTA_DISPLAY_S: float = 2.0  # Seconds of race time to show the difference for
+SPLIT_AHEAD_COLOR: tuple[int, int, int] = (20, 170, 20)
+SPLIT_BEHIND_COLOR: tuple[int, int, int] = (185, 5, 5)
+SPLIT_DELTA_POSITION: tuple[int, int] = (20, 90)
+
 
 # Pause Menu
 PAUSE_MENU_IMAGE_PATH: str = "assets/images/pause/{image_name}.png"
@@ -199,6 +281,7 @@ PAUSE_OVERLAY_OPACITY: int = 100
 PAUSE_TITLE_COLOR: tuple[int, int, int] = (255, 255, 255)
 PAUSE_BUTTON_COLOR: tuple[int, int, int] = (200, 200, 200)
 PAUSE_BUTTON_HOVER_COLOR: tuple[int, int, int] = (255, 255, 0)
+PAUSE_TRANSITION_DURATION_MS: int = 250
 PAUSE_BUTTON_WIDTH: int = 720
 PAUSE_BUTTON_HEIGHT: int = 85
 PAUSE_RESUME_Y: int = 288
@@ -217,13 +300,32 @@ REPLAY_FILE_PATH: str = "assets/replays/{track_name}/current_race.csv"
 PERSONAL_BEST_FILE_PATH: str = "assets/replays/{track_name}/personal_best.csv"
 PERSONAL_BEST_FILE_NAME: str = "personal_best.csv"
 PERSONAL_BEST_METADATA_FILE_PATH: str = "assets/replays/{track_name}/personal_best.json"
+PERSONAL_BEST_BINARY_FILE_PATH: str = "assets/replays/{track_name}/personal_best.replay"
+PERSONAL_BEST_INPUTS_FILE_PATH: str = "assets/replays/{track_name}/personal_best.inputs"
+REPLAY_BUFFER_FRAMES: int = 60 * 60 * 3  # Three minutes at 60 FPS before the buffer has to grow
 
 # Ghost files
 GHOST_FILE_PATH: str = "assets/ghosts/{track_name}/{difficulty}.csv"
 GHOST_METADATA_FILE_PATH: str = "assets/ghosts/{track_name}/{difficulty}.json"
+GHOST_BINARY_FILE_PATH: str = "assets/ghosts/{track_name}/{difficulty}.replay"
 GHOST_DIFFICULTY_PERSONAL_BEST: str = "personal_best"
 GHOST_DIFFICULTIES: list[str] = ["easy", "medium", "hard"]
 
+# AI opponents, racing the same cars as the player alongside the ghost for each ghost difficulty
+NUM_AI_OPPONENTS: int = 8
+AI_GRID_ROW_SPACING: float = 60.0  # Pixels along the centerline between each row of the starting grid, behind the start
+AI_GRID_COLUMN_OFFSET: float = 24.0  # Pixels either side of the centerline for the two columns of the grid
+# How hard the AI drives for each ghost difficulty, easiest first: the fraction of the car's top speed it aims for (each
+# car down the grid a little less than the one in front), and how far ahead along the racing line it steers to in pixels
+AI_DIFFICULTY_TIERS: dict[str, dict[str, float]] = dict(zip(GHOST_DIFFICULTIES, [
+    {"top_speed": 0.8, "lookahead": 70.0},
+    {"top_speed": 0.9, "lookahead": 90.0},
+    {"top_speed": 1.0, "lookahead": 110.0},
+]))
+AI_OFF_ROAD_ALLOWANCE: float = 40.0  # Pixels of off-road either side of the road the racing line may cut across
+AI_WALL_CLEARANCE: float = 30.0  # Pixels the racing line keeps from the out of bounds walls
+AI_TOP_SPEED_SPREAD: float = 0.05  # How much slower the back of the grid aims to go than the front
+
 # Music and audio paths
 TRACK_AUDIO_PATH: str = "assets/audio/tracks/{track_name}/{song_type}.mp3"
 TRACK_SONG_TYPES: list[str] = ["before_race", "track_start", "loop", "final_lap", "fast", "track_complete"]
@@ -1,32 +1,32 @@
 import pygame
 import constants
-from ui_elements import ConfirmationDialog
+from ui_elements import ConfirmationDialog, DirtyRegions, get_text_button_area
 
 
 class ControlsMenu:
     """Screen for re-binding controls."""
 
-    def __init__(self, screen: pygame.Surface, save_manager) -> None:
+    def __init__(self, game, screen: pygame.Surface, save_manager) -> None:
 
         # General
         self.name: str = "controls_menu"
+        self.game = game
         self.screen: pygame.Surface = screen
         self.save_manager = save_manager
 
         # Use the title screen's background
-        self.background: pygame.Surface = pygame.image.load(
-            constants.GENERAL_IMAGE_PATH.format(name="background")).convert()
-        self.background = pygame.transform.scale(self.background, (constants.WIDTH, constants.HEIGHT))
+        self.background: pygame.Surface = self.game.assets.load_image(
+            constants.GENERAL_IMAGE_PATH.format(name="background"), False, constants.WIDTH, constants.HEIGHT)
 
         # Dark overlay
         self.overlay = pygame.Surface((constants.WIDTH, constants.HEIGHT), pygame.SRCALPHA)
         self.overlay.fill((0, 0, 0, 150))
 
         # Fonts
-        self.title_font = pygame.font.Font(constants.TEXT_FONT_PATH, 80)
-        self.label_font = pygame.font.Font(constants.TEXT_FONT_PATH, 50)
-        self.key_font = pygame.font.Font(constants.FALLBACK_FONT_PATH, 40)
-        self.button_font = pygame.font.Font(constants.TEXT_FONT_PATH, 40)
+        self.title_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 80)
+        self.label_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 50)
+        self.key_font = self.game.assets.load_font(constants.FALLBACK_FONT_PATH, 40)
+        self.button_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 40)
 
         self.current_bindings = self.save_manager.get_key_bindings().copy()
         self.initial_bindings = self.save_manager.get_key_bindings().copy()
@@ -51,7 +51,7 @@ class ControlsMenu:
         self.last_hovered = "none"  # "back", "save", or action_key
         self.awaiting_input_for = None  # Stores the action_key (e.g., "FORWARD")
         self.dialog = None
-        self.hover_sound = pygame.mixer.Sound(constants.HOVER_SOUND_PATH)
+        self.hover_sound = self.game.assets.load_sound(constants.HOVER_SOUND_PATH)
         self.hover_sound.set_volume(self.save_manager.get_volumes()["sfx"])
 
         # Transitions
@@ -66,6 +66,9 @@ class ControlsMenu:
         self.transition_next_duration_ms: int = 0
         self.transition_next_pause_time: int = 0
 
+        # What each area showed last frame, to redraw only the areas that changed
+        self.dirty_regions: DirtyRegions = DirtyRegions()
+
     def generate_rects(self):
         """Creates the rects for the key binding buttons."""
         start_x = constants.WIDTH // 2 + 100
@@ -142,12 +145,31 @@ class ControlsMenu:
                     self.awaiting_input_for = hovered
         return constants.NO_ACTION_CODE
 
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """Returns the areas that changed since the last frame, or None if the whole screen has to be redrawn"""
+        if self.transitioning:
+            return self.dirty_regions.get_dirty_rects(None)
+        regions: dict[str, tuple] = {}
+        for action_key, rect in self.binding_rects.items():
+            key_state: tuple = (self.current_bindings.get(action_key, -1), self.last_hovered == action_key,
+                                self.awaiting_input_for == action_key)
+            regions[action_key] = (key_state, rect)
+        regions["back"] = (self.last_hovered == constants.SETTINGS_MENU_NAME,
+                           get_text_button_area(self.button_font, "Back", self.back_button_rect))
+        regions["save"] = ((self.settings_changed(), self.last_hovered == "save"),
+                           get_text_button_area(self.button_font, "Save", self.save_button_rect))
+        # Opening or closing the dialog darkens or lightens the whole screen behind it
+        regions["dialog"] = (self.dialog is not None, self.screen.get_rect())
+        regions["dialog_buttons"] = (self.dialog.hover if self.dialog else None,
+                                     self.dialog.rect if self.dialog else pygame.Rect(0, 0, 0, 0))
+        return self.dirty_regions.get_dirty_rects(regions)
+
     def draw(self) -> None:
         self.screen.blit(self.background, (0, 0))
         self.screen.blit(self.overlay, (0, 0))
 
         # Title
-        title_surf = self.title_font.render("Controls", True, (255, 255, 255))
+        title_surf = self.game.text_cache.render(self.title_font, "Controls", True, (255, 255, 255))
         title_rect = title_surf.get_rect(center=(constants.WIDTH // 2, 100))
         self.screen.blit(title_surf, title_rect)
 
@@ -156,7 +178,7 @@ class ControlsMenu:
             rect = self.binding_rects[action_key]
 
             # Label
-            label_surf = self.label_font.render(label_text, True, (255, 255, 255))
+            label_surf = self.game.text_cache.render(self.label_font, label_text, True, (255, 255, 255))
             label_rect = label_surf.get_rect(midright=(rect.left - 30, rect.centery))
             self.screen.blit(label_surf, label_rect)
 
@@ -179,13 +201,13 @@ class ControlsMenu:
 
             pygame.draw.rect(self.screen, btn_color, rect, border_radius=8)
 
-            key_surf = self.key_font.render(key_name, True, (255, 255, 255))
+            key_surf = self.game.text_cache.render(self.key_font, key_name, True, (255, 255, 255))
             key_rect = key_surf.get_rect(center=rect.center)
             self.screen.blit(key_surf, key_rect)
 
         # Back Button
         back_color = constants.TRACK_SELECTION_EXIT_HOVER_COLOR if self.last_hovered == constants.SETTINGS_MENU_NAME else constants.TRACK_SELECTION_EXIT_COLOR
-        back_surf = self.button_font.render("Back", True, back_color)
+        back_surf = self.game.text_cache.render(self.button_font, "Back", True, back_color)
         self.screen.blit(back_surf, back_surf.get_rect(center=self.back_button_rect.center))
 
         # Save Button
@@ -193,7 +215,7 @@ class ControlsMenu:
             save_color = (0, 200, 0)  # Green
             if self.last_hovered == "save":
                 save_color = (100, 255, 100)  # Light Green
-            save_surf = self.button_font.render("Save", True, save_color)
+            save_surf = self.game.text_cache.render(self.button_font, "Save", True, save_color)
             self.screen.blit(save_surf, save_surf.get_rect(center=self.save_button_rect.center))
 
         if self.dialog:
@@ -2,6 +2,7 @@ import pygame
 
 import constants
 import utilities
+from ui_elements import DirtyRegions
 
 
 class DifficultySelection:
@@ -20,8 +21,8 @@ class DifficultySelection:
         self.background.fill((30, 30, 30))  # Dark Grey
 
         # Fonts
-        self.title_font = pygame.font.Font(constants.TEXT_FONT_PATH, 80)
-        self.button_font = pygame.font.Font(constants.TEXT_FONT_PATH, 50)
+        self.title_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 80)
+        self.button_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 50)
 
         # Options
         self.options = [
@@ -52,10 +53,10 @@ class DifficultySelection:
         self.back_button_width: int = 100
         self.back_button_height: int = self.back_button_width
         self.back_button_y: int = constants.HEIGHT - self.back_button_height - self.back_button_x
-        self.back_default_image: pygame.Surface = utilities.load_image(
+        self.back_default_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_left_default"), True, self.back_button_width,
             self.back_button_height)
-        self.back_hover_image: pygame.Surface = utilities.load_image(
+        self.back_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_left_hover"), True, self.back_button_width,
             self.back_button_height)
         self.back_button_rect: pygame.Rect = pygame.Rect(self.back_button_x, self.back_button_y,
@@ -64,7 +65,7 @@ class DifficultySelection:
         self.back_current_image: pygame.Surface = self.back_default_image
 
         self.last_hovered_index: int = 0
-        self.hover_sound = pygame.mixer.Sound(constants.HOVER_SOUND_PATH)
+        self.hover_sound = self.game.assets.load_sound(constants.HOVER_SOUND_PATH)
         self.hover_sound.set_volume(self.save_manager.get_volumes()["sfx"])
 
         # Transitions
@@ -79,6 +80,9 @@ class DifficultySelection:
         self.transition_next_duration_ms: int = 400
         self.transition_next_pause_time: int = 400
 
+        # What each area showed last frame, to redraw only the areas that changed
+        self.dirty_regions: DirtyRegions = DirtyRegions()
+
     def handle_events(self, events, mouse_pos: tuple[int, int]) -> str:
         """Returns the selected difficulty key string, 'back', 'exit', or empty string."""
 
@@ -111,11 +115,20 @@ class DifficultySelection:
 
         return constants.NO_ACTION_CODE
 
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """Returns the areas that changed since the last frame, or None if the whole screen has to be redrawn"""
+        if self.transitioning:
+            return self.dirty_regions.get_dirty_rects(None)
+        regions: dict[int, tuple[bool, pygame.Rect]] = {
+            btn["index"]: (btn["index"] == self.last_hovered_index, btn["rect"]) for btn in self.buttons}
+        regions[0] = (self.last_hovered_index == 0, self.back_button_rect)
+        return self.dirty_regions.get_dirty_rects(regions)
+
     def draw(self) -> None:
         self.screen.blit(self.background, (0, 0))
 
         # Title
-        title_surf = self.title_font.render("Select Opponent", True, (255, 255, 255))
+        title_surf = self.game.text_cache.render(self.title_font, "Select Opponent", True, (255, 255, 255))
         title_rect = title_surf.get_rect(center=(constants.WIDTH // 2, 100))
         self.screen.blit(title_surf, title_rect)
 
@@ -125,7 +138,7 @@ class DifficultySelection:
             if btn["index"] == self.last_hovered_index:
                 color = (255, 255, 0)  # Yellow hover
 
-            text_surf = self.button_font.render(btn["label"], True, color)
+            text_surf = self.game.text_cache.render(self.button_font, btn["label"], True, color)
             self.screen.blit(text_surf, btn["rect"])
 
         # Back Button
@@ -0,0 +1,53 @@
+import pygame
+
+import constants
+
+
+class FrameScheduler:
+    """Paces a loop at its full frame rate while anything is happening, dropping to a low idle rate once there has
+    been no input or animation for a while
+
+    While idle it sleeps in pygame.event.wait rather than Clock.tick, so any input wakes the loop up straight away.
+    Loops using it must read their events through get_events() rather than pygame.event.get()."""
+
+    def __init__(self, fps: int, idle_fps: int = constants.IDLE_FPS,
+                 idle_after_ms: int = constants.IDLE_AFTER_MS) -> None:
+        self.fps: int = fps
+        self.idle_fps: int = idle_fps
+        self.idle_after_ms: int = idle_after_ms
+        self.clock: pygame.time.Clock = pygame.time.Clock()
+        self.last_active_ms: int = pygame.time.get_ticks()
+        self._frame_start_ms: int = self.last_active_ms
+        self._waited_events: list[pygame.event.Event] = []  # Events that woke an idle wait, not yet handed out
+
+    def keep_active(self) -> None:
+        """Holds the full frame rate for now (call every frame while a transition or animation is playing)"""
+        self.last_active_ms = pygame.time.get_ticks()
+
+    def is_idle(self) -> bool:
+        """Checks if nothing has happened for long enough to drop to the idle frame rate"""
+        return pygame.time.get_ticks() - self.last_active_ms >= self.idle_after_ms
+
+    def tick(self) -> int:
+        """Waits until the next frame is due, returning the time in ms since the previous frame"""
+        if self.is_idle():
+            timeout_ms: int = 1000 // self.idle_fps - (pygame.time.get_ticks() - self._frame_start_ms)
+            if timeout_ms > 0:  # A timeout of 0 would wait forever
+                event: pygame.event.Event = pygame.event.wait(timeout_ms)
+                if event.type != pygame.NOEVENT:
+                    self._waited_events.append(event)
+                    self.keep_active()
+            frame_time_ms: int = self.clock.tick()
+        else:
+            frame_time_ms = self.clock.tick(self.fps)
+        self._frame_start_ms = pygame.time.get_ticks()
+        return frame_time_ms
+
+    def get_events(self) -> list[pygame.event.Event]:
+        """Returns the events since the last call, like pygame.event.get(), going back to the full frame rate if
+        there were any"""
+        events: list[pygame.event.Event] = self._waited_events + pygame.event.get()
+        self._waited_events = []
+        if events:
+            self.keep_active()
+        return events
@@ -1,14 +1,21 @@
+import math
+from typing import Optional
+
 import pygame
 
+from asset_manager import AssetManager
 import constants
 from car_selection import CarSelection
 from controls_menu import ControlsMenu
 from difficulty_selection import DifficultySelection
+from frame_scheduler import FrameScheduler
 from save_manager import SaveManager
 from settings_menu import SettingsMenu
 from sound_menu import SoundMenu
 from title_screen import TitleScreen
+from track import Track
 from track_selection import TrackSelection
+from ui_elements import TextCache
 import utilities
 from race import Race
 
@@ -28,24 +35,23 @@ class Game:
         self.clock: pygame.time.Clock = pygame.time.Clock()
         pygame.display.set_caption(constants.GAME_TITLE)
 
+        # Images, fonts and sounds shared by every screen and race, and the text drawn with them
+        self.assets: AssetManager = AssetManager()
+        self.text_cache: TextCache = TextCache()
+
         # Data Manager
         self.save_manager = SaveManager(self)
 
-        # Menu screens
-        self.title_screen: TitleScreen = TitleScreen(self, self.game_surface, self.save_manager)
-        self.track_selection: TrackSelection = TrackSelection(self, self.game_surface, self.save_manager)
-        self.car_selection: CarSelection = CarSelection(self, self.game_surface, self.save_manager)
-        self.difficulty_selection: DifficultySelection = DifficultySelection(self, self.game_surface, self.save_manager)
-        self.settings_menu: SettingsMenu = SettingsMenu(self, self.game_surface, self.save_manager)
-        self.controls_menu: ControlsMenu = ControlsMenu(self.game_surface, self.save_manager)
-        self.sound_menu: SoundMenu = SoundMenu(self.game_surface, self.save_manager)
-        self.menu_screens: dict[str, Object] = {constants.TITLE_SCREEN_NAME: self.title_screen,
-                                                constants.TRACK_SELECTION_NAME: self.track_selection,
-                                                constants.CAR_SELECTION_NAME: self.car_selection,
-                                                constants.DIFFICULTY_SELECTION_NAME: self.difficulty_selection,
-                                                constants.SETTINGS_MENU_NAME: self.settings_menu,
-                                                constants.CONTROLS_MENU_NAME: self.controls_menu,
-                                                constants.SOUND_MENU_NAME: self.sound_menu}
+        # Menu screens, each built the first time it is shown so that startup only pays for the title screen
+        self.menu_screen_types: dict[str, type] = {constants.TITLE_SCREEN_NAME: TitleScreen,
+                                                   constants.TRACK_SELECTION_NAME: TrackSelection,
+                                                   constants.CAR_SELECTION_NAME: CarSelection,
+                                                   constants.DIFFICULTY_SELECTION_NAME: DifficultySelection,
+                                                   constants.SETTINGS_MENU_NAME: SettingsMenu,
+                                                   constants.CONTROLS_MENU_NAME: ControlsMenu,
+                                                   constants.SOUND_MENU_NAME: SoundMenu}
+        self.menu_screens: dict[str, Object] = {}
+        self.title_screen: TitleScreen = self.get_menu_screen(constants.TITLE_SCREEN_NAME)
         self.menu_screen_indices: dict[str, int] = {constants.TITLE_SCREEN_NAME: 0,
                                                     constants.TRACK_SELECTION_NAME: 1,
                                                     constants.CAR_SELECTION_NAME: 2,
@@ -56,22 +62,27 @@ class Game:
                                                     constants.SOUND_MENU_NAME: -3}
         self.current_screen: str = ""
         self.next_screen: str = ""
-        self.ui_clock: pygame.time.Clock = pygame.time.Clock()
+        self.frame_scheduler: FrameScheduler = FrameScheduler(constants.MENU_FPS)
 
-        self.custom_cursor_image: pygame.Surface = pygame.image.load(
-            constants.GENERAL_IMAGE_PATH.format(name="cursor")).convert_alpha()
-        self.custom_cursor_image = pygame.transform.scale(self.custom_cursor_image,
-                                                          (constants.CURSOR_WIDTH, constants.CURSOR_HEIGHT))
-        self.click_sound: pygame.mixer.Sound = pygame.mixer.Sound(constants.CLICK_SOUND_PATH)
-        self.hover_sound: pygame.mixer.Sound = pygame.mixer.Sound(constants.HOVER_SOUND_PATH)
+        self.custom_cursor_image: pygame.Surface = self.assets.load_image(
+            constants.GENERAL_IMAGE_PATH.format(name="cursor"), True, constants.CURSOR_WIDTH, constants.CURSOR_HEIGHT)
+        self.click_sound: pygame.mixer.Sound = self.assets.load_sound(constants.CLICK_SOUND_PATH)
+        self.hover_sound: pygame.mixer.Sound = self.assets.load_sound(constants.HOVER_SOUND_PATH)
 
         # Apply volumes from save file
         self.save_manager.apply_all_settings()
 
-        # Letterbox scaling
+        # Letterbox scaling, worked out again only when the window size changes
         self.scale_factor: float = 1.0
         self.offset_x: int = 0
         self.offset_y: int = 0
+        self._letterbox_window_size: Optional[tuple[int, int]] = None
+        self._letterbox_rect: pygame.Rect = pygame.Rect(0, 0, self.width, self.height)
+
+        # Menus are redrawn only where they change: the last menu frame is kept without the cursor to erase it from
+        self._menu_frame: pygame.Surface = pygame.Surface((self.width, self.height))
+        self._menu_frame_screen: str = ""  # Menu screen in _menu_frame, "" if the next frame has to be drawn in full
+        self.cursor_rect: Optional[pygame.Rect] = None  # Where the cursor was last drawn on the game_surface
 
         # Race
         self.race: Race
@@ -81,13 +92,25 @@ class Game:
         self.difficulty: str = ""
 
         # Transitions
-        self.garage_door: pygame.Surface = utilities.load_image(constants.GENERAL_IMAGE_PATH.format(name="garage"),
-                                                                False, constants.WIDTH, constants.HEIGHT)
+        self.garage_door: pygame.Surface = self.assets.load_image(constants.GENERAL_IMAGE_PATH.format(name="garage"),
+                                                                  False, constants.WIDTH, constants.HEIGHT)
         self.dark_overlay: pygame.Surface = pygame.Surface((constants.WIDTH, constants.HEIGHT), pygame.SRCALPHA)
 
+    def get_menu_screen(self, name: str) -> object:
+        """Returns the menu screen with the given name, building it if it has not been shown yet"""
+        if name not in self.menu_screens:
+            self.menu_screens[name] = self.menu_screen_types[name](self, self.game_surface, self.save_manager)
+        return self.menu_screens[name]
+
     def set_track_name(self, track_name: str) -> None:
         """Allows Track Selection screen to set the name of the track that the user chose"""
+        if self.track_name and self.track_name != track_name:
+            # The player backed out of the last track they chose, so stop loading it (or holding it in memory)
+            self.assets.cancel_preloads(self.track_name)
         self.track_name = track_name
+        # Build the track and the race screens while the player picks a car and difficulty
+        Track.preload(track_name, self.assets)
+        Race.preload(track_name, self.assets)
 
     def set_difficulty(self, difficulty: str) -> None:
         """Allows Difficulty Selection screen to set the difficulty that the user chose"""
@@ -98,12 +121,14 @@ class Game:
         self.car_index = car_index
         self.style_index = style_index
 
-    def draw_letterboxed_surface(self) -> None:
-        """Calculates letterbox scaling and blits the game_surface to the screen"""
+    def resize_window(self, size: tuple[int, int]) -> None:
+        """Resizes the window (on a VIDEORESIZE event) and makes the letterbox be worked out again"""
+        self.screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+        self._letterbox_window_size = None
 
-        window_width, window_height = self.screen.get_size()
-        if window_width == 0 or window_height == 0:
-            return  # Avoid division by zero if window is minimized
+    def _update_letterbox(self, window_width: int, window_height: int) -> None:
+        """Calculates letterbox scaling for the window size and clears the borders around it"""
+        self._letterbox_window_size = (window_width, window_height)
 
         # Calculate aspect ratios
         window_aspect: float = window_width / window_height
@@ -122,13 +147,59 @@ class Game:
             new_height = int(constants.HEIGHT * self.scale_factor)
 
         # Calculate offsets for centering
-        self.offset_x: int = (window_width - new_width) // 2
-        self.offset_y: int = (window_height - new_height) // 2
+        self.offset_x = (window_width - new_width) // 2
+        self.offset_y = (window_height - new_height) // 2
+        self._letterbox_rect = pygame.Rect(self.offset_x, self.offset_y, new_width, new_height)
 
-        # Scale and blit
-        scaled_surface: pygame.Surface = pygame.transform.scale(self.game_surface, (new_width, new_height))
+        # Nothing else draws outside the letterbox, so the borders stay black until the next resize
         self.screen.fill((0, 0, 0))
-        self.screen.blit(scaled_surface, (self.offset_x, self.offset_y))
+
+    def draw_letterboxed_surface(self) -> None:
+        """Scales the game_surface into the letterbox on the screen"""
+
+        window_width, window_height = self.screen.get_size()
+        if window_width == 0 or window_height == 0:
+            return  # Avoid division by zero if window is minimized
+        if self._letterbox_window_size != (window_width, window_height):
+            self._update_letterbox(window_width, window_height)
+
+        if self._letterbox_rect.size == self.game_surface.get_size():
+            self.screen.blit(self.game_surface, self._letterbox_rect)
+            return
+
+        # Scale straight into the window rather than into a new surface that then has to be blitted
+        letterbox: pygame.Surface = self.screen.subsurface(self._letterbox_rect)
+        if self.save_manager.get_scale_quality() == constants.SCALE_QUALITY_SMOOTH:
+            pygame.transform.smoothscale(self.game_surface, self._letterbox_rect.size, letterbox)
+        else:
+            pygame.transform.scale(self.game_surface, self._letterbox_rect.size, letterbox)
+
+    def update_letterboxed_rects(self, rects: list[pygame.Rect]) -> None:
+        """Scales just the given areas of the game_surface into the letterbox and updates them in the window, for
+        frames where little changed (call draw_letterboxed_surface first so the letterbox is up to date)"""
+        game_rect: pygame.Rect = self.game_surface.get_rect()
+        letterbox_width, letterbox_height = self._letterbox_rect.size
+
+        # Grow each area out to whole blocks of source pixels that map onto whole blocks of window pixels, so it
+        # scales to exactly the pixels a full frame would have
+        block_width: int = self.width // math.gcd(self.width, letterbox_width)
+        block_height: int = self.height // math.gcd(self.height, letterbox_height)
+        window_rects: list[pygame.Rect] = []
+        for rect in rects:
+            rect = rect.clip(game_rect)
+            if not rect:
+                continue
+            left: int = rect.left // block_width * block_width
+            top: int = rect.top // block_height * block_height
+            right: int = min(-(-rect.right // block_width) * block_width, self.width)
+            bottom: int = min(-(-rect.bottom // block_height) * block_height, self.height)
+            window_rect: pygame.Rect = pygame.Rect(
+                self.offset_x + left * letterbox_width // self.width, self.offset_y + top * letterbox_height // self.height,
+                (right - left) * letterbox_width // self.width, (bottom - top) * letterbox_height // self.height)
+            pygame.transform.scale(self.game_surface.subsurface((left, top, right - left, bottom - top)),
+                                   window_rect.size, self.screen.subsurface(window_rect))
+            window_rects.append(window_rect)
+        pygame.display.update(window_rects)
 
     def _play_intro_music(self):
         if not pygame.mixer.music.get_busy():
@@ -137,12 +208,12 @@ class Game:
             pygame.mixer.music.play(-1)
 
     def _handle_events(self):
-        events = pygame.event.get()
+        events = self.frame_scheduler.get_events()
         for event in events:
             if event.type == pygame.QUIT:
                 utilities.quit_game()
             if event.type == pygame.VIDEORESIZE:
-                self.screen = pygame.display.set_mode(event.size, pygame.RESIZABLE)
+                self.resize_window(event.size)
         return events
 
     def start(self) -> None:
@@ -150,9 +221,10 @@ class Game:
 
         pygame.mouse.set_visible(False)
         self._play_intro_music()
-        if not self.title_screen.play_intro(self.screen):
+        if not self.title_screen.play_intro():
             utilities.quit_game()
         pygame.mouse.set_visible(False)
+        self._letterbox_window_size = None  # The intro drew its own letterbox, so clear its borders
 
         self.current_screen = self.title_screen.name
         running: bool = True
@@ -162,8 +234,8 @@ class Game:
             self.get_scaled_mouse_pos()
 
             next_action: str = constants.NO_ACTION_CODE
-            if not self.menu_screens[self.current_screen].transitioning:
-                next_action = self.menu_screens[self.current_screen].handle_events(events, self.scaled_mouse_pos)
+            if not self.get_menu_screen(self.current_screen).transitioning:
+                next_action = self.get_menu_screen(self.current_screen).handle_events(events, self.scaled_mouse_pos)
 
             if next_action == constants.EXIT_GAME_CODE:
                 utilities.quit_game()
@@ -172,28 +244,59 @@ class Game:
                 self.next_screen = next_action
                 start_transition: bool = True
                 backwards: bool = False if self.menu_screen_indices[self.next_screen] > self.menu_screen_indices[self.current_screen] else True
-                self.menu_screens[self.current_screen].initialize_transition(start_transition=start_transition, backwards=backwards)
+                self.get_menu_screen(self.current_screen).initialize_transition(start_transition=start_transition, backwards=backwards)
 
-            if self.next_screen != "" and not self.menu_screens[self.current_screen].transitioning:
+            if self.next_screen != "" and not self.get_menu_screen(self.current_screen).transitioning:
                 if self.next_screen != constants.RACE_SCREEN_NAME:
                     start_transition: bool = False
                     backwards: bool = False if self.menu_screen_indices[self.next_screen] > self.menu_screen_indices[self.current_screen] else True
-                    self.menu_screens[self.next_screen].initialize_transition(start_transition=start_transition, backwards=backwards)
+                    self.get_menu_screen(self.next_screen).initialize_transition(start_transition=start_transition, backwards=backwards)
                     self.current_screen = self.next_screen
                     self.next_screen = ""
                 else:
                     self._start_race()
+                    self._menu_frame_screen = ""
                     self.save_manager.load_data()
-                    self.track_selection = TrackSelection(self, self.game_surface, self.save_manager)
-                    self.menu_screens[constants.TRACK_SELECTION_NAME] = self.track_selection
+                    del self.menu_screens[constants.TRACK_SELECTION_NAME]  # Rebuilt to show the new personal bests
                     self.current_screen = constants.TRACK_SELECTION_NAME
                     self.next_screen = ""
 
-            self.menu_screens[self.current_screen].draw()
+            self._draw_menu_frame()
+            if self.get_menu_screen(self.current_screen).transitioning or self.next_screen != "":
+                self.frame_scheduler.keep_active()
+            self.frame_scheduler.tick()
+
+    def _draw_menu_frame(self) -> None:
+        """Draws the current menu screen and cursor, updating only the areas that changed unless the menu asks for
+        a full redraw (e.g. during transitions)"""
+        menu_screen = self.get_menu_screen(self.current_screen)
+        dirty_rects: Optional[list[pygame.Rect]] = menu_screen.get_dirty_rects()
+        if (dirty_rects is None or self._menu_frame_screen != self.current_screen
+                or self._letterbox_window_size != self.screen.get_size()
+                or self.save_manager.get_scale_quality() != constants.SCALE_QUALITY_NEAREST):
+            # Smooth scaling blends across the edges of a region, so it always scales the whole frame
+            menu_screen.draw()
+            self._menu_frame.blit(self.game_surface, (0, 0))
+            self._menu_frame_screen = self.current_screen
             self.draw_cursor()
             self.draw_letterboxed_surface()
             pygame.display.flip()
-            self.ui_clock.tick(60)
+            return
+
+        previous_cursor_rect: Optional[pygame.Rect] = self.cursor_rect
+        if dirty_rects:
+            menu_screen.draw()
+            for rect in dirty_rects:
+                self._menu_frame.blit(self.game_surface, rect, rect)
+        elif self._get_cursor_rect() == previous_cursor_rect:
+            return  # Nothing changed
+        elif previous_cursor_rect is not None:
+            self.game_surface.blit(self._menu_frame, previous_cursor_rect, previous_cursor_rect)
+        self.draw_cursor()
+
+        if self.cursor_rect != previous_cursor_rect:
+            dirty_rects.extend(rect for rect in (previous_cursor_rect, self.cursor_rect) if rect is not None)
+        self.update_letterboxed_rects(dirty_rects)
 
     def get_scaled_mouse_pos(self) -> None:
         """Scales mouse position from window coordinates to game_surface coordinates"""
@@ -209,11 +312,18 @@ class Game:
     def _set_scaled_mouse_pos(self, x: int, y: int) -> None:
         self.scaled_mouse_pos = (x, y)
 
-    def draw_cursor(self) -> None:
-        """Draws the custom cursor on the game surface"""
+    def _get_cursor_rect(self) -> Optional[pygame.Rect]:
+        """Returns where the custom cursor goes on the game surface, or None if it is hidden"""
         if (self.scaled_mouse_pos[0] not in [0, constants.WIDTH - 1]
             and self.scaled_mouse_pos[1] not in [0, constants.HEIGHT - 1]):
-            self.game_surface.blit(self.custom_cursor_image, self.scaled_mouse_pos)
+            return self.custom_cursor_image.get_rect(topleft=self.scaled_mouse_pos)
+        return None
+
+    def draw_cursor(self) -> None:
+        """Draws the custom cursor on the game surface"""
+        self.cursor_rect = self._get_cursor_rect()
+        if self.cursor_rect is not None:
+            self.game_surface.blit(self.custom_cursor_image, self.cursor_rect)
 
     def _start_race(self) -> None:
         """Starts the race loop"""
@@ -1,14 +1,18 @@
-import csv
 import json
 from pathlib import Path
 from typing import Optional
 
 import pygame
 
+from ai_opponents import AIOpponents
 from car import Car
 import constants
+from frame_scheduler import FrameScheduler
 from save_manager import SaveManager
+from replay import GhostTrajectory, InputRecorder, ReplayHeader, ReplayRecorder
+from simulation import RaceSimulation, find_split_times
 from track import Track
+from ui_elements import TimerText
 import utilities
 
 
@@ -19,6 +23,7 @@ class Race:
 
         # General
         self.game = game
+        self.assets = game.assets
         self.save_manager: SaveManager = save_manager
         self.difficulty = difficulty
 
@@ -28,7 +33,7 @@ class Race:
 
         # Track
         self.track_name: str = track_name
-        self.track: Track = Track(self.track_name)
+        self.track: Track = Track(self.track_name, self.assets)
 
         # Pause menu
         self.pause_hover_index: int
@@ -45,26 +50,22 @@ class Race:
                                                            constants.PAUSE_BUTTON_WIDTH, constants.PAUSE_BUTTON_HEIGHT)
         self.exit_button_rect: pygame.Rect = pygame.Rect(button_x, constants.PAUSE_EXIT_Y, constants.PAUSE_BUTTON_WIDTH,
                                                          constants.PAUSE_BUTTON_HEIGHT)
-        self.pause_image_left: pygame.Surface = pygame.image.load(
-            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="left")).convert_alpha()
-        self.pause_image_left = pygame.transform.scale(self.pause_image_left, (constants.WIDTH, constants.HEIGHT))
-        self.pause_default_image_right: pygame.Surface = pygame.image.load(
-            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="right")).convert_alpha()
-        self.pause_default_image_right = pygame.transform.scale(self.pause_default_image_right,
-                                                                (constants.WIDTH, constants.HEIGHT))
-        self.pause_image_hover_1: pygame.Surface = pygame.image.load(
-            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="1")).convert_alpha()
-        self.pause_image_hover_1 = pygame.transform.scale(self.pause_image_hover_1, (constants.WIDTH, constants.HEIGHT))
-        self.pause_image_hover_2: pygame.Surface = pygame.image.load(
-            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="2")).convert_alpha()
-        self.pause_image_hover_2 = pygame.transform.scale(self.pause_image_hover_2, (constants.WIDTH, constants.HEIGHT))
-        self.pause_image_hover_3: pygame.Surface = pygame.image.load(
-            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="3")).convert_alpha()
-        self.pause_image_hover_3 = pygame.transform.scale(self.pause_image_hover_3, (constants.WIDTH, constants.HEIGHT))
+        self.pause_image_left: pygame.Surface = self.assets.load_image(
+            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="left"), True, constants.WIDTH, constants.HEIGHT)
+        self.pause_default_image_right: pygame.Surface = self.assets.load_image(
+            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="right"), True, constants.WIDTH, constants.HEIGHT)
+        self.pause_image_hover_1: pygame.Surface = self.assets.load_image(
+            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="1"), True, constants.WIDTH, constants.HEIGHT)
+        self.pause_image_hover_2: pygame.Surface = self.assets.load_image(
+            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="2"), True, constants.WIDTH, constants.HEIGHT)
+        self.pause_image_hover_3: pygame.Surface = self.assets.load_image(
+            constants.PAUSE_MENU_IMAGE_PATH.format(image_name="3"), True, constants.WIDTH, constants.HEIGHT)
         self.pause_image_right: pygame.Surface = self.pause_default_image_right
 
         # Replay
         self.current_race_file: Path = Path(constants.REPLAY_FILE_PATH.format(track_name=self.track.name))
+        self.replay_recorder: ReplayRecorder = ReplayRecorder(self.current_race_file)
+        self.input_recorder: InputRecorder = InputRecorder()
 
         # Race Over Menu
         self.race_over_hover_index: int = 0
@@ -75,39 +76,32 @@ class Race:
         self.exit_race_over_button_rect: pygame.Rect = pygame.Rect(race_over_button_x, constants.RACE_OVER_EXIT_Y,
                                                                    constants.RACE_OVER_BUTTON_WIDTH,
                                                                    constants.RACE_OVER_BUTTON_HEIGHT)
-        self.race_over_image_left: pygame.Surface = pygame.image.load(
-            constants.RACE_OVER_IMAGE_PATH.format(image_name="left")).convert_alpha()
-        self.race_over_image_left = pygame.transform.scale(self.race_over_image_left,
-                                                           (constants.WIDTH, constants.HEIGHT))
-        self.race_over_default_image_right: pygame.Surface = pygame.image.load(
-            constants.RACE_OVER_IMAGE_PATH.format(image_name="right")).convert_alpha()
-        self.race_over_default_image_right = pygame.transform.scale(self.race_over_default_image_right,
-                                                                    (constants.WIDTH, constants.HEIGHT))
-        self.race_over_image_hover_1: pygame.Surface = pygame.image.load(
-            constants.RACE_OVER_IMAGE_PATH.format(image_name="1")).convert_alpha()
-        self.race_over_image_hover_1 = pygame.transform.scale(self.race_over_image_hover_1,
-                                                              (constants.WIDTH, constants.HEIGHT))
-        self.race_over_image_hover_2: pygame.Surface = pygame.image.load(
-            constants.RACE_OVER_IMAGE_PATH.format(image_name="2")).convert_alpha()
-        self.race_over_image_hover_2 = pygame.transform.scale(self.race_over_image_hover_2,
-                                                              (constants.WIDTH, constants.HEIGHT))
+        self.race_over_image_left: pygame.Surface = self.assets.load_image(
+            constants.RACE_OVER_IMAGE_PATH.format(image_name="left"), True, constants.WIDTH, constants.HEIGHT)
+        self.race_over_default_image_right: pygame.Surface = self.assets.load_image(
+            constants.RACE_OVER_IMAGE_PATH.format(image_name="right"), True, constants.WIDTH, constants.HEIGHT)
+        self.race_over_image_hover_1: pygame.Surface = self.assets.load_image(
+            constants.RACE_OVER_IMAGE_PATH.format(image_name="1"), True, constants.WIDTH, constants.HEIGHT)
+        self.race_over_image_hover_2: pygame.Surface = self.assets.load_image(
+            constants.RACE_OVER_IMAGE_PATH.format(image_name="2"), True, constants.WIDTH, constants.HEIGHT)
         self.race_over_image_right: pygame.Surface = self.race_over_default_image_right
         self.formatted_time: str
-        self.time_font: pygame.font.Font = pygame.font.Font(constants.TEXT_FONT_PATH, 60)
+        self.time_font: pygame.font.Font = self.assets.load_font(constants.TEXT_FONT_PATH, 60)
         self.time_surface: pygame.Surface
         self.time_rect: pygame.Rect
         self.time_shadow_surface: pygame.Surface
         self.time_shadow_rect: pygame.Rect
 
         # Lap Timers
-        self.timer_font: pygame.font.Font = pygame.font.Font(constants.FALLBACK_FONT_PATH, 30)
-        self.timer_font.set_bold(True)
+        self.timer_font: pygame.font.Font = self.assets.load_font(constants.FALLBACK_FONT_PATH, 30, bold=True)
+        self.timer_text: TimerText = TimerText(self.timer_font, constants.TEXT_COLOR, (20, 50))
+        self.timer_shadow_text: TimerText = TimerText(self.timer_font, constants.TEXT_SHADOW_COLOR, (22, 52))
 
         # Sound and Music
-        self.next_lap_sound: pygame.mixer.Sound = pygame.mixer.Sound(
+        self.next_lap_sound: pygame.mixer.Sound = self.assets.load_sound(
             constants.TRACK_AUDIO_PATH.format(track_name="general", song_type="next_lap"))
         self.next_lap_sound.set_volume(self.sfx_volume)
-        self.respawn_sound: pygame.mixer.Sound = pygame.mixer.Sound(
+        self.respawn_sound: pygame.mixer.Sound = self.assets.load_sound(
             constants.TRACK_AUDIO_PATH.format(track_name="general", song_type="respawn"))
         self.respawn_sound.set_volume(self.sfx_volume)
 
@@ -117,7 +111,16 @@ class Race:
         self.user_car_config = constants.CAR_DEFINITIONS[self.user_car_index]
 
         self.user_car: Car = Car(self.game.game_surface, self.track.name, False, self.user_car_config,
-                                 self.user_style_index, self.key_bindings)
+                                 self.user_style_index, self.key_bindings, self.assets)
+        self.simulation: RaceSimulation = RaceSimulation(self.track, self.user_car,
+                                                         constants.NUM_LAPS[self.track.name])
+
+        # AI opponents, driving the same cars alongside the ghost for each of its difficulties (but not against a
+        # personal best)
+        self.ai_opponents: Optional[AIOpponents] = None
+        if self.difficulty in constants.AI_DIFFICULTY_TIERS and constants.NUM_AI_OPPONENTS > 0:
+            self.ai_opponents = AIOpponents(self.game.game_surface, self.track, self.difficulty,
+                                            self.user_style_index, assets=self.assets)
 
         # User Data
         self.personal_best_time: float = float("inf")
@@ -126,35 +129,45 @@ class Race:
         # Use the separate ghost definition from constants
         self.ghost_car_config = constants.GHOST_CAR_DEFINITION
         self.ghost_car = Car(self.game.game_surface, self.track.name, True, self.ghost_car_config, 0,
-                             {})  # Ghost needs no keys
+                             {}, self.assets)  # Ghost needs no keys
 
         # Determine Ghost File based on difficulty
         if self.difficulty == constants.GHOST_DIFFICULTY_PERSONAL_BEST:
             self.ghost_filename = constants.PERSONAL_BEST_FILE_PATH.format(track_name=self.track.name)
             self.ghost_metadata_path = constants.PERSONAL_BEST_METADATA_FILE_PATH.format(track_name=self.track.name)
+            self.ghost_binary_path = constants.PERSONAL_BEST_BINARY_FILE_PATH.format(track_name=self.track.name)
         else:
             self.ghost_filename = constants.GHOST_FILE_PATH.format(track_name=self.track.name,
                                                                    difficulty=self.difficulty)
             self.ghost_metadata_path = constants.GHOST_METADATA_FILE_PATH.format(track_name=self.track.name,
                                                                                  difficulty=self.difficulty)
+            self.ghost_binary_path = constants.GHOST_BINARY_FILE_PATH.format(track_name=self.track.name,
+                                                                             difficulty=self.difficulty)
 
-        self.next_ghost_index: int = 1
+        self.ghost_trajectory: Optional[GhostTrajectory] = None
+        self.next_ghost_index: int = 0
         self.show_ghost: bool = True
         self.ghost_found: bool = False
         self.ghost_done: bool = False
         self.ghost_total_time: float = float("inf")
+        self.ghost_split_times: list[float] = []
+
+        # Difference to the ghost at the last checkpoint
+        self.split_delta_time_s: float = -constants.SPLIT_DELTA_DISPLAY_S  # Race time the last split was set at
+        self.split_delta_surf: Optional[pygame.Surface] = None
+        self.split_delta_shadow: Optional[pygame.Surface] = None
 
         # Time
+        self.physics_accumulator_ms: float = 0.0
         self.elapsed_race_time_ms: int = 0
         self.elapsed_race_time_s: float = 0.0
         self.current_time: int
 
         # Race State
-        self.clock: pygame.time.Clock = pygame.time.Clock()
+        self.frame_scheduler: FrameScheduler = FrameScheduler(constants.RENDER_FPS)
+        self.keys: pygame.key.ScancodeWrapper = pygame.key.get_pressed()
         self.running: bool = True
         self.compared_to_best: bool = False
-        self.current_lap: int = 1
-        self.has_checkpoint: bool = False
         self.countdown_done: bool = False
         self.during_race: bool = False
         self.race_over: bool = False
@@ -171,7 +184,7 @@ class Race:
         self.lap_shadow: pygame.Surface
 
         # Fonts
-        self.countdown_font: pygame.font.Font = pygame.font.Font(constants.TEXT_FONT_PATH, 120)
+        self.countdown_font: pygame.font.Font = self.assets.load_font(constants.TEXT_FONT_PATH, 120)
 
         # Transitions
         self.transitioning: bool = False
@@ -185,18 +198,62 @@ class Race:
         self.transition_next_duration_ms: int = 400
         self.transition_next_pause_time: int = 400
 
+    @staticmethod
+    def preload(track_name: str, assets) -> None:
+        """Starts loading the AI's fields for the track and the pause and race over screens in the background, so the
+        first race doesn't wait on them"""
+        if constants.NUM_AI_OPPONENTS > 0:
+            AIOpponents.preload(track_name, assets)
+        for image_name in ("left", "right", "1", "2", "3"):
+            assets.preload_image(constants.PAUSE_MENU_IMAGE_PATH.format(image_name=image_name), True,
+                                 constants.WIDTH, constants.HEIGHT)
+        for image_name in ("left", "right", "1", "2"):
+            assets.preload_image(constants.RACE_OVER_IMAGE_PATH.format(image_name=image_name), True,
+                                 constants.WIDTH, constants.HEIGHT)
+
     def _get_current_time(self):
         """Get the current time since the program started in ms"""
         self.current_time = pygame.time.get_ticks()
 
     def _next_frame(self):
-        """Establish a frame rate of 60 FPS"""
-        self.clock.tick(60)
+        """Limit the render frame rate and bank the time that passed for the fixed-step physics"""
+        # Only the pause screen idles, once its overlay has finished sliding in
+        if (not self.is_paused or self.transitioning
+                or pygame.time.get_ticks() - self.pause_start_time_ms < constants.PAUSE_TRANSITION_DURATION_MS):
+            self.frame_scheduler.keep_active()
+        frame_time_ms: int = self.frame_scheduler.tick()
+        if (self.during_race or self.race_over) and not self.is_paused:
+            self.physics_accumulator_ms += frame_time_ms
+
+    def _run_physics_steps(self) -> None:
+        """Advances the physics in fixed steps until it has caught up with the time that passed"""
+        steps: int = 0
+        while self.physics_accumulator_ms >= constants.PHYSICS_STEP_MS:
+            if steps == constants.MAX_PHYSICS_STEPS_PER_FRAME:
+                self.physics_accumulator_ms = 0.0
+                break
+            self._step_physics()
+            self.physics_accumulator_ms -= constants.PHYSICS_STEP_MS
+            steps += 1
+
+    def _step_physics(self) -> None:
+        """Simulates a single fixed physics step"""
+        is_race_active: bool = self.during_race
+        input_bits: int = self.user_car.get_input_bits(self.keys) if is_race_active else 0
+        events: list[str] = self.simulation.step(input_bits)
+        if self.ai_opponents is not None:
+            self.ai_opponents.step()
+        if is_race_active:
+            self.input_recorder.record(input_bits)
+            self.next_ghost_index += 1
+            self._get_elapsed_race_time()
+            self._handle_simulation_events(events)
+            if self.elapsed_race_time_s < (self.personal_best_time + 1):
+                self.user_car.log_properties(self.replay_recorder)
 
-    def _set_max_speed(self):
-        """Set the maximum speed of the car based on the constants and the car's off-road status"""
-        self.user_car.is_off_road = True if self.track.is_off_road(self.user_car.x, self.user_car.y) else False
-        self.user_car.set_max_speed()
+    def _get_interpolation_alpha(self) -> float:
+        """How far the render frame is between the previous and the current physics step"""
+        return min(self.physics_accumulator_ms / constants.PHYSICS_STEP_MS, 1.0)
 
     def start(self) -> bool:
         """The main game loop when the user is racing on a track"""
@@ -207,9 +264,9 @@ class Race:
         while self.running:
             self._next_frame()
             self._get_current_time()
-            self._get_elapsed_race_time()
             self.game.get_scaled_mouse_pos()
             self._handle_race_events()
+            self.keys = pygame.key.get_pressed()
             if not pygame.mixer.music.get_busy() and not self.race_over and not self.is_paused:
                 self._play_next_track()
             if self.is_paused:
@@ -223,17 +280,9 @@ class Race:
                     case "resume":
                         self._unpause()
             elif self.during_race:
-                self._set_max_speed()
-                self.user_car.handle_input(pygame.key.get_pressed(), self.during_race)
-                self.user_car.update_position()
-                self._check_out_of_bounds()
-                self._check_lap_completion()
-                if self.elapsed_race_time_s < (self.personal_best_time + 1):
-                    self.user_car.log_properties(self.track_name)
+                self._run_physics_steps()
             elif self.race_over:
-                self._set_max_speed()
-                self.user_car.handle_input(pygame.key.get_pressed(), self.during_race)
-                self.user_car.update_position()
+                self._run_physics_steps()
                 if not self.compared_to_best:
                     self._compare_to_best()
                     self._check_unlocks()
@@ -255,16 +304,15 @@ class Race:
 
     def _clean_up(self):
         """Performs clean up actions before exiting the race"""
-        if self.current_race_file.exists():
-            self.current_race_file.unlink()
+        self.replay_recorder.discard()
+        if self.ghost_trajectory is not None:
+            self.ghost_trajectory.close()
         pygame.mixer.music.stop()
 
     def _get_elapsed_race_time(self):
-        """Gets the """
-        if self.during_race and not self.is_paused:
-            self.elapsed_race_time_ms = self.current_time - self.race_start_time_ms
-        elif self.during_race and self.is_paused:
-            self.elapsed_race_time_ms = self.pause_start_time_ms - self.race_start_time_ms
+        """Gets the race time from the simulation (the physics steps, or the exact finish line crossing once the race
+        is over), so it always agrees with the ghost and the replay"""
+        self.elapsed_race_time_ms = int(self.simulation.get_elapsed_time() * 1000)
         self.elapsed_race_time_s = self.elapsed_race_time_ms / 1000.0
 
     def _draw_race_frame(self) -> None:
@@ -290,9 +338,11 @@ class Race:
     def _draw_race(self) -> None:
         """Draws all the visual elements for the race"""
 
-        # Calculate camera offset to center car
-        self.camera_x = self.user_car.x - (constants.WIDTH / 2)
-        self.camera_y = self.user_car.y - (constants.HEIGHT / 2)
+        # Calculate camera offset to center car, interpolated between physics steps
+        alpha: float = self._get_interpolation_alpha()
+        render_x, render_y, _ = self.user_car.get_render_state(alpha)
+        self.camera_x = render_x - (constants.WIDTH / 2)
+        self.camera_y = render_y - (constants.HEIGHT / 2)
 
         # Pass camera offset to track drawing
         self.track.draw(self.game.game_surface, self.camera_x, self.camera_y)
@@ -300,12 +350,14 @@ class Race:
         # Draw the ghost
         if self.ghost_found and not self.ghost_done and not self.race_over:
             if self.during_race:
-                self._draw_ghost()
-                if not self.is_paused:
-                    self.next_ghost_index += 1
+                self._draw_ghost(alpha)
+
+        # Draw the AI opponents
+        if self.ai_opponents is not None and not self.race_over:
+            self.ai_opponents.draw(self.camera_x, self.camera_y, alpha)
 
         # Draw user car
-        self.user_car.draw(self.camera_x, self.camera_y)
+        self.user_car.draw(self.camera_x, self.camera_y, alpha)
 
         # Overlays
         if not self.race_over:
@@ -334,14 +386,11 @@ class Race:
 
     def _draw_checkpoints(self):
         """For debugging the location of checkpoints"""
-        pygame.draw.rect(self.game.game_surface, (100, 10, 10), pygame.Rect(self.track.checkpoint_1.x - self.camera_x,
-                                                                            self.track.checkpoint_1.y - self.camera_y,
-                                                                            self.track.checkpoint_1.width,
-                                                                            self.track.checkpoint_1.height))
-        pygame.draw.rect(self.game.game_surface, (10, 100, 10), pygame.Rect(self.track.finish_line.x - self.camera_x,
-                                                                            self.track.finish_line.y - self.camera_y,
-                                                                            self.track.finish_line.width,
-                                                                            self.track.finish_line.height))
+        for gate in self.track.sector_gates:
+            color = (10, 100, 10) if gate is self.track.finish_gate else (100, 10, 10)
+            pygame.draw.line(self.game.game_surface, color,
+                             (gate.start[0] - self.camera_x, gate.start[1] - self.camera_y),
+                             (gate.end[0] - self.camera_x, gate.end[1] - self.camera_y), 5)
 
     def _draw_pause_menu(self) -> None:
         """Draws the pause menu overlay and buttons onto the game_surface"""
@@ -349,8 +398,8 @@ class Race:
         # Control transition
         current_time: int = pygame.time.get_ticks()
         time_elapsed_ms: int = current_time - self.pause_start_time_ms
-        transition_duration_ms: int = 250
-        percent_progress: float = min(time_elapsed_ms, transition_duration_ms) / transition_duration_ms
+        percent_progress: float = (min(time_elapsed_ms, constants.PAUSE_TRANSITION_DURATION_MS)
+                                   / constants.PAUSE_TRANSITION_DURATION_MS)
 
         # Adjust the semi-transparent overlay
         dark_overlay_opacity: int = int(percent_progress * constants.PAUSE_OVERLAY_OPACITY)
@@ -369,16 +418,20 @@ class Race:
     def _draw_race_ui(self) -> None:
         """Draws the main race UI elements (lap, times) onto the game surface"""
 
-        # Total Time
-        total_time_str: str = self._format_time_simple()
-        total_time_surf: pygame.Surface = self.timer_font.render(total_time_str, True, constants.TEXT_COLOR)
-        total_time_shadow: pygame.Surface = self.timer_font.render(total_time_str, True, constants.TEXT_SHADOW_COLOR)
-
-        # Blit
+        # Lap
         self.game.game_surface.blit(self.lap_shadow, (22, 12))
         self.game.game_surface.blit(self.lap_surf, (20, 10))
-        self.game.game_surface.blit(total_time_shadow, (22, 52))
-        self.game.game_surface.blit(total_time_surf, (20, 50))
+
+        # Total Time (MM:SS:cc)
+        self.timer_shadow_text.draw(self.game.game_surface, self.elapsed_race_time_ms)
+        self.timer_text.draw(self.game.game_surface, self.elapsed_race_time_ms)
+
+        # Split time difference to the ghost
+        if (self.split_delta_surf is not None
+                and self.elapsed_race_time_s - self.split_delta_time_s < constants.SPLIT_DELTA_DISPLAY_S):
+            self.game.game_surface.blit(self.split_delta_shadow, (constants.SPLIT_DELTA_POSITION[0] + 2,
+                                                                  constants.SPLIT_DELTA_POSITION[1] + 2))
+            self.game.game_surface.blit(self.split_delta_surf, constants.SPLIT_DELTA_POSITION)
 
     def _initialize_pause(self) -> None:
         """Perform one-time operations upon pausing the race"""
@@ -397,7 +450,7 @@ class Race:
 
     def _handle_race_events(self) -> None:
         """Handles key and button presses"""
-        self.events = pygame.event.get()
+        self.events = self.frame_scheduler.get_events()
         for event in self.events:
             if event.type == pygame.QUIT:
                 self._clean_up()
@@ -413,16 +466,20 @@ class Race:
                 if event.key == self.key_bindings[constants.KEY_ACTION_TOGGLE_GHOST]:
                     self.show_ghost = not self.show_ghost
             if event.type == pygame.VIDEORESIZE:
-                self.game.screen = pygame.display.set_mode(event.size, pygame.RESIZABLE)
+                self.game.resize_window(event.size)
 
     def _initialize_race(self) -> None:
         """Perform initial actions before the race begins"""
         self._get_personal_best_time()
         self._create_replay_file()
+        self.ghost_split_times = []
+        self.split_delta_surf = None
         if self.show_ghost:
             self.ghost_found = self._get_ghost_info()
             if self.ghost_found:
+                self._load_ghost_trajectory()
                 self._calculate_ghost_time()
+                self._find_ghost_split_times()
         self._render_lap_text()
         self.user_car.set_respawn_point(self.user_car.start_x, self.user_car.start_y, self.user_car.start_angle)
         self.initialize_transition(start_transition=False, backwards=False)
@@ -443,12 +500,33 @@ class Race:
 
     def _create_replay_file(self) -> None:
         """Creates a new .csv file when the race begins to log the user's car position"""
-        with open(constants.REPLAY_FILE_PATH.format(track_name=self.track.name), "w", newline=""):
-            pass
+        self.replay_recorder.start()
+        self.input_recorder.start()
 
     def _get_ghost_info(self) -> bool:
         """Returns True if the info for the ghost exists and False otherwise"""
-        return Path(self.ghost_filename).exists()
+        return Path(self.ghost_binary_path).exists() or Path(self.ghost_filename).exists()
+
+    def _load_ghost_trajectory(self) -> None:
+        """Parses the ghost file once so that each frame only has to index into it"""
+        try:
+            self.ghost_trajectory = GhostTrajectory.load(self.ghost_binary_path, self.ghost_filename,
+                                                         memory_map=True)
+        except (OSError, ValueError):
+            print("Error loading ghost replay")
+            self.ghost_trajectory = None
+            self.ghost_found = False
+
+    def _find_ghost_split_times(self) -> None:
+        """Gets the ghost's split times to compare the user's against"""
+        if self.ghost_trajectory is None:
+            return
+        if self.ghost_trajectory.split_times is not None:
+            self.ghost_split_times = self.ghost_trajectory.split_times
+            return
+        # Replays saved before split times were recorded (version 1 or .csv) have them worked out from the ghost's path
+        # instead, which reads the whole file
+        self.ghost_split_times = find_split_times(self.track, self.ghost_trajectory.get_frames())
 
     def _calculate_ghost_time(self):
         """Estimates ghost finish time, preferring JSON metadata if available"""
@@ -463,13 +541,12 @@ class Race:
             except Exception:
                 pass  # Fallback to CSV method
 
-        # Fallback: Count CSV lines
-        try:
-            with open(self.ghost_filename, "r") as f:
-                row_count = sum(1 for _ in f)
-            # 60 FPS recording rate
-            self.ghost_total_time = row_count / 60.0
-        except Exception:
+        # Fallback: Use the binary replay header or count recorded frames at the physics rate
+        if self.ghost_trajectory is not None and self.ghost_trajectory.total_time is not None:
+            self.ghost_total_time = self.ghost_trajectory.total_time
+        elif self.ghost_trajectory is not None:
+            self.ghost_total_time = len(self.ghost_trajectory) / constants.PHYSICS_FPS
+        else:
             self.ghost_total_time = float("inf")
 
     def _check_unlocks(self):
@@ -523,45 +600,26 @@ class Race:
                     return "exit_to_menu"
         return ""
 
-    def _check_out_of_bounds(self) -> None:
-        """Checks if the car is outside the hard map limits and respawns it."""
-        if self.track.is_out_of_bounds(self.user_car.x, self.user_car.y):
-            self.respawn_sound.play()
-            self.user_car.respawn()
-
-    def _check_lap_completion(self) -> None:
-        """Checks for checkpoint and finish line crosses and updates lap count"""
-
-        # Check for checkpoint FIRST
-        if self.track.check_checkpoint(self.user_car.x, self.user_car.y):
-            if not self.has_checkpoint:
-                self.has_checkpoint = True
-                # Update the car's respawn point to this checkpoint
-                cp_x = self.track.checkpoint_1.centerx
-                cp_y = self.track.checkpoint_1.centery
-                cp_angle = constants.CHECKPOINT_ANGLES[self.track.name]
-                self.user_car.set_respawn_point(cp_x, cp_y, cp_angle)
-
-        # Check for finish line
-        if self.has_checkpoint and self.track.check_finish_line(self.user_car.x, self.user_car.y):
-            self.has_checkpoint = False
-            self.current_lap += 1
-            self._render_lap_text()
-
-            # Reset respawn point to the start line for the new lap
-            start_x = self.user_car.start_x
-            start_y = self.user_car.start_y
-            start_angle = self.user_car.start_angle
-            self.user_car.set_respawn_point(start_x, start_y, start_angle)
-
-            # Check if race is over
-            if self.current_lap > constants.NUM_LAPS[self.track.name]:
-                self.during_race = False
-                self.race_over = True
-                self.race_end_time_ms = pygame.time.get_ticks()
-                self._render_final_time()
-            else:
-                if self.current_lap == constants.NUM_LAPS[self.track.name]:
+    def _handle_simulation_events(self, events: list[str]) -> None:
+        """Plays sounds and updates the race state for respawns and lap gate crossings"""
+        for event in events:
+            if event == constants.RESPAWN_EVENT_CODE:
+                self.respawn_sound.play()
+            elif event == constants.CHECKPOINT_EVENT_CODE:
+                self._render_split_delta()
+            elif event in (constants.NEXT_LAP_EVENT_CODE, constants.FINAL_LAP_EVENT_CODE,
+                           constants.RACE_FINISHED_EVENT_CODE):
+                self._render_split_delta()
+                self._render_lap_text()
+                self.replay_recorder.flush()
+
+                # Check if race is over
+                if event == constants.RACE_FINISHED_EVENT_CODE:
+                    self.during_race = False
+                    self.race_over = True
+                    self.race_end_time_ms = pygame.time.get_ticks()
+                    self._render_final_time()
+                elif event == constants.FINAL_LAP_EVENT_CODE:
                     self._play_next_track()
                 else:
                     self.next_lap_sound.play()
@@ -579,21 +637,37 @@ class Race:
         elif 0 < elapsed < 4000:
             if not self.during_race:
                 self.during_race = True
+                self.simulation.start_race()
+                if self.ai_opponents is not None:
+                    self.ai_opponents.start_race()
                 self.race_start_time_ms = pygame.time.get_ticks()
             countdown_text = "Go!"
         elif elapsed >= 4000:
             self.countdown_done = True
         if countdown_text:
-            countdown_surface: pygame.Surface = self.countdown_font.render(countdown_text, True, constants.TEXT_COLOR)
+            countdown_surface: pygame.Surface = self.game.text_cache.render(self.countdown_font, countdown_text, True,
+                                                                            constants.TEXT_COLOR)
             countdown_rect: pygame.Rect = countdown_surface.get_rect(center=(constants.WIDTH / 2, constants.HEIGHT / 2))
             self.game.game_surface.blit(countdown_surface, countdown_rect)
 
     def _render_lap_text(self):
         """Renders the lap text whenever the user reaches a new lap"""
-        self.lap_str: str = f"Lap {self.current_lap}/{constants.NUM_LAPS[self.track.name]}"
+        self.lap_str: str = f"Lap {self.simulation.lap_tracker.current_lap}/{constants.NUM_LAPS[self.track.name]}"
         self.lap_surf: pygame.Surface = self.timer_font.render(self.lap_str, True, constants.TEXT_COLOR)
         self.lap_shadow: pygame.Surface = self.timer_font.render(self.lap_str, True, constants.TEXT_SHADOW_COLOR)
 
+    def _render_split_delta(self) -> None:
+        """Renders the difference to the ghost's time at the split the user just set, if the ghost has one"""
+        split_times: list[float] = self.simulation.lap_tracker.split_times
+        if len(split_times) > len(self.ghost_split_times) or not self.show_ghost:
+            return
+        delta_s: float = split_times[-1] - self.ghost_split_times[len(split_times) - 1]
+        delta_str: str = f"{delta_s:+.2f}"
+        color: tuple[int, int, int] = constants.SPLIT_AHEAD_COLOR if delta_s < 0 else constants.SPLIT_BEHIND_COLOR
+        self.split_delta_surf = self.timer_font.render(delta_str, True, color)
+        self.split_delta_shadow = self.timer_font.render(delta_str, True, constants.TEXT_SHADOW_COLOR)
+        self.split_delta_time_s = split_times[-1]
+
     def _render_final_time(self):
         """Renders the final time when the user reaches finishes the race"""
         self.formatted_time = f"{self.elapsed_race_time_s:.2f} s"
@@ -607,6 +681,10 @@ class Race:
     def _compare_to_best(self) -> None:
         """Compare the current time to the personal best, and if it was beaten, replace the personal best"""
         self.compared_to_best = True
+        self.replay_recorder.close()
+        if self.ghost_trajectory is not None:
+            # The ghost is no longer drawn, and its file may be about to be replaced by the new personal best
+            self.ghost_trajectory.close()
         if self.elapsed_race_time_s < self.personal_best_time:
             personal_best_metadata_path: Path = Path(
                 constants.PERSONAL_BEST_METADATA_FILE_PATH.format(track_name=self.track.name))
@@ -620,9 +698,18 @@ class Race:
             if self.current_race_file.exists():
                 new_personal_best: Path = self.current_race_file.with_name(constants.PERSONAL_BEST_FILE_NAME)
                 self.current_race_file.replace(new_personal_best)
+            self.replay_recorder.save_binary(
+                constants.PERSONAL_BEST_BINARY_FILE_PATH.format(track_name=self.track.name),
+                ReplayHeader(self.track.name, self.user_car_index, self.user_style_index, self.elapsed_race_time_s,
+                             self.replay_recorder.num_samples,
+                             split_times=self.simulation.lap_tracker.split_times))
+            self.input_recorder.save(
+                constants.PERSONAL_BEST_INPUTS_FILE_PATH.format(track_name=self.track.name),
+                ReplayHeader(self.track.name, self.user_car_index, self.user_style_index, self.elapsed_race_time_s,
+                             self.input_recorder.num_inputs,
+                             split_times=self.simulation.lap_tracker.split_times))
             self.personal_best_time = self.elapsed_race_time_s
-        if self.current_race_file.exists():
-            self.current_race_file.unlink()
+        self.replay_recorder.discard()
 
     def _handle_race_over_menu(self) -> str:
         """Handles input for the race over menu"""
@@ -650,36 +737,21 @@ class Race:
                     return "exit_to_menu"
         return ""
 
-    def _draw_ghost(self):
-        """Retrieves the ghost's position at this frame and draws it on the screen, returning False if the ghost has finished the race"""
-        try:
-            found: bool = False
-            with open(self.ghost_filename, newline="") as file:
-                reader = csv.reader(file)
-                for i, row in enumerate(reader):
-                    if i != self.next_ghost_index:
-                        continue
-                    (
-                        self.ghost_car.x,
-                        self.ghost_car.y,
-                        self.ghost_car.move_angle,
-                        self.ghost_car.car_angle,
-                    ) = map(float, row)
-                    self.ghost_car.draw(self.camera_x, self.camera_y)
-                    found = True
-                    break
-            self.ghost_done = not found
-        except (FileNotFoundError, IndexError, ValueError):
-            self.ghost_found = False
-        except Exception:
-            self.ghost_found = False
-
-    def _format_time_simple(self) -> str:
-        """Formats time in MM:SS:ms"""
-        minutes: int = int(self.elapsed_race_time_s // 60)
-        seconds: int = int(self.elapsed_race_time_s % 60)
-        milliseconds: int = int((self.elapsed_race_time_ms % 1000) // 10)
-        return f"{minutes:02}:{seconds:02}:{milliseconds:02}"
+    def _draw_ghost(self, alpha: float):
+        """Retrieves the ghost's position at this physics step and draws it on the screen, marking the ghost as done once it has finished the race"""
+        frame = self.ghost_trajectory.get_frame(self.next_ghost_index)
+        if frame is None:
+            self.ghost_done = True
+            return
+        previous_frame = self.ghost_trajectory.get_frame(self.next_ghost_index - 1) or frame
+        self.ghost_car.prev_x, self.ghost_car.prev_y, _, self.ghost_car.prev_car_angle = previous_frame
+        (
+            self.ghost_car.x,
+            self.ghost_car.y,
+            self.ghost_car.move_angle,
+            self.ghost_car.car_angle,
+        ) = frame
+        self.ghost_car.draw(self.camera_x, self.camera_y, alpha)
 
     def _draw_race_over_menu(self) -> None:
         """Draws the race over menu buttons onto the game_surface"""
@@ -0,0 +1,434 @@
+import csv
+import json
+import mmap
+from pathlib import Path
+import struct
+import sys
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+import constants
+
+
+# Binary replay layout: a fixed 64 byte little-endian header followed by frame_count packed samples and then (since
+# version 2) split_count float64 split times, in seconds of race time at the end of each sector
+REPLAY_MAGIC: bytes = b"RCRP"
+REPLAY_VERSION: int = 2
+REPLAY_HEADER_STRUCT: struct.Struct = struct.Struct("<4sHBB32shhHHdI4x")
+REPLAY_TRACK_NAME_BYTES: int = 32
+
+# Sample formats
+SAMPLE_FORMAT_FLOAT32: int = 0  # (x, y, move_angle, car_angle) as float32, 16 bytes per frame
+SAMPLE_FORMAT_QUANTIZED: int = 1  # (x, y, move_angle, car_angle) as uint16, 8 bytes per frame
+SAMPLE_FORMAT_INPUTS: int = 2  # One bitmask of constants.INPUT_* flags per physics step, 1 byte per frame
+SAMPLE_DTYPES: dict[int, np.dtype] = {SAMPLE_FORMAT_FLOAT32: np.dtype("<f4"),
+                                      SAMPLE_FORMAT_QUANTIZED: np.dtype("<u2"),
+                                      SAMPLE_FORMAT_INPUTS: np.dtype("u1")}
+SPLIT_TIME_DTYPE: np.dtype = np.dtype("<f8")
+
+# Quantization steps: 1/8 px for positions (up to 8191 px) and 1/100 degree for angles (wrapped to [0, 360))
+QUANTIZED_POSITION_SCALE: float = 8.0
+QUANTIZED_ANGLE_SCALE: float = 100.0
+
+
+class ReplayHeader:
+    """Describes a binary replay file"""
+
+    def __init__(self, track_name: str, car_type_index: int, style_index: int, total_time: float, frame_count: int,
+                 frame_rate: int = constants.PHYSICS_FPS, sample_format: int = SAMPLE_FORMAT_FLOAT32,
+                 version: int = REPLAY_VERSION, split_times: Optional[list[float]] = None) -> None:
+        self.track_name: str = track_name
+        self.car_type_index: int = car_type_index
+        self.style_index: int = style_index
+        self.total_time: float = total_time
+        self.frame_count: int = frame_count
+        self.frame_rate: int = frame_rate
+        self.sample_format: int = sample_format
+        self.version: int = version
+        self.split_times: list[float] = split_times if split_times is not None else []
+        self.split_count: int = len(self.split_times)  # Set before the split times themselves when reading a file
+
+    def pack(self) -> bytes:
+        """Serializes the header into its fixed size binary form"""
+        return REPLAY_HEADER_STRUCT.pack(REPLAY_MAGIC, self.version, self.sample_format, 0,
+                                         self.track_name.encode("utf-8")[:REPLAY_TRACK_NAME_BYTES],
+                                         self.car_type_index, self.style_index, self.frame_rate, len(self.split_times),
+                                         self.total_time, self.frame_count)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "ReplayHeader":
+        """Parses and validates a binary header"""
+        if len(data) < REPLAY_HEADER_STRUCT.size:
+            raise ValueError("Replay file is too short to contain a header")
+        (magic, version, sample_format, _, track_name, car_type_index, style_index, frame_rate, split_count,
+         total_time, frame_count) = REPLAY_HEADER_STRUCT.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError("Not a replay file")
+        if version > REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+        if sample_format not in SAMPLE_DTYPES:
+            raise ValueError(f"Unknown replay sample format {sample_format}")
+        header: ReplayHeader = cls(track_name.rstrip(b"\0").decode("utf-8"), car_type_index, style_index, total_time,
+                                   frame_count, frame_rate, sample_format, version)
+        header.split_count = split_count
+        return header
+
+    def get_body_size(self) -> int:
+        """Returns the size in bytes of the samples following the header"""
+        if self.sample_format == SAMPLE_FORMAT_INPUTS:
+            return self.frame_count * SAMPLE_DTYPES[SAMPLE_FORMAT_INPUTS].itemsize
+        return self.frame_count * 4 * SAMPLE_DTYPES[self.sample_format].itemsize
+
+    def has_split_times(self) -> bool:
+        """Returns whether the file stores split times, as every file since version 2 does (even if there are none)"""
+        return self.version >= 2
+
+    def read_split_times(self, data: bytes | mmap.mmap) -> None:
+        """Reads the split times following the samples in the contents of a replay file"""
+        offset: int = REPLAY_HEADER_STRUCT.size + self.get_body_size()
+        if len(data) < offset + self.split_count * SPLIT_TIME_DTYPE.itemsize:
+            raise ValueError("Replay file is shorter than its header says")
+        self.split_times = np.frombuffer(data, dtype=SPLIT_TIME_DTYPE, count=self.split_count,
+                                         offset=offset).tolist()
+
+
+def quantize_samples(samples: npt.NDArray) -> npt.NDArray[np.uint16]:
+    """Packs (x, y, move_angle, car_angle) samples into uint16 fixed point"""
+    quantized: npt.NDArray[np.float64] = np.empty(samples.shape, dtype=np.float64)
+    quantized[:, :2] = np.clip(np.rint(samples[:, :2] * QUANTIZED_POSITION_SCALE), 0, np.iinfo(np.uint16).max)
+    quantized[:, 2:] = np.rint(np.mod(samples[:, 2:], 360.0) * QUANTIZED_ANGLE_SCALE) % (360 * QUANTIZED_ANGLE_SCALE)
+    return quantized.astype("<u2")
+
+
+def dequantize_samples(samples: npt.NDArray[np.uint16]) -> npt.NDArray[np.float32]:
+    """Expands uint16 fixed point samples back into float32 (x, y, move_angle, car_angle)"""
+    expanded: npt.NDArray[np.float32] = samples.astype(np.float32)
+    expanded[..., :2] /= QUANTIZED_POSITION_SCALE
+    expanded[..., 2:] /= QUANTIZED_ANGLE_SCALE
+    return expanded
+
+
+def write_binary_replay(file_path: str | Path, header: ReplayHeader, samples: npt.NDArray) -> None:
+    """Writes the header and samples to a binary replay file"""
+    if header.sample_format == SAMPLE_FORMAT_QUANTIZED:
+        body: npt.NDArray = quantize_samples(samples)
+    elif header.sample_format == SAMPLE_FORMAT_INPUTS:
+        body = np.ascontiguousarray(samples, dtype=SAMPLE_DTYPES[SAMPLE_FORMAT_INPUTS])
+    else:
+        body = np.ascontiguousarray(samples, dtype=SAMPLE_DTYPES[SAMPLE_FORMAT_FLOAT32])
+    header.frame_count = body.shape[0]
+    file_path = Path(file_path)
+    temp_path: Path = file_path.with_name(file_path.name + ".tmp")
+    with open(temp_path, "wb") as replay_file:
+        replay_file.write(header.pack())
+        replay_file.write(body.tobytes())
+        replay_file.write(np.asarray(header.split_times, dtype=SPLIT_TIME_DTYPE).tobytes())
+    temp_path.replace(file_path)
+
+
+def read_binary_replay(file_path: str | Path) -> tuple[ReplayHeader, npt.NDArray[np.float32]]:
+    """Reads a binary replay file into its header and a float32 (x, y, move_angle, car_angle) array"""
+    data: bytes = Path(file_path).read_bytes()
+    header: ReplayHeader = ReplayHeader.unpack(data)
+    if header.sample_format == SAMPLE_FORMAT_INPUTS:
+        raise ValueError("Input replays have no positions until they are re-simulated")
+    header.read_split_times(data)
+    dtype: np.dtype = SAMPLE_DTYPES[header.sample_format]
+    body: npt.NDArray = np.frombuffer(data, dtype=dtype, count=header.frame_count * 4,
+                                      offset=REPLAY_HEADER_STRUCT.size).reshape(header.frame_count, 4)
+    if header.sample_format == SAMPLE_FORMAT_QUANTIZED:
+        return header, dequantize_samples(body)
+    return header, body
+
+
+def read_input_replay(file_path: str | Path) -> tuple[ReplayHeader, npt.NDArray[np.uint8]]:
+    """Reads an input replay file into its header and one input bitmask per physics step"""
+    data: bytes = Path(file_path).read_bytes()
+    header: ReplayHeader = ReplayHeader.unpack(data)
+    if header.sample_format != SAMPLE_FORMAT_INPUTS:
+        raise ValueError("Not an input replay")
+    header.read_split_times(data)
+    inputs: npt.NDArray[np.uint8] = np.frombuffer(data, dtype=SAMPLE_DTYPES[SAMPLE_FORMAT_INPUTS],
+                                                  count=header.frame_count, offset=REPLAY_HEADER_STRUCT.size)
+    return header, inputs
+
+
+class GhostTrajectory:
+    """Holds a recorded ghost run as a compact (x, y, move_angle, car_angle) array"""
+
+    def __init__(self, samples: npt.NDArray, total_time: Optional[float] = None,
+                 sample_format: int = SAMPLE_FORMAT_FLOAT32, memory_map: Optional[mmap.mmap] = None,
+                 split_times: Optional[list[float]] = None) -> None:
+        self.samples: npt.NDArray = samples
+        self.total_time: Optional[float] = total_time
+        self.split_times: Optional[list[float]] = split_times  # None if the replay was saved without split times
+        self.sample_format: int = sample_format
+        self._memory_map: Optional[mmap.mmap] = memory_map
+
+    @classmethod
+    def load(cls, binary_path: str | Path, csv_path: str | Path, memory_map: bool = False) -> "GhostTrajectory":
+        """Loads the binary replay if there is one, falling back to the .csv file"""
+        if Path(binary_path).exists():
+            if memory_map:
+                return cls.from_memory_map(binary_path)
+            return cls.from_binary(binary_path)
+        return cls.from_csv(csv_path)
+
+    @classmethod
+    def from_binary(cls, file_path: str | Path) -> "GhostTrajectory":
+        """Reads a binary replay file with a single buffer copy"""
+        header, samples = read_binary_replay(file_path)
+        return cls(samples, header.total_time,
+                   split_times=header.split_times if header.has_split_times() else None)
+
+    @classmethod
+    def from_memory_map(cls, file_path: str | Path) -> "GhostTrajectory":
+        """Maps a binary replay file into memory so that only the pages around the frames being played are read"""
+        with open(file_path, "rb") as replay_file:
+            header: ReplayHeader = ReplayHeader.unpack(replay_file.read(REPLAY_HEADER_STRUCT.size))
+            if header.sample_format == SAMPLE_FORMAT_INPUTS:
+                raise ValueError("Input replays have no positions until they are re-simulated")
+            dtype: np.dtype = SAMPLE_DTYPES[header.sample_format]
+            if header.frame_count == 0:
+                replay_file.seek(0)
+                header.read_split_times(replay_file.read())
+                return cls(np.empty((0, 4), dtype=dtype), header.total_time, header.sample_format,
+                           split_times=header.split_times if header.has_split_times() else None)
+            memory_map: mmap.mmap = mmap.mmap(replay_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header.read_split_times(memory_map)
+        except ValueError:
+            memory_map.close()
+            raise
+        samples: npt.NDArray = np.frombuffer(memory_map, dtype=dtype, count=header.frame_count * 4,
+                                             offset=REPLAY_HEADER_STRUCT.size).reshape(header.frame_count, 4)
+        return cls(samples, header.total_time, header.sample_format, memory_map,
+                   header.split_times if header.has_split_times() else None)
+
+    @classmethod
+    def from_csv(cls, file_path: str | Path) -> "GhostTrajectory":
+        """Parses a replay .csv file once into a float32 array"""
+        if Path(file_path).stat().st_size == 0:
+            return cls(np.empty((0, 4), dtype=np.float32))
+        samples: npt.NDArray[np.float32] = np.loadtxt(file_path, delimiter=",", dtype=np.float32, ndmin=2)
+        return cls(samples)
+
+    def __len__(self) -> int:
+        return self.samples.shape[0]
+
+    def get_frame(self, index: int) -> Optional[tuple[float, float, float, float]]:
+        """Returns the (x, y, move_angle, car_angle) sample at the given frame, or None once the ghost has finished"""
+        if not 0 <= index < self.samples.shape[0]:
+            return None
+        sample: npt.NDArray = self.samples[index]
+        if self.sample_format == SAMPLE_FORMAT_QUANTIZED:
+            sample = dequantize_samples(sample)
+        x, y, move_angle, car_angle = sample.tolist()
+        return x, y, move_angle, car_angle
+
+    def get_frames(self) -> npt.NDArray[np.float32]:
+        """Returns every (x, y, move_angle, car_angle) sample as a float32 array"""
+        if self.sample_format == SAMPLE_FORMAT_QUANTIZED:
+            return dequantize_samples(self.samples)
+        return np.asarray(self.samples, dtype=np.float32)
+
+    def close(self) -> None:
+        """Releases the memory map (if any) so the underlying file can be replaced"""
+        if self._memory_map is not None:
+            self.samples = np.empty((0, 4), dtype=self.samples.dtype)
+            self._memory_map.close()
+            self._memory_map = None
+
+
+class ReplayRecorder:
+    """Buffers the user's car samples in memory and writes them to the replay .csv file in large chunks"""
+
+    def __init__(self, file_path: str | Path, initial_capacity: int = constants.REPLAY_BUFFER_FRAMES) -> None:
+        self.file_path: Path = Path(file_path)
+        self.samples: npt.NDArray[np.float64] = np.empty((initial_capacity, 4), dtype=np.float64)
+        self.num_samples: int = 0
+        self.num_flushed: int = 0
+        self._flush_thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Creates an empty replay file and clears the buffer"""
+        self.wait()
+        self.num_samples = 0
+        self.num_flushed = 0
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.file_path, "w", newline=""):
+            pass
+
+    def record(self, x: float, y: float, move_angle: float, car_angle: float) -> None:
+        """Stores one frame in the buffer without touching the file system"""
+        if self.num_samples == self.samples.shape[0]:
+            self.samples = np.concatenate((self.samples, np.empty_like(self.samples)))
+        self.samples[self.num_samples] = (x, y, move_angle, car_angle)
+        self.num_samples += 1
+
+    def flush(self) -> None:
+        """Appends every sample recorded since the last flush to the replay file on a background thread"""
+        self.wait()
+        if self.num_flushed == self.num_samples:
+            return
+        rows: list[list[float]] = self.samples[self.num_flushed:self.num_samples].tolist()
+        self.num_flushed = self.num_samples
+        self._flush_thread = threading.Thread(target=self._write_rows, args=(rows,), daemon=True)
+        self._flush_thread.start()
+
+    def close(self) -> None:
+        """Flushes the remaining samples and blocks until they are on disk"""
+        self.flush()
+        self.wait()
+
+    def wait(self) -> None:
+        """Blocks until the pending background write (if any) has finished"""
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+            self._flush_thread = None
+
+    def discard(self) -> None:
+        """Stops recording and deletes the replay file"""
+        self.wait()
+        if self.file_path.exists():
+            self.file_path.unlink()
+
+    def save_binary(self, file_path: str | Path, header: ReplayHeader) -> None:
+        """Writes everything recorded so far to a binary replay file"""
+        write_binary_replay(file_path, header, self.samples[:self.num_samples])
+
+    def _write_rows(self, rows: list[list[float]]) -> None:
+        """Appends the given rows to the replay file"""
+        with open(self.file_path, "a", newline="") as replay_file:
+            csv.writer(replay_file).writerows(rows)
+
+
+class InputRecorder:
+    """Buffers the input bitmask of every physics step so the run can be re-simulated exactly"""
+
+    def __init__(self, initial_capacity: int = constants.REPLAY_BUFFER_FRAMES) -> None:
+        self.inputs: npt.NDArray[np.uint8] = np.empty(initial_capacity, dtype=np.uint8)
+        self.num_inputs: int = 0
+
+    def start(self) -> None:
+        """Clears the buffer"""
+        self.num_inputs = 0
+
+    def record(self, input_bits: int) -> None:
+        """Stores the input bitmask for one physics step"""
+        if self.num_inputs == self.inputs.shape[0]:
+            self.inputs = np.concatenate((self.inputs, np.empty_like(self.inputs)))
+        self.inputs[self.num_inputs] = input_bits
+        self.num_inputs += 1
+
+    def save(self, file_path: str | Path, header: ReplayHeader) -> None:
+        """Writes everything recorded so far to an input replay file"""
+        header.sample_format = SAMPLE_FORMAT_INPUTS
+        write_binary_replay(file_path, header, self.inputs[:self.num_inputs])
+
+
+def convert_csv_replay(csv_path: str | Path, metadata_path: str | Path, binary_path: str | Path, track_name: str,
+                       sample_format: int = SAMPLE_FORMAT_FLOAT32) -> ReplayHeader:
+    """Converts a .csv replay and its .json metadata into a single binary replay file, storing the split times worked
+    out from its path so that races don't have to"""
+    from simulation import find_split_times  # simulation imports this module, so only once both are loaded
+    from track import TrackCollision
+    samples: npt.NDArray[np.float32] = GhostTrajectory.from_csv(csv_path).samples
+    metadata: dict = {}
+    if Path(metadata_path).exists():
+        with open(metadata_path, "r") as file:
+            metadata = json.load(file)
+    header: ReplayHeader = ReplayHeader(track_name,
+                                        metadata.get("car_type_index", 0),
+                                        metadata.get("style_index", 0),
+                                        metadata.get("time", samples.shape[0] / constants.PHYSICS_FPS),
+                                        samples.shape[0],
+                                        sample_format=sample_format,
+                                        split_times=find_split_times(TrackCollision(track_name), samples))
+    write_binary_replay(binary_path, header, samples)
+    return header
+
+
+def convert_all_replays(sample_format: int = SAMPLE_FORMAT_FLOAT32) -> None:
+    """Converts every shipped ghost and personal best to the binary format, printing sizes and load times"""
+    replays: list[tuple[str, str, str, str]] = []
+    for track_name in constants.TRACK_NAMES:
+        for difficulty in constants.GHOST_DIFFICULTIES:
+            replays.append((track_name,
+                            constants.GHOST_FILE_PATH.format(track_name=track_name, difficulty=difficulty),
+                            constants.GHOST_METADATA_FILE_PATH.format(track_name=track_name, difficulty=difficulty),
+                            constants.GHOST_BINARY_FILE_PATH.format(track_name=track_name, difficulty=difficulty)))
+        replays.append((track_name,
+                        constants.PERSONAL_BEST_FILE_PATH.format(track_name=track_name),
+                        constants.PERSONAL_BEST_METADATA_FILE_PATH.format(track_name=track_name),
+                        constants.PERSONAL_BEST_BINARY_FILE_PATH.format(track_name=track_name)))
+
+    print(f"{'replay':<56} {'frames':>6} {'csv+json B':>11} {'binary B':>9} {'csv ms':>7} {'binary ms':>9}")
+    for track_name, csv_path, metadata_path, binary_path in replays:
+        if not Path(csv_path).exists():
+            continue
+        header: ReplayHeader = convert_csv_replay(csv_path, metadata_path, binary_path, track_name, sample_format)
+
+        text_size: int = Path(csv_path).stat().st_size
+        if Path(metadata_path).exists():
+            text_size += Path(metadata_path).stat().st_size
+        binary_size: int = Path(binary_path).stat().st_size
+
+        start: float = time.perf_counter()
+        GhostTrajectory.from_csv(csv_path)
+        csv_ms: float = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        GhostTrajectory.from_binary(binary_path)
+        binary_ms: float = (time.perf_counter() - start) * 1000
+
+        print(f"{binary_path:<56} {header.frame_count:>6} {text_size:>11} {binary_size:>9} "
+              f"{csv_ms:>7.2f} {binary_ms:>9.3f}")
+
+
+def _read_csv_row(csv_path: str | Path, index: int) -> Optional[list[float]]:
+    """Finds one row of a replay .csv file the way Race._draw_ghost used to every frame, walking from the first row"""
+    with open(csv_path, newline="") as file:
+        for i, row in enumerate(csv.reader(file)):
+            if i == index:
+                return [float(value) for value in row]
+    return None
+
+
+def benchmark_ghost_lookup(csv_path: str | Path, repeats: int = 20) -> None:
+    """Times finding the ghost's sample for one frame at points through a race, re-parsing the .csv file (as before
+    GhostTrajectory) against indexing the preloaded array, printing milliseconds per frame"""
+    start: float = time.perf_counter()
+    trajectory: GhostTrajectory = GhostTrajectory.from_csv(csv_path)
+    load_ms: float = (time.perf_counter() - start) * 1000
+    fractions: list[float] = [0.0, 0.25, 0.5, 0.75, 0.99]
+    indices: list[int] = [int(fraction * (len(trajectory) - 1)) for fraction in fractions]
+
+    reparse_ms: list[float] = []
+    preloaded_ms: list[float] = []
+    for index in indices:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            _read_csv_row(csv_path, index)
+        reparse_ms.append((time.perf_counter() - start) * 1000 / repeats)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            trajectory.samples[index].tolist()
+        preloaded_ms.append((time.perf_counter() - start) * 1000 / repeats)
+
+    print(f"{csv_path} ({len(trajectory)} rows, loaded once in {load_ms:.1f} ms)")
+    print(f"{'position in race':<18}" + "".join(f"{fraction:>8.0%}" for fraction in fractions))
+    print(f"{'csv re-parse ms':<18}" + "".join(f"{ms:>8.3f}" for ms in reparse_ms))
+    print(f"{'preloaded ms':<18}" + "".join(f"{ms:>8.3f}" for ms in preloaded_ms))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--benchmark-lookup"]:
+        for ghost_path in sys.argv[2:] or [constants.GHOST_FILE_PATH.format(track_name="glistening_glacier",
+                                                                            difficulty="medium")]:
+            benchmark_ghost_lookup(ghost_path)
+    else:
+        convert_all_replays(SAMPLE_FORMAT_QUANTIZED if "--quantize" in sys.argv[1:] else SAMPLE_FORMAT_FLOAT32)
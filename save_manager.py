@@ -19,6 +19,7 @@ class SaveManager:
             "music": constants.DEFAULT_MUSIC_VOLUME,
             "sfx": constants.DEFAULT_SFX_VOLUME
         }
+        self.scale_quality: str = constants.DEFAULT_SCALE_QUALITY
 
         self.load_data()
 
@@ -43,6 +44,7 @@ class SaveManager:
                 "music": constants.DEFAULT_MUSIC_VOLUME,
                 "sfx": constants.DEFAULT_SFX_VOLUME
             })
+            self.scale_quality = data.get("scale_quality", constants.DEFAULT_SCALE_QUALITY)
 
         except (json.JSONDecodeError, IOError) as e:
             print(f"Error loading save data: {e}")
@@ -52,6 +54,7 @@ class SaveManager:
                 "music": constants.DEFAULT_MUSIC_VOLUME,
                 "sfx": constants.DEFAULT_SFX_VOLUME
             }
+            self.scale_quality = constants.DEFAULT_SCALE_QUALITY
 
         self.apply_all_settings()
 
@@ -60,7 +63,8 @@ class SaveManager:
         data = {
             "unlocked_tracks": self.unlocked_tracks,
             "key_bindings": self.key_bindings,
-            "volume_settings": self.volume_settings
+            "volume_settings": self.volume_settings,
+            "scale_quality": self.scale_quality
         }
         try:
             with open(self.file_path, 'w') as f:
@@ -96,6 +100,10 @@ class SaveManager:
         """Returns the current volume settings."""
         return self.volume_settings
 
+    def get_scale_quality(self) -> str:
+        """Returns how the game is scaled to the window (constants.SCALE_QUALITY_NEAREST or _SMOOTH)."""
+        return self.scale_quality
+
     def update_key_bindings(self, new_bindings: Dict[str, int]):
         """Updates key bindings. Does not save until save_data() is called."""
         self.key_bindings = new_bindings.copy()
@@ -105,6 +113,10 @@ class SaveManager:
         self.volume_settings = new_volumes.copy()
         self.apply_all_settings()  # Apply volumes immediately
 
+    def update_scale_quality(self, scale_quality: str):
+        """Updates the scaling quality. Does not save until save_data() is called."""
+        self.scale_quality = scale_quality
+
     def apply_all_settings(self):
         """Applies all current settings to the game."""
         self.apply_volume_settings()
@@ -125,14 +137,9 @@ class SaveManager:
                 self.game.hover_sound.set_volume(sfx_vol)
 
             # Update sounds on sub-screens if they exist
-            if hasattr(self.game, 'title_screen') and self.game.title_screen:
-                self.game.title_screen.hover_sound.set_volume(sfx_vol)
-            if hasattr(self.game, 'track_selection') and self.game.track_selection:
-                self.game.track_selection.hover_sound.set_volume(sfx_vol)
-            if hasattr(self.game, 'car_selection') and self.game.car_selection:
-                self.game.car_selection.hover_sound.set_volume(sfx_vol)
-            if hasattr(self.game, 'difficulty_selection') and self.game.difficulty_selection:
-                self.game.difficulty_selection.hover_sound.set_volume(sfx_vol)
+            if hasattr(self.game, 'menu_screens'):
+                for menu_screen in self.game.menu_screens.values():
+                    menu_screen.hover_sound.set_volume(sfx_vol)
             if hasattr(self.game, 'race') and self.game.race:
                 self.game.race.next_lap_sound.set_volume(sfx_vol)
                 self.game.race.respawn_sound.set_volume(sfx_vol)
\ No newline at end of file
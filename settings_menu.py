@@ -2,6 +2,7 @@ import pygame
 
 import constants
 import utilities
+from ui_elements import DirtyRegions, get_text_button_area
 
 
 class SettingsMenu:
@@ -16,17 +17,16 @@ class SettingsMenu:
         self.save_manager = save_manager
 
         # Use the title screen's background
-        self.background: pygame.Surface = pygame.image.load(
-            constants.GENERAL_IMAGE_PATH.format(name="background")).convert()
-        self.background = pygame.transform.scale(self.background, (constants.WIDTH, constants.HEIGHT))
+        self.background: pygame.Surface = self.game.assets.load_image(
+            constants.GENERAL_IMAGE_PATH.format(name="background"), False, constants.WIDTH, constants.HEIGHT)
 
         # Dark overlay
         self.overlay = pygame.Surface((constants.WIDTH, constants.HEIGHT), pygame.SRCALPHA)
         self.overlay.fill((0, 0, 0, 150))
 
         # Fonts
-        self.title_font = pygame.font.Font(constants.TEXT_FONT_PATH, 80)
-        self.button_font = pygame.font.Font(constants.TEXT_FONT_PATH, 50)
+        self.title_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 80)
+        self.button_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 50)
 
         # Buttons
         self.buttons = []
@@ -40,10 +40,14 @@ class SettingsMenu:
         self.sound_rect = pygame.Rect(0, 0, 400, 80)
         self.sound_rect.center = (center_x, start_y + gap)
 
+        # Toggles how the game is scaled up to the window, rather than opening another screen
+        self.scale_quality_rect = pygame.Rect(0, 0, 500, 80)
+        self.scale_quality_rect.center = (center_x, start_y + 2 * gap)
+
         self.back_button_rect = pygame.Rect(20, constants.HEIGHT - 70, 150, 50)
 
-        self.last_hovered = "none"  # "controls", "sound", "back"
-        self.hover_sound = pygame.mixer.Sound(constants.HOVER_SOUND_PATH)
+        self.last_hovered = "none"  # "controls", "sound", "scale_quality", "back"
+        self.hover_sound = self.game.assets.load_sound(constants.HOVER_SOUND_PATH)
         self.hover_sound.set_volume(self.save_manager.get_volumes()["sfx"])
 
         # Transitions
@@ -58,6 +62,9 @@ class SettingsMenu:
         self.transition_next_duration_ms: int = 400
         self.transition_next_pause_time: int = 400
 
+        # What each area showed last frame, to redraw only the areas that changed
+        self.dirty_regions: DirtyRegions = DirtyRegions()
+
     def handle_events(self, events, mouse_pos: tuple[int, int]) -> str:
         """Returns constants.NO_ACTION_CODE or the name of a screen to navigate to"""
         hovered: str = constants.NO_ACTION_CODE
@@ -66,6 +73,8 @@ class SettingsMenu:
             hovered = constants.CONTROLS_MENU_NAME
         elif self.sound_rect.collidepoint(mouse_pos):
             hovered = constants.SOUND_MENU_NAME
+        elif self.scale_quality_rect.collidepoint(mouse_pos):
+            hovered = "scale_quality"
         elif self.back_button_rect.collidepoint(mouse_pos):
             hovered = constants.TITLE_SCREEN_NAME
 
@@ -75,32 +84,67 @@ class SettingsMenu:
 
         for event in events:
             if event.type == pygame.MOUSEBUTTONUP and event.button == 1:
-                if hovered:
+                if hovered == "scale_quality":
+                    self.toggle_scale_quality()
+                elif hovered:
                     return hovered
         return constants.NO_ACTION_CODE
 
+    def toggle_scale_quality(self) -> None:
+        """Switches between sharp and smooth scaling to the window, which takes effect from the next frame"""
+        if self.save_manager.get_scale_quality() == constants.SCALE_QUALITY_NEAREST:
+            self.save_manager.update_scale_quality(constants.SCALE_QUALITY_SMOOTH)
+        else:
+            self.save_manager.update_scale_quality(constants.SCALE_QUALITY_NEAREST)
+        self.save_manager.save_data()
+
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """Returns the areas that changed since the last frame, or None if the whole screen has to be redrawn"""
+        if self.transitioning:
+            return self.dirty_regions.get_dirty_rects(None)
+        scale_quality: str = self.save_manager.get_scale_quality()
+        scale_quality_name: str = "Smooth" if scale_quality == constants.SCALE_QUALITY_SMOOTH else "Sharp"
+        return self.dirty_regions.get_dirty_rects({
+            "controls": (self.last_hovered == constants.CONTROLS_MENU_NAME,
+                         get_text_button_area(self.button_font, "Controls", self.controls_rect)),
+            "sound": (self.last_hovered == constants.SOUND_MENU_NAME,
+                      get_text_button_area(self.button_font, "Sound", self.sound_rect)),
+            "scale_quality": ((self.last_hovered == "scale_quality", scale_quality),
+                              get_text_button_area(self.button_font, f"{scale_quality_name} Scaling",
+                                                   self.scale_quality_rect)),
+            "back": (self.last_hovered == constants.TITLE_SCREEN_NAME,
+                     get_text_button_area(self.button_font, "Back", self.back_button_rect)),
+        })
+
     def draw(self) -> None:
         self.screen.blit(self.background, (0, 0))
         self.screen.blit(self.overlay, (0, 0))
 
         # Title
-        title_surf = self.title_font.render("Settings", True, (255, 255, 255))
+        title_surf = self.game.text_cache.render(self.title_font, "Settings", True, (255, 255, 255))
         title_rect = title_surf.get_rect(center=(constants.WIDTH // 2, 100))
         self.screen.blit(title_surf, title_rect)
 
         # Controls Button
         controls_color = constants.TRACK_SELECTION_EXIT_HOVER_COLOR if self.last_hovered == constants.CONTROLS_MENU_NAME else constants.TEXT_COLOR
-        controls_surf = self.button_font.render("Controls", True, controls_color)
+        controls_surf = self.game.text_cache.render(self.button_font, "Controls", True, controls_color)
         self.screen.blit(controls_surf, controls_surf.get_rect(center=self.controls_rect.center))
 
         # Sound Button
         sound_color = constants.TRACK_SELECTION_EXIT_HOVER_COLOR if self.last_hovered == constants.SOUND_MENU_NAME else constants.TEXT_COLOR
-        sound_surf = self.button_font.render("Sound", True, sound_color)
+        sound_surf = self.game.text_cache.render(self.button_font, "Sound", True, sound_color)
         self.screen.blit(sound_surf, sound_surf.get_rect(center=self.sound_rect.center))
 
+        # Scale Quality Toggle
+        scale_quality_color = constants.TRACK_SELECTION_EXIT_HOVER_COLOR if self.last_hovered == "scale_quality" else constants.TEXT_COLOR
+        scale_quality_name: str = "Smooth" if self.save_manager.get_scale_quality() == constants.SCALE_QUALITY_SMOOTH else "Sharp"
+        scale_quality_surf = self.game.text_cache.render(self.button_font, f"{scale_quality_name} Scaling", True,
+                                                         scale_quality_color)
+        self.screen.blit(scale_quality_surf, scale_quality_surf.get_rect(center=self.scale_quality_rect.center))
+
         # Back Button
         back_color = constants.TRACK_SELECTION_EXIT_HOVER_COLOR if self.last_hovered == constants.TITLE_SCREEN_NAME else constants.TRACK_SELECTION_EXIT_COLOR
-        back_surf = self.button_font.render("Back", True, back_color)
+        back_surf = self.game.text_cache.render(self.button_font, "Back", True, back_color)
         self.screen.blit(back_surf, back_surf.get_rect(center=self.back_button_rect.center))
 
         if self.transitioning:
@@ -0,0 +1,207 @@
+from pathlib import Path
+import sys
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+import numpy.typing as npt
+
+from car import CarPhysics
+import constants
+from replay import ReplayHeader, read_input_replay
+from track import LapGate, TrackCollision
+
+
+class LapTracker:
+    """Tracks checkpoint and finish line crossings for a car and moves its respawn point along with it"""
+
+    def __init__(self, track: TrackCollision, num_laps: int) -> None:
+        self.track: TrackCollision = track
+        self.num_laps: int = num_laps
+        self.current_lap: int = 1
+        self.next_sector: int = 0  # Index into track.sector_gates of the gate that ends the current sector
+        self.split_times: list[float] = []  # Race time in seconds at which each sector of the race ended
+        self.lap_end_times: list[float] = []  # Race time in seconds at which each finished lap ended
+
+    def update(self, car: CarPhysics, step_start_time: float) -> str:
+        """Checks the car's move during the physics step starting at step_start_time (in seconds of race time)
+        against the gate ending the current sector, returning the resulting event code (if any)
+
+        The sectors must be driven in order, so only one gate needs checking and skipping a checkpoint never counts."""
+        gate: LapGate = self.track.sector_gates[self.next_sector]
+        crossing_fraction: Optional[float] = gate.get_crossing_fraction(car.prev_x, car.prev_y, car.x, car.y)
+        if crossing_fraction is None:
+            return constants.NO_ACTION_CODE
+        # Timed to where during the step the gate was crossed, rather than to the end of the step
+        crossing_time: float = step_start_time + crossing_fraction / constants.PHYSICS_FPS
+        self.split_times.append(crossing_time)
+
+        if gate is not self.track.finish_gate:
+            # Update the car's respawn point to this checkpoint
+            respawn_x, respawn_y = self.track.checkpoint_respawn_points[self.next_sector]
+            car.set_respawn_point(respawn_x, respawn_y, constants.CHECKPOINT_ANGLES[self.track.name][self.next_sector])
+            self.next_sector += 1
+            return constants.CHECKPOINT_EVENT_CODE
+
+        self.next_sector = 0
+        self.current_lap += 1
+        self.lap_end_times.append(crossing_time)
+
+        # Reset respawn point to the start line for the new lap
+        car.set_respawn_point(car.start_x, car.start_y, car.start_angle)
+
+        if self.current_lap > self.num_laps:
+            return constants.RACE_FINISHED_EVENT_CODE
+        if self.current_lap == self.num_laps:
+            return constants.FINAL_LAP_EVENT_CODE
+        return constants.NEXT_LAP_EVENT_CODE
+
+
+class RaceSimulation:
+    """Steps a car around a track one fixed physics step at a time, without drawing anything"""
+
+    def __init__(self, track: TrackCollision, car: CarPhysics, num_laps: int) -> None:
+        self.track: TrackCollision = track
+        self.car: CarPhysics = car
+        self.lap_tracker: LapTracker = LapTracker(track, num_laps)
+        self.is_race_active: bool = False
+        self.is_finished: bool = False
+        self.step_count: int = 0  # Physics steps taken while the race was active
+
+    def start_race(self) -> None:
+        """Lets the car respond to input (called when the countdown reaches "Go!")"""
+        if not self.is_finished:
+            self.is_race_active = True
+
+    def step(self, input_bits: int) -> list[str]:
+        """Advances the simulation by one physics step, returning the event codes that happened during it"""
+        car: CarPhysics = self.car
+        car.save_previous_state()
+        car.is_off_road = True if self.track.is_off_road(car.x, car.y) else False
+        car.set_max_speed()
+        car.apply_input(input_bits, self.is_race_active)
+        car.update_position()
+
+        events: list[str] = []
+        if not self.is_race_active:
+            return events
+        self.step_count += 1
+
+        if self.track.is_out_of_bounds(car.x, car.y):
+            car.respawn()
+            events.append(constants.RESPAWN_EVENT_CODE)
+
+        lap_event: str = self.lap_tracker.update(car, (self.step_count - 1) / constants.PHYSICS_FPS)
+        if lap_event != constants.NO_ACTION_CODE:
+            events.append(lap_event)
+        if lap_event == constants.RACE_FINISHED_EVENT_CODE:
+            self.is_race_active = False
+            self.is_finished = True
+        return events
+
+    def run(self, inputs: Iterable[int]) -> bool:
+        """Steps through a sequence of per-step input bitmasks, returning True if the car finished the race"""
+        self.start_race()
+        for input_bits in inputs:
+            if self.is_finished:
+                break
+            self.step(input_bits)
+        return self.is_finished
+
+    def get_elapsed_time(self) -> float:
+        """Returns the race time in seconds for the steps simulated so far, or the time the car crossed the finish
+        line once it has finished"""
+        if self.is_finished:
+            return self.lap_tracker.lap_end_times[-1]
+        return self.step_count / constants.PHYSICS_FPS
+
+
+def resimulate(header: ReplayHeader, inputs: npt.NDArray[np.uint8],
+               track: Optional[TrackCollision] = None) -> tuple[RaceSimulation, npt.NDArray[np.float32]]:
+    """Replays recorded inputs from the start line, returning the simulation and the regenerated
+    (x, y, move_angle, car_angle) trajectory"""
+    if track is None:
+        track = TrackCollision(header.track_name)
+    car: CarPhysics = CarPhysics(header.track_name, constants.CAR_DEFINITIONS[header.car_type_index])
+    simulation: RaceSimulation = RaceSimulation(track, car, constants.NUM_LAPS[header.track_name])
+    trajectory: npt.NDArray[np.float32] = np.empty((len(inputs), 4), dtype=np.float32)
+    simulation.start_race()
+    for input_bits in inputs.tolist():
+        if simulation.is_finished:
+            break
+        simulation.step(input_bits)
+        trajectory[simulation.step_count - 1] = (car.x, car.y, car.move_angle, car.car_angle)
+    return simulation, trajectory[:simulation.step_count]
+
+
+def find_split_times(track: TrackCollision, samples: npt.NDArray) -> list[float]:
+    """Works out the split times of a recorded (x, y, move_angle, car_angle) trajectory, for replays saved without
+    them, the way LapTracker would have timed the crossings of each sample's move during its physics step
+
+    The samples must be one per physics step, as the game records them. A trajectory cut off before the finish only
+    gives the splits it reaches."""
+    x1: npt.NDArray[np.float64] = samples[:, 0].astype(np.float64)
+    y1: npt.NDArray[np.float64] = samples[:, 1].astype(np.float64)
+    x0: npt.NDArray[np.float64] = np.concatenate(([constants.START_X[track.name]], x1[:-1]))
+    y0: npt.NDArray[np.float64] = np.concatenate(([constants.START_Y[track.name]], y1[:-1]))
+    crossing_fractions: list[npt.NDArray[np.float64]] = [gate.get_crossing_fraction_array(x0, y0, x1, y1)
+                                                         for gate in track.sector_gates]
+    crossing_steps: list[npt.NDArray[np.intp]] = [np.flatnonzero(~np.isnan(fractions))
+                                                  for fractions in crossing_fractions]
+
+    split_times: list[float] = []
+    first_step: int = 0
+    num_splits: int = len(track.sector_gates) * constants.NUM_LAPS[track.name]
+    while len(split_times) < num_splits:
+        sector: int = len(split_times) % len(track.sector_gates)
+        index: int = int(np.searchsorted(crossing_steps[sector], first_step))
+        if index == len(crossing_steps[sector]):
+            break
+        step: int = int(crossing_steps[sector][index])
+        split_times.append(float(step + crossing_fractions[sector][step]) / constants.PHYSICS_FPS)
+        first_step = step + 1
+    return split_times
+
+
+def verify_input_replay(file_path: str | Path) -> tuple[bool, float, float]:
+    """Re-simulates an input replay headlessly, returning (is_valid, claimed time, simulated time)
+
+    A replay is valid when the car finishes the race on its last recorded input at exactly the claimed time, and
+    passes every checkpoint at exactly the claimed split times if it has them."""
+    header, inputs = read_input_replay(file_path)
+    simulation, _ = resimulate(header, inputs)
+    simulated_time: float = int(simulation.get_elapsed_time() * 1000) / 1000.0
+    is_valid: bool = (simulation.is_finished and simulation.step_count == len(inputs)
+                      and simulated_time == header.total_time
+                      and header.split_times in ([], simulation.lap_tracker.split_times))
+    return is_valid, header.total_time, simulated_time
+
+
+def benchmark(track_name: str, num_steps: int) -> None:
+    """Times the physics on a track without a display, printing the number of steps simulated per second"""
+    start: float = time.perf_counter()
+    track: TrackCollision = TrackCollision(track_name)
+    load_ms: float = (time.perf_counter() - start) * 1000
+
+    simulation: RaceSimulation = RaceSimulation(track, CarPhysics(track_name, constants.CAR_DEFINITIONS[0]),
+                                                constants.NUM_LAPS[track_name])
+    # Hold forward while weaving left and right so the car visits on- and off-road pixels and respawns
+    inputs: list[int] = [constants.INPUT_FORWARD | (constants.INPUT_LEFT if (i // 90) % 2 else constants.INPUT_RIGHT)
+                         for i in range(num_steps)]
+    start = time.perf_counter()
+    simulation.start_race()
+    for input_bits in inputs:
+        simulation.step(input_bits)
+    elapsed: float = time.perf_counter() - start
+    print(f"{track_name:<20} load {load_ms:7.1f} ms  {num_steps / elapsed:10.0f} steps/s")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--verify"]:
+        for replay_path in sys.argv[2:]:
+            valid, claimed, simulated = verify_input_replay(replay_path)
+            print(f"{replay_path}: {'OK' if valid else 'INVALID'} (claimed {claimed:.3f} s, simulated {simulated:.3f} s)")
+    else:
+        steps: int = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+        for name in constants.TRACK_NAMES:
+            benchmark(name, steps)
@@ -1,32 +1,32 @@
 import pygame
 
 import constants
-from ui_elements import Slider, ConfirmationDialog
+from ui_elements import Slider, ConfirmationDialog, DirtyRegions, get_text_button_area
 
 
 class SoundMenu:
     """Screen for adjusting sound volumes."""
 
-    def __init__(self, screen: pygame.Surface, save_manager) -> None:
+    def __init__(self, game, screen: pygame.Surface, save_manager) -> None:
 
         # General
         self.name: str = "sound_menu"
+        self.game = game
         self.screen: pygame.Surface = screen
         self.save_manager = save_manager
 
         # Use the title screen's background
-        self.background: pygame.Surface = pygame.image.load(
-            constants.GENERAL_IMAGE_PATH.format(name="background")).convert()
-        self.background = pygame.transform.scale(self.background, (constants.WIDTH, constants.HEIGHT))
+        self.background: pygame.Surface = self.game.assets.load_image(
+            constants.GENERAL_IMAGE_PATH.format(name="background"), False, constants.WIDTH, constants.HEIGHT)
 
         # Dark overlay
         self.overlay = pygame.Surface((constants.WIDTH, constants.HEIGHT), pygame.SRCALPHA)
         self.overlay.fill((0, 0, 0, 150))
 
         # Fonts
-        self.title_font = pygame.font.Font(constants.TEXT_FONT_PATH, 80)
-        self.label_font = pygame.font.Font(constants.TEXT_FONT_PATH, 50)
-        self.button_font = pygame.font.Font(constants.TEXT_FONT_PATH, 40)
+        self.title_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 80)
+        self.label_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 50)
+        self.button_font = self.game.assets.load_font(constants.TEXT_FONT_PATH, 40)
 
         self.current_volumes = self.save_manager.get_volumes().copy()
         self.initial_volumes = self.save_manager.get_volumes().copy()
@@ -64,6 +64,9 @@ class SoundMenu:
         self.transition_next_duration_ms: int = 400
         self.transition_next_pause_time: int = 400
 
+        # What each area showed last frame, to redraw only the areas that changed
+        self.dirty_regions: DirtyRegions = DirtyRegions()
+
     def settings_changed(self) -> bool:
         """Checks if settings are different from initial."""
         return self.current_volumes != self.initial_volumes
@@ -125,32 +128,57 @@ class SoundMenu:
                     self.dialog = ConfirmationDialog(self.screen, "Save changes?", self.button_font)
         return constants.NO_ACTION_CODE
 
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """Returns the areas that changed since the last frame, or None if the whole screen has to be redrawn"""
+        if self.transitioning:
+            return self.dirty_regions.get_dirty_rects(None)
+        return self.dirty_regions.get_dirty_rects({
+            "music": (self.music_slider.val, self._get_slider_area(self.music_slider)),
+            "sfx": (self.sfx_slider.val, self._get_slider_area(self.sfx_slider)),
+            "back": (self.last_hovered == constants.SETTINGS_MENU_NAME,
+                     get_text_button_area(self.button_font, "Back", self.back_button_rect)),
+            "save": ((self.settings_changed(), self.last_hovered == "save"),
+                     get_text_button_area(self.button_font, "Save", self.save_button_rect)),
+            # Opening or closing the dialog darkens or lightens the whole screen behind it
+            "dialog": (self.dialog is not None, self.screen.get_rect()),
+            "dialog_buttons": (self.dialog.hover if self.dialog else None,
+                               self.dialog.rect if self.dialog else pygame.Rect(0, 0, 0, 0)),
+        })
+
+    def _get_slider_area(self, slider: Slider) -> pygame.Rect:
+        """Returns the area covered by a slider, its handle and the value shown next to it"""
+        value_size: tuple[int, int] = self.label_font.size(f"{int(slider.val * 100)}")
+        value_rect: pygame.Rect = pygame.Rect((slider.rect.right + 30, slider.rect.centery - 25), value_size)
+        return slider.rect.union(slider.handle_rect).union(value_rect)
+
     def draw(self) -> None:
         self.screen.blit(self.background, (0, 0))
         self.screen.blit(self.overlay, (0, 0))
 
         # Title
-        title_surf = self.title_font.render("Sound", True, (255, 255, 255))
+        title_surf = self.game.text_cache.render(self.title_font, "Sound", True, (255, 255, 255))
         title_rect = title_surf.get_rect(center=(constants.WIDTH // 2, 100))
         self.screen.blit(title_surf, title_rect)
 
         # Music Slider
-        music_label = self.label_font.render("Music", True, (255, 255, 255))
+        music_label = self.game.text_cache.render(self.label_font, "Music", True, (255, 255, 255))
         self.screen.blit(music_label, (self.music_slider.rect.x, self.music_slider.rect.y - 70))
-        music_val_label = self.label_font.render(f"{int(self.music_slider.val * 100)}", True, (255, 255, 255))
+        music_val_label = self.game.text_cache.render(self.label_font, f"{int(self.music_slider.val * 100)}", True,
+                                                   (255, 255, 255))
         self.screen.blit(music_val_label, (self.music_slider.rect.right + 30, self.music_slider.rect.centery - 25))
         self.music_slider.draw(self.screen)
 
         # SFX Slider
-        sfx_label = self.label_font.render("SFX", True, (255, 255, 255))
+        sfx_label = self.game.text_cache.render(self.label_font, "SFX", True, (255, 255, 255))
         self.screen.blit(sfx_label, (self.sfx_slider.rect.x, self.sfx_slider.rect.y - 70))
-        sfx_val_label = self.label_font.render(f"{int(self.sfx_slider.val * 100)}", True, (255, 255, 255))
+        sfx_val_label = self.game.text_cache.render(self.label_font, f"{int(self.sfx_slider.val * 100)}", True,
+                                                 (255, 255, 255))
         self.screen.blit(sfx_val_label, (self.sfx_slider.rect.right + 30, self.sfx_slider.rect.centery - 25))
         self.sfx_slider.draw(self.screen)
 
         # Back Button
         back_color = constants.TRACK_SELECTION_EXIT_HOVER_COLOR if self.last_hovered == constants.SETTINGS_MENU_NAME else constants.TRACK_SELECTION_EXIT_COLOR
-        back_surf = self.button_font.render("Back", True, back_color)
+        back_surf = self.game.text_cache.render(self.button_font, "Back", True, back_color)
         self.screen.blit(back_surf, back_surf.get_rect(center=self.back_button_rect.center))
 
         # Save Button
@@ -158,7 +186,7 @@ class SoundMenu:
             save_color = (0, 200, 0)  # Green
             if self.last_hovered == "save":
                 save_color = (100, 255, 100)  # Light Green
-            save_surf = self.button_font.render("Save", True, save_color)
+            save_surf = self.game.text_cache.render(self.button_font, "Save", True, save_color)
             self.screen.blit(save_surf, save_surf.get_rect(center=self.save_button_rect.center))
 
         if self.dialog:
@@ -1,8 +1,11 @@
-from moviepy import VideoFileClip
+from typing import Optional
+
 import pygame
 
 import constants
 import utilities
+from ui_elements import DirtyRegions
+from video_decoder import VideoDecoder
 
 class TitleScreen:
     """Handles the title screen."""
@@ -16,21 +19,16 @@ class TitleScreen:
         self.save_manager = save_manager
 
         # Background image
-        self.title_background_image: pygame.Surface = pygame.image.load(
-            constants.GENERAL_IMAGE_PATH.format(name="background")).convert()
-        self.title_background_image = pygame.transform.scale(self.title_background_image,
-                                                             (constants.WIDTH, constants.HEIGHT))
+        self.title_background_image: pygame.Surface = self.game.assets.load_image(
+            constants.GENERAL_IMAGE_PATH.format(name="background"), False, constants.WIDTH, constants.HEIGHT)
 
         # Foreground images
-        self.title_default_image: pygame.Surface = pygame.image.load(
-            constants.TITLE_IMAGE_PATH.format(image_type="default")).convert_alpha()
-        self.title_default_image = pygame.transform.scale(self.title_default_image, (constants.WIDTH, constants.HEIGHT))
-        self.title_hover_image: pygame.Surface = pygame.image.load(
-            constants.TITLE_IMAGE_PATH.format(image_type="hover")).convert_alpha()
-        self.title_hover_image = pygame.transform.scale(self.title_hover_image, (constants.WIDTH, constants.HEIGHT))
-        self.title_click_image: pygame.Surface = pygame.image.load(
-            constants.TITLE_IMAGE_PATH.format(image_type="click")).convert_alpha()
-        self.title_click_image = pygame.transform.scale(self.title_click_image, (constants.WIDTH, constants.HEIGHT))
+        self.title_default_image: pygame.Surface = self.game.assets.load_image(
+            constants.TITLE_IMAGE_PATH.format(image_type="default"), True, constants.WIDTH, constants.HEIGHT)
+        self.title_hover_image: pygame.Surface = self.game.assets.load_image(
+            constants.TITLE_IMAGE_PATH.format(image_type="hover"), True, constants.WIDTH, constants.HEIGHT)
+        self.title_click_image: pygame.Surface = self.game.assets.load_image(
+            constants.TITLE_IMAGE_PATH.format(image_type="click"), True, constants.WIDTH, constants.HEIGHT)
         self.current_image: pygame.Surface = self.title_default_image
 
         # Start button
@@ -42,12 +40,10 @@ class TitleScreen:
 
         # Settings Button
         try:
-            self.settings_icon_default = pygame.image.load(constants.SETTINGS_ICON_PATH).convert_alpha()
-            self.settings_icon_default = pygame.transform.scale(self.settings_icon_default, (50, 50))
+            self.settings_icon_default = self.game.assets.load_image(constants.SETTINGS_ICON_PATH, True, 50, 50)
 
             # Load the hover icon, but do NOT apply the tint
-            self.settings_icon_hover = pygame.image.load(constants.SETTINGS_ICON_PATH).convert_alpha()
-            self.settings_icon_hover = pygame.transform.scale(self.settings_icon_hover, (50, 50))
+            self.settings_icon_hover = self.game.assets.load_image(constants.SETTINGS_ICON_PATH, True, 50, 50)
 
             # Position at the BOTTOM RIGHT
             self.settings_icon_rect = self.settings_icon_default.get_rect(
@@ -60,11 +56,8 @@ class TitleScreen:
             self.settings_icon_hover = None
             self.settings_icon_rect = pygame.Rect(0, 0, 0, 0)  # dummy rect
 
-        # Intro video
-        self.intro_clip: VideoFileClip = VideoFileClip(constants.INTRO_VIDEO_PATH)
-
         # Button hovering
-        self.hover_sound: pygame.mixer.Sound = pygame.mixer.Sound(constants.HOVER_SOUND_PATH)
+        self.hover_sound: pygame.mixer.Sound = self.game.assets.load_sound(constants.HOVER_SOUND_PATH)
         self.hover_sound.set_volume(self.save_manager.get_volumes()["sfx"])
         self.hover_sound_played: bool = False
         self.last_hovered: int = 0  # 0=None, 1=Start, 2=Settings
@@ -81,53 +74,104 @@ class TitleScreen:
         self.transition_next_duration_ms: int = 400
         self.transition_next_pause_time: int = 0
 
-    def play_intro(self, screen: pygame.Surface) -> bool:
-        """Plays the intro video before displaying the title screen."""
+        # What each area showed last frame, to redraw only the areas that changed. The foreground images only differ
+        # around the start button, so that is all a change between them redraws.
+        self.dirty_regions: DirtyRegions = DirtyRegions()
+        self.foreground_change_rect: pygame.Rect = utilities.get_difference_rect(
+            [self.title_default_image, self.title_hover_image, self.title_click_image])
+
+    def play_intro(self) -> bool:
+        """Plays the intro video before displaying the title screen, returning False if the game was closed during it.
+        Any key press or click skips it, and moviepy is only imported and the video only opened if it is watched."""
+        action: str = self._handle_intro_events()
+        if action != constants.NO_ACTION_CODE:  # Skipped while the game was starting
+            return action != constants.EXIT_GAME_CODE
+
+        from moviepy import VideoFileClip  # Slow to import, so only done when the intro actually plays
+        try:
+            intro_clip: VideoFileClip = VideoFileClip(constants.INTRO_VIDEO_PATH)
+        except OSError as e:
+            print(f"Error loading intro video: {e}")
+            return True
+
         intro_sound = pygame.mixer.Sound(constants.INTRO_AUDIO_PATH)
-        intro_sound.play()
-        clock = pygame.time.Clock()
+        decoder: VideoDecoder = VideoDecoder(intro_clip)
+        decoder.start()
         try:
-            for frame in self.intro_clip.iter_frames(fps=self.intro_clip.fps, dtype="uint8"):
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        return False
-                    if event.type == pygame.VIDEORESIZE:
-                        screen = pygame.display.set_mode(event.size, pygame.RESIZABLE)
-
-                surface = pygame.image.frombuffer(frame.tobytes(), self.intro_clip.size, "RGB")
-
-                # --- Letterbox Logic ---
-                window_width, window_height = screen.get_size()
-                game_width, game_height = self.intro_clip.size
-
-                if window_width == 0 or window_height == 0:
-                    continue  # Skip frame if minimized
-
-                window_aspect = window_width / window_height
-                game_aspect = game_width / game_height
-
-                scale_factor: float
-                if window_aspect > game_aspect:
-                    scale_factor = window_height / game_height
-                    new_height = window_height
-                    new_width = int(game_width * scale_factor)
-                else:
-                    scale_factor = window_width / game_width
-                    new_width = window_width
-                    new_height = int(game_height * scale_factor)
-
-                offset_x = (window_width - new_width) // 2
-                offset_y = (window_height - new_height) // 2
-
-                scaled_surface = pygame.transform.scale(surface, (new_width, new_height))
-                screen.fill((0, 0, 0))
-                screen.blit(scaled_surface, (offset_x, offset_y))
-                pygame.display.flip()
-                clock.tick(self.intro_clip.fps)
+            # A sound can't be asked how far it has played, so frames are timed from when the sound was started (with
+            # the first frame), dropping any that are late rather than falling behind it
+            sound_start_ms: Optional[int] = None
+            while not decoder.is_finished():
+                action = self._handle_intro_events()
+                if action != constants.NO_ACTION_CODE:
+                    intro_sound.stop()
+                    return action != constants.EXIT_GAME_CODE
+
+                if sound_start_ms is None and decoder.get_next_frame_time() is not None:
+                    intro_sound.play()
+                    sound_start_ms = pygame.time.get_ticks()
+                if sound_start_ms is not None:
+                    frame: Optional[pygame.Surface] = decoder.get_frame(
+                        (pygame.time.get_ticks() - sound_start_ms) / 1000)
+                    if frame is not None:
+                        self._draw_intro_frame(frame)
+
+                # Sleep until the next frame is due, or for a moment if the decoder hasn't got it ready yet
+                wait_ms: int = int(250 / decoder.fps)
+                next_frame_time_s: Optional[float] = decoder.get_next_frame_time()
+                if next_frame_time_s is not None and sound_start_ms is not None:
+                    wait_ms = int(next_frame_time_s * 1000) - (pygame.time.get_ticks() - sound_start_ms)
+                if wait_ms > 0:
+                    pygame.time.wait(wait_ms)
         finally:
-            self.intro_clip.close()
+            decoder.stop()
+            intro_clip.close()
         return True
 
+    def _draw_intro_frame(self, frame: pygame.Surface) -> None:
+        """Scales an intro video frame into a letterbox in the window"""
+        screen: pygame.Surface = self.game.screen
+
+        # --- Letterbox Logic ---
+        window_width, window_height = screen.get_size()
+        game_width, game_height = frame.get_size()
+
+        if window_width == 0 or window_height == 0:
+            return  # Skip frame if minimized
+
+        window_aspect = window_width / window_height
+        game_aspect = game_width / game_height
+
+        scale_factor: float
+        if window_aspect > game_aspect:
+            scale_factor = window_height / game_height
+            new_height = window_height
+            new_width = int(game_width * scale_factor)
+        else:
+            scale_factor = window_width / game_width
+            new_width = window_width
+            new_height = int(game_height * scale_factor)
+
+        offset_x = (window_width - new_width) // 2
+        offset_y = (window_height - new_height) // 2
+
+        screen.fill((0, 0, 0))
+        pygame.transform.scale(frame, (new_width, new_height),
+                               screen.subsurface((offset_x, offset_y, new_width, new_height)))
+        pygame.display.flip()
+
+    def _handle_intro_events(self) -> str:
+        """Handles events during the intro, returning the title screen's name if it was skipped"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return constants.EXIT_GAME_CODE
+            if event.type == pygame.VIDEORESIZE:
+                self.game.resize_window(event.size)
+            # Clicks skip on release, as a release left over from skipping would click the title screen
+            if event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONUP):
+                return self.name
+        return constants.NO_ACTION_CODE
+
     def handle_events(self, events, mouse_pos: tuple[int, int]) -> str:
         """Handles events like button presses."""
 
@@ -199,6 +243,15 @@ class TitleScreen:
             if is_over:
                 self.end_transition()
 
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """Returns the areas that changed since the last frame, or None if the whole screen has to be redrawn"""
+        if self.transitioning:
+            return self.dirty_regions.get_dirty_rects(None)
+        return self.dirty_regions.get_dirty_rects({
+            "foreground": (self.current_image, self.foreground_change_rect),
+            "settings": (self.last_hovered == 2, self.settings_icon_rect),
+        })
+
     def draw(self) -> None:
         """Draws the title screen."""
         self.screen.blit(self.title_background_image, (0, 0))
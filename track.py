@@ -1,37 +1,246 @@
+import functools
+import hashlib
+import math
+from pathlib import Path
+import sys
+import time
+from typing import Callable, Optional
+import zipfile
+
 import numpy as np
 import numpy.typing as npt
 import pygame
 
+from asset_manager import AssetManager
 import constants
 
 
-class Track:
-    """Handles all track-related logic, images, and collision geometry"""
+# Bumped whenever the layout of the cached terrain changes, so old caches are rebuilt rather than misread
+TERRAIN_CACHE_FORMAT: str = "terrain-2bit"
+TERRAIN_BUILD_COLUMNS: int = 256  # Columns classified at a time, to bound the temporary arrays while building
+
+
+def _build_track_terrain(mask_path: Path, size: tuple[int, int]) -> npt.NDArray[np.uint8]:
+    """Decodes and scales the mask image into a packed terrain array (see TrackCollision.get_terrain)"""
+    # The mask is only ever read as pixels, so it doesn't need converting to the display format
+    track_image_mask: pygame.Surface = pygame.image.load(mask_path)
+    track_image_mask = pygame.transform.scale(track_image_mask, size)
+
+    width, height = size
+    packed_height: int = -(-height // constants.TERRAIN_PIXELS_PER_BYTE)
+    shifts: npt.NDArray[np.uint8] = np.arange(0, 8, constants.TERRAIN_BITS_PER_PIXEL, dtype=np.uint8)
+    terrain: npt.NDArray[np.uint8] = np.empty((width, packed_height), dtype=np.uint8)
+
+    # Read the pixels in place rather than copying them with array3d
+    track_pixels: npt.NDArray = pygame.surfarray.pixels3d(track_image_mask)
+    for x in range(0, width, TERRAIN_BUILD_COLUMNS):
+        columns: npt.NDArray = track_pixels[x:x + TERRAIN_BUILD_COLUMNS]
+        classes: npt.NDArray[np.uint8] = np.zeros((columns.shape[0], packed_height * constants.TERRAIN_PIXELS_PER_BYTE),
+                                                  dtype=np.uint8)
+        classes[:, :height][np.all(columns == 255, axis=2)] = constants.TERRAIN_OFF_ROAD
+        classes[:, :height][(columns[:, :, 0] == 255) & (columns[:, :, 1] == 0) &
+                            (columns[:, :, 2] == 0)] = constants.TERRAIN_OUT_OF_BOUNDS
+        classes = classes.reshape(columns.shape[0], packed_height, constants.TERRAIN_PIXELS_PER_BYTE) << shifts
+        terrain[x:x + columns.shape[0]] = np.bitwise_or.reduce(classes, axis=2)
+    del track_pixels  # Unlocks the surface
+    return terrain
+
+
+@functools.lru_cache(maxsize=None)
+def get_mask_hash(track_name: str) -> str:
+    """Returns a hash of the track's mask image, which keys every cache built from it (read once per session)"""
+    mask_path: Path = Path(constants.TRACK_IMAGE_PATH.format(track_name=track_name,
+                                                             image_type=constants.TRACK_IMAGE_TYPES[1]))
+    return hashlib.sha1(mask_path.read_bytes()).hexdigest()
+
+
+def load_cached_arrays(cache_path: Path, cache_key: str,
+                       build: Callable[[], dict[str, npt.NDArray]]) -> dict[str, npt.NDArray]:
+    """Returns the arrays saved in an .npz cache if it was written under cache_key, otherwise builds them and writes
+    the cache"""
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if str(cache["key"]) == cache_key:
+                return {name: cache[name] for name in cache.files if name != "key"}
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        pass  # Missing, stale or unreadable cache, so rebuild it
+
+    arrays: dict[str, npt.NDArray] = build()
+    try:
+        # Write to a temporary file first so a crash can't leave a truncated cache behind
+        temp_path: Path = cache_path.with_name(cache_path.stem + ".tmp.npz")
+        np.savez(temp_path, key=np.array(cache_key), **arrays)
+        temp_path.replace(cache_path)
+    except OSError:
+        print(f"Could not write the cache {cache_path}")
+    return arrays
+
+
+def load_track_terrain(track_name: str) -> npt.NDArray[np.uint8]:
+    """Returns the track's packed terrain array, from the on-disk cache when it matches the mask image"""
+    mask_path: Path = Path(constants.TRACK_IMAGE_PATH.format(track_name=track_name,
+                                                             image_type=constants.TRACK_IMAGE_TYPES[1]))
+    size: tuple[int, int] = (int(constants.WIDTH * constants.TRACK_IMAGE_SCALE_FACTOR[track_name][0]),
+                             int(constants.HEIGHT * constants.TRACK_IMAGE_SCALE_FACTOR[track_name][1]))
+    cache_key: str = f"{TERRAIN_CACHE_FORMAT}:{get_mask_hash(track_name)}:{size[0]}x{size[1]}"
+    return load_cached_arrays(Path(constants.TRACK_MASK_CACHE_PATH.format(track_name=track_name)), cache_key,
+                              lambda: {"terrain": _build_track_terrain(mask_path, size)})["terrain"]
+
+
+class LapGate:
+    """A checkpoint or finish line as a line segment across the track, crossed when a car's move during a physics
+    step passes over it in the direction of the race (so a fast car can't step over it)"""
+
+    def __init__(self, area: pygame.Rect, angle: float) -> None:
+        # The line runs along the long side of the gate's area, on the edge that a car going the right way enters by,
+        # so it is crossed on the same step that the car used to be found inside the area
+        radians: float = math.radians(angle)
+        if area.width >= area.height:
+            self.normal: tuple[float, float] = (0.0, math.copysign(1.0, -math.cos(radians)))
+            edge_y: int = area.bottom if self.normal[1] < 0 else area.top
+            self.start: tuple[float, float] = (float(area.left), float(edge_y))
+            self.end: tuple[float, float] = (float(area.right), float(edge_y))
+        else:
+            self.normal = (math.copysign(1.0, math.sin(radians)), 0.0)
+            edge_x: int = area.right if self.normal[0] < 0 else area.left
+            self.start = (float(edge_x), float(area.top))
+            self.end = (float(edge_x), float(area.bottom))
+        self.length: float = math.dist(self.start, self.end)
+        self.tangent: tuple[float, float] = ((self.end[0] - self.start[0]) / self.length,
+                                             (self.end[1] - self.start[1]) / self.length)
+
+    def get_crossing_fraction(self, x0: float, y0: float, x1: float, y1: float) -> Optional[float]:
+        """Returns how far through the move from (x0, y0) to (x1, y1) the gate was crossed going forwards, from just
+        over 0 to 1, or None if it wasn't"""
+        start_x, start_y = self.start
+        normal_x, normal_y = self.normal
+        distance_after: float = (x1 - start_x) * normal_x + (y1 - start_y) * normal_y
+        if distance_after < 0:
+            return None  # Still behind the line, as a car is for most of a lap
+        distance_before: float = (x0 - start_x) * normal_x + (y0 - start_y) * normal_y
+        if distance_before >= 0:
+            return None
+        fraction: float = distance_before / (distance_before - distance_after)
+        along: float = ((x0 + (x1 - x0) * fraction - start_x) * self.tangent[0]
+                        + (y0 + (y1 - y0) * fraction - start_y) * self.tangent[1])
+        return fraction if 0 <= along < self.length else None
+
+    def get_crossing_fraction_array(self, x0: npt.NDArray, y0: npt.NDArray, x1: npt.NDArray,
+                                    y1: npt.NDArray) -> npt.NDArray[np.float64]:
+        """Vectorized get_crossing_fraction for arrays of moves, with NaN where the gate wasn't crossed"""
+        start_x, start_y = self.start
+        normal_x, normal_y = self.normal
+        distance_before: npt.NDArray[np.float64] = (x0 - start_x) * normal_x + (y0 - start_y) * normal_y
+        distance_after: npt.NDArray[np.float64] = (x1 - start_x) * normal_x + (y1 - start_y) * normal_y
+        crossed: npt.NDArray[np.bool_] = (distance_before < 0) & (distance_after >= 0)
+        fraction: npt.NDArray[np.float64] = distance_before / np.where(crossed, distance_before - distance_after, 1.0)
+        along: npt.NDArray[np.float64] = ((x0 + (x1 - x0) * fraction - start_x) * self.tangent[0]
+                                          + (y0 + (y1 - y0) * fraction - start_y) * self.tangent[1])
+        return np.where(crossed & (along >= 0) & (along < self.length), fraction, np.nan)
+
 
-    def __init__(self, name: str) -> None:
+class TrackCollision:
+    """Handles a track's collision geometry, with no dependency on a display"""
+
+    def __init__(self, name: str, assets: Optional[AssetManager] = None) -> None:
         self.name = name
 
         self.finish_line: pygame.Rect = constants.FINISH_LINE_LOCATIONS[self.name]
-        self.checkpoint_1: pygame.Rect = constants.CHECKPOINT_LOCATIONS[self.name]
+        self.checkpoints: list[pygame.Rect] = constants.CHECKPOINT_LOCATIONS[self.name]
+        self.finish_gate: LapGate = LapGate(self.finish_line, constants.START_ROTATION[self.name])
+        # The gate ending each sector of a lap, in order, so the last sector ends at the finish line
+        self.sector_gates: list[LapGate] = [LapGate(area, angle) for area, angle in
+                                            zip(self.checkpoints, constants.CHECKPOINT_ANGLES[self.name])]
+        self.sector_gates.append(self.finish_gate)
+
+        # Two bits per pixel, packed four pixels to a byte along y (the off-road and out-of-bounds masks combined)
+        if assets is not None:
+            self.terrain: npt.NDArray[np.uint8] = assets.get(("terrain", self.name), lambda: load_track_terrain(self.name))
+        else:
+            self.terrain = load_track_terrain(self.name)
+        self.width: int = int(constants.WIDTH * constants.TRACK_IMAGE_SCALE_FACTOR[self.name][0])
+        self.height: int = int(constants.HEIGHT * constants.TRACK_IMAGE_SCALE_FACTOR[self.name][1])
+        # A flat view of the same bytes, since indexing a memoryview is much cheaper than indexing a NumPy array
+        self._terrain_bytes: memoryview = memoryview(np.ascontiguousarray(self.terrain)).cast("B")
+        self._packed_height: int = self.terrain.shape[1]
+
+        # Checkpoints reach across the off-road on either side, so cars respawn on the road in the middle of them
+        self.checkpoint_respawn_points: list[tuple[float, float]] = [self._find_road_centre(area)
+                                                                     for area in self.checkpoints]
+
+    def _find_road_centre(self, area: pygame.Rect) -> tuple[float, float]:
+        """Returns the middle of the widest stretch of road along the long axis of an area, or the area's centre if
+        there is no road across it"""
+        if area.width >= area.height:
+            along: npt.NDArray[np.float64] = np.arange(area.left, area.right, dtype=np.float64)
+            is_road: npt.NDArray[np.bool_] = (self.get_terrain_array(along, np.full_like(along, area.centery))
+                                              == constants.TERRAIN_ROAD)
+        else:
+            along = np.arange(area.top, area.bottom, dtype=np.float64)
+            is_road = (self.get_terrain_array(np.full_like(along, area.centerx), along)
+                       == constants.TERRAIN_ROAD)
+        edges: npt.NDArray[np.intp] = np.flatnonzero(np.diff(np.concatenate(([0], is_road.view(np.int8), [0]))))
+        if edges.size == 0:
+            return float(area.centerx), float(area.centery)
+        starts, ends = edges[0::2], edges[1::2]
+        widest: int = int(np.argmax(ends - starts))
+        middle: float = float(along[0] + (starts[widest] + ends[widest]) // 2)
+        if area.width >= area.height:
+            return middle, float(area.centery)
+        return float(area.centerx), middle
+
+    def get_terrain(self, x: float, y: float) -> int:
+        """Returns the terrain bits (constants.TERRAIN_*) at the given coordinates"""
+        ix, iy = int(x), int(y)
+        if 0 <= ix < self.width and 0 <= iy < self.height:
+            return ((self._terrain_bytes[ix * self._packed_height + (iy >> constants.TERRAIN_BYTE_SHIFT)]
+                     >> ((iy & constants.TERRAIN_SLOT_MASK) << constants.TERRAIN_SLOT_BIT_SHIFT))
+                    & constants.TERRAIN_VALUE_MASK)
+        return constants.TERRAIN_OFF_MAP
+
+    def get_terrain_array(self, x: npt.NDArray, y: npt.NDArray) -> npt.NDArray[np.uint8]:
+        """Vectorized get_terrain for arrays of coordinates"""
+        ix: npt.NDArray[np.int64] = x.astype(np.int64)
+        iy: npt.NDArray[np.int64] = y.astype(np.int64)
+        inside: npt.NDArray[np.bool_] = (ix >= 0) & (ix < self.width) & (iy >= 0) & (iy < self.height)
+        ix = np.where(inside, ix, 0)
+        iy = np.where(inside, iy, 0)
+        terrain: npt.NDArray[np.uint8] = (self.terrain[ix, iy >> constants.TERRAIN_BYTE_SHIFT]
+                                          >> ((iy & constants.TERRAIN_SLOT_MASK)
+                                              << constants.TERRAIN_SLOT_BIT_SHIFT).astype(np.uint8)
+                                          ) & constants.TERRAIN_VALUE_MASK
+        return np.where(inside, terrain, np.uint8(constants.TERRAIN_OFF_MAP))
+
+    def is_off_road(self, x: float, y: float) -> bool:
+        """Checks if the given coordinates are off-road using the terrain"""
+        return bool(self.get_terrain(x, y) & constants.TERRAIN_OFF_ROAD)  # Outside the map counts as off-road
+
+    def is_out_of_bounds(self, x: float, y: float) -> bool:
+        """Checks if the given coordinates are out of bounds using the terrain"""
+        return bool(self.get_terrain(x, y) & constants.TERRAIN_OUT_OF_BOUNDS)  # As is outside the map
 
-        self.track_image: pygame.Surface = pygame.image.load(constants.TRACK_IMAGE_PATH.format(track_name=self.name, image_type=constants.TRACK_IMAGE_TYPES[0])).convert()
-        self.track_image = pygame.transform.scale(self.track_image,
-                                                  (constants.WIDTH * constants.TRACK_IMAGE_SCALE_FACTOR[self.name][0],
-                                                   constants.HEIGHT * constants.TRACK_IMAGE_SCALE_FACTOR[self.name][1]))
 
-        track_image_mask: pygame.Surface = pygame.image.load(constants.TRACK_IMAGE_PATH.format(track_name=self.name, image_type=constants.TRACK_IMAGE_TYPES[1])).convert()
-        track_image_mask = pygame.transform.scale(track_image_mask,
-                                                  (constants.WIDTH * constants.TRACK_IMAGE_SCALE_FACTOR[self.name][0],
-                                                  constants.HEIGHT * constants.TRACK_IMAGE_SCALE_FACTOR[self.name][1]))
+class Track(TrackCollision):
+    """Handles all track-related logic, images, and collision geometry"""
 
-        track_pixels: npt.NDArray = pygame.surfarray.array3d(track_image_mask)
-        self.off_road_mask: npt.NDArray[np.bool_] = np.all(track_pixels == 255, axis=2)
-        self.out_of_bounds_mask: bool = ((track_pixels[:, :, 0] == 255) &
-                                        (track_pixels[:, :, 1] == 0) &
-                                        (track_pixels[:, :, 2] == 0))
+    def __init__(self, name: str, assets: AssetManager) -> None:
+        super().__init__(name, assets)
+
+        self.track_image: pygame.Surface = assets.load_image(
+            constants.TRACK_IMAGE_PATH.format(track_name=self.name, image_type=constants.TRACK_IMAGE_TYPES[0]), False,
+            self.width, self.height)
 
         self.playlist: list[tuple[str, int]] = self._create_playlist()
 
+    @staticmethod
+    def preload(name: str, assets: AssetManager) -> None:
+        """Starts building the track's image and terrain in the background, ready for when the race is created"""
+        assets.preload(("terrain", name), lambda: load_track_terrain(name), group=name)
+        assets.preload_image(
+            constants.TRACK_IMAGE_PATH.format(track_name=name, image_type=constants.TRACK_IMAGE_TYPES[0]), False,
+            int(constants.WIDTH * constants.TRACK_IMAGE_SCALE_FACTOR[name][0]),
+            int(constants.HEIGHT * constants.TRACK_IMAGE_SCALE_FACTOR[name][1]), group=name)
+
     def _create_playlist(self) -> list[tuple[str, int]]:
         """Creates the playlist for the track"""
         playlist: list[tuple[str, int]] = [
@@ -48,24 +257,26 @@ class Track:
         """Draws the main track image onto the screen"""
         screen.blit(self.track_image, (-camera_x, -camera_y))
 
-    def is_off_road(self, x: float, y: float) -> bool:
-        """Checks if the given coordinates are off-road using the mask"""
-        ix, iy = int(x), int(y)
-        if 0 <= ix < self.off_road_mask.shape[0] and 0 <= iy < self.off_road_mask.shape[1]:
-            return self.off_road_mask[ix, iy]
-        return True  # Treat outside map boundaries as off-road
 
-    def is_out_of_bounds(self, x: float, y: float) -> bool:
-        """Checks if the given coordinates are out of bounds using the mask"""
-        ix, iy = int(x), int(y)
-        if 0 <= ix < self.out_of_bounds_mask.shape[0] and 0 <= iy < self.out_of_bounds_mask.shape[1]:
-            return self.out_of_bounds_mask[ix, iy]
-        return True  # Treat outside map boundaries as out of bounds
+def benchmark_render(track_name: str, assets: AssetManager, screen: pygame.Surface, num_frames: int) -> None:
+    """Times drawing a track at the native resolution while the camera sweeps over it, printing the time per frame"""
+    track: Track = Track(track_name, assets)
+    # Sweep the camera in a Lissajous curve so it crosses the middle and the edges of the map
+    cameras: list[tuple[float, float]] = [
+        ((track.width - constants.WIDTH) * (0.5 + 0.55 * math.sin(i * 0.0131)),
+         (track.height - constants.HEIGHT) * (0.5 + 0.55 * math.sin(i * 0.0173)))
+        for i in range(num_frames)]
+    start: float = time.perf_counter()
+    for camera_x, camera_y in cameras:
+        track.draw(screen, camera_x, camera_y)
+    elapsed: float = time.perf_counter() - start
+    print(f"{track_name:<20} {track.width}x{track.height}  "
+          f"{elapsed / num_frames * 1000:6.3f} ms/frame")
 
-    def check_checkpoint(self, x: float, y: float) -> bool:
-        """Checks if the given coordinates intersect the checkpoint area"""
-        return self.checkpoint_1.collidepoint(int(x), int(y))
 
-    def check_finish_line(self, x: float, y: float) -> bool:
-        """Checks if the given coordinates intersect the finish line area"""
-        return self.finish_line.collidepoint(int(x), int(y))
\ No newline at end of file
+if __name__ == "__main__":
+    pygame.init()
+    display: pygame.Surface = pygame.display.set_mode((constants.WIDTH, constants.HEIGHT))
+    frames: int = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for name in constants.TRACK_NAMES:
+        benchmark_render(name, AssetManager(), display, frames)
@@ -0,0 +1,186 @@
+from pathlib import Path
+import sys
+import time
+
+import numpy as np
+import numpy.typing as npt
+
+import constants
+from track import TrackCollision, get_mask_hash, load_cached_arrays
+
+
+# Bumped whenever the layout of the cached distance fields changes, so old caches are rebuilt rather than misread
+DISTANCE_CACHE_FORMAT: str = "distance-1"
+DISTANCE_UNITS_PER_PIXEL: int = 8  # The fields are stored as int16 in eighths of a pixel
+
+
+def _find_cell_distances(is_target: npt.NDArray[np.bool_], max_cells: int) -> npt.NDArray[np.float64]:
+    """Returns the straight-line distance in cells from every cell to the nearest target cell, up to max_cells
+
+    Finds the nearest target along each column first, then the nearest of those across each row. Capping the distance
+    means each row only has to look max_cells either side, as that is as far as anything within the cap can be."""
+    width, height = is_target.shape
+    far: int = max_cells + 1
+    rows: npt.NDArray[np.int32] = np.arange(height, dtype=np.int32)
+    previous: npt.NDArray[np.int32] = np.maximum.accumulate(np.where(is_target, rows, -far - height), axis=1)
+    following: npt.NDArray[np.int32] = np.minimum.accumulate(np.where(is_target, rows, far + height)[:, ::-1],
+                                                             axis=1)[:, ::-1]
+    column_distance: npt.NDArray[np.int32] = np.minimum(np.minimum(rows - previous, following - rows), far)
+
+    # Squared distances, padded with a column of the cap either side so the shifted slices never run off the grid
+    padded: npt.NDArray[np.int32] = np.full((width + 2 * max_cells, height), far * far, dtype=np.int32)
+    padded[max_cells:max_cells + width] = column_distance * column_distance
+    squared: npt.NDArray[np.int32] = padded[max_cells:max_cells + width].copy()
+    for dx in range(1, max_cells + 1):
+        np.minimum(squared, padded[max_cells + dx:max_cells + dx + width] + dx * dx, out=squared)
+        np.minimum(squared, padded[max_cells - dx:max_cells - dx + width] + dx * dx, out=squared)
+    return np.minimum(np.sqrt(squared), max_cells)
+
+
+def _build_signed_distance(is_inside: npt.NDArray[np.bool_], cell_size: int,
+                           max_distance: int) -> npt.NDArray[np.int16]:
+    """Returns how far each cell is inside (positive) or outside (negative) a region, in DISTANCE_UNITS_PER_PIXEL
+
+    Distances are measured between cell centres, so the boundary sits half a cell from the cells either side of it."""
+    max_cells: int = -(-max_distance // cell_size)
+    distance: npt.NDArray[np.float64] = np.where(is_inside, _find_cell_distances(~is_inside, max_cells) - 0.5,
+                                                 0.5 - _find_cell_distances(is_inside, max_cells))
+    distance = np.clip(distance * cell_size, -max_distance, max_distance)
+    return np.round(distance * DISTANCE_UNITS_PER_PIXEL).astype(np.int16)
+
+
+def _build_track_distances(track: TrackCollision, cell_size: int, max_distance: int) -> dict[str, npt.NDArray]:
+    """Works out the distance fields of the road and of the in-bounds area over a grid covering the track"""
+    width: int = -(-track.width // cell_size)
+    height: int = -(-track.height // cell_size)
+    centre_x, centre_y = np.meshgrid((np.arange(width) + 0.5) * cell_size, (np.arange(height) + 0.5) * cell_size,
+                                     indexing="ij")
+    terrain: npt.NDArray[np.uint8] = track.get_terrain_array(centre_x, centre_y)
+    return {"road_edge": _build_signed_distance(terrain == constants.TERRAIN_ROAD, cell_size, max_distance),
+            "wall": _build_signed_distance((terrain & constants.TERRAIN_OUT_OF_BOUNDS) == 0, cell_size, max_distance)}
+
+
+class TrackDistanceField:
+    """How far every point of a track is from the edge of the road and from the out of bounds walls, from grids worked
+    out ahead of time, so proximity checks are a few array lookups rather than probing the terrain around a point
+
+    Distances are positive on the near side of the edge (on the road, or in bounds) and negative past it, and are
+    clamped to max_distance. Between cell centres they are interpolated, so they change smoothly as a car moves."""
+
+    def __init__(self, road_edge: npt.NDArray[np.int16], wall: npt.NDArray[np.int16],
+                 cell_size: int = constants.TRACK_DISTANCE_CELL_SIZE,
+                 max_distance: int = constants.TRACK_DISTANCE_MAX) -> None:
+        self.road_edge: npt.NDArray[np.int16] = np.ascontiguousarray(road_edge)
+        self.wall: npt.NDArray[np.int16] = np.ascontiguousarray(wall)
+        self.cell_size: int = cell_size
+        self.max_distance: int = max_distance
+        self._width, self._height = self.road_edge.shape
+        # Flat views of the same values, since indexing a memoryview is much cheaper than indexing a NumPy array
+        self._road_edge_values: memoryview = memoryview(self.road_edge).cast("B").cast("h")
+        self._wall_values: memoryview = memoryview(self.wall).cast("B").cast("h")
+
+    @classmethod
+    def load(cls, track: TrackCollision, cell_size: int = constants.TRACK_DISTANCE_CELL_SIZE,
+             max_distance: int = constants.TRACK_DISTANCE_MAX) -> "TrackDistanceField":
+        """Returns the track's distance fields, from the on-disk cache when it matches the mask image"""
+        cache_key: str = (f"{DISTANCE_CACHE_FORMAT}:{get_mask_hash(track.name)}:{track.width}x{track.height}:"
+                          f"{cell_size}:{max_distance}")
+        fields: dict[str, npt.NDArray] = load_cached_arrays(
+            Path(constants.TRACK_DISTANCE_CACHE_PATH.format(track_name=track.name)), cache_key,
+            lambda: _build_track_distances(track, cell_size, max_distance))
+        return cls(fields["road_edge"], fields["wall"], cell_size, max_distance)
+
+    def _interpolate(self, values: memoryview, x: float, y: float) -> tuple[float, float, float]:
+        """Returns a field at a point in pixels, interpolated between the four nearest cell centres, along with its
+        change per pixel along x and y (points off the map take the values at its edge)"""
+        grid_x: float = min(max(x / self.cell_size - 0.5, 0.0), self._width - 1.0)
+        grid_y: float = min(max(y / self.cell_size - 0.5, 0.0), self._height - 1.0)
+        ix, iy = min(int(grid_x), self._width - 2), min(int(grid_y), self._height - 2)
+        fx, fy = grid_x - ix, grid_y - iy
+        index: int = ix * self._height + iy
+        top_left, bottom_left = values[index], values[index + 1]
+        top_right, bottom_right = values[index + self._height], values[index + self._height + 1]
+        top: float = top_left + (top_right - top_left) * fx
+        bottom: float = bottom_left + (bottom_right - bottom_left) * fx
+        scale: float = 1 / (self.cell_size * DISTANCE_UNITS_PER_PIXEL)
+        return ((top + (bottom - top) * fy) / DISTANCE_UNITS_PER_PIXEL,
+                ((top_right - top_left) * (1 - fy) + (bottom_right - bottom_left) * fy) * scale,
+                (bottom - top) * scale)
+
+    def _interpolate_array(self, field: npt.NDArray[np.int16], x: npt.NDArray,
+                           y: npt.NDArray) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64],
+                                                    npt.NDArray[np.float64]]:
+        """Vectorized _interpolate for arrays of coordinates"""
+        grid_x: npt.NDArray[np.float64] = np.minimum(np.maximum(x / self.cell_size - 0.5, 0.0), self._width - 1.0)
+        grid_y: npt.NDArray[np.float64] = np.minimum(np.maximum(y / self.cell_size - 0.5, 0.0), self._height - 1.0)
+        ix: npt.NDArray[np.intp] = np.minimum(grid_x.astype(np.intp), self._width - 2)
+        iy: npt.NDArray[np.intp] = np.minimum(grid_y.astype(np.intp), self._height - 2)
+        fx: npt.NDArray[np.float64] = grid_x - ix
+        fy: npt.NDArray[np.float64] = grid_y - iy
+        index: npt.NDArray[np.intp] = ix * self._height + iy
+        values: npt.NDArray[np.int16] = field.reshape(-1)
+        top_left: npt.NDArray[np.float64] = values.take(index).astype(np.float64)
+        bottom_left: npt.NDArray[np.float64] = values.take(index + 1).astype(np.float64)
+        top_right: npt.NDArray[np.float64] = values.take(index + self._height).astype(np.float64)
+        bottom_right: npt.NDArray[np.float64] = values.take(index + self._height + 1).astype(np.float64)
+        top: npt.NDArray[np.float64] = top_left + (top_right - top_left) * fx
+        bottom: npt.NDArray[np.float64] = bottom_left + (bottom_right - bottom_left) * fx
+        scale: float = 1 / (self.cell_size * DISTANCE_UNITS_PER_PIXEL)
+        return ((top + (bottom - top) * fy) / DISTANCE_UNITS_PER_PIXEL,
+                ((top_right - top_left) * (1 - fy) + (bottom_right - bottom_left) * fy) * scale,
+                (bottom - top) * scale)
+
+    def get_road_edge_distance(self, x: float, y: float) -> float:
+        """Returns how far a point is from the edge of the road, positive on the road and negative off it"""
+        return self._interpolate(self._road_edge_values, x, y)[0]
+
+    def get_wall_distance(self, x: float, y: float) -> float:
+        """Returns how far a point is from the out of bounds area, positive in bounds and negative out of them"""
+        return self._interpolate(self._wall_values, x, y)[0]
+
+    def get_road_edge_distance_array(self, x: npt.NDArray, y: npt.NDArray) -> npt.NDArray[np.float64]:
+        """Vectorized get_road_edge_distance for arrays of coordinates"""
+        return self._interpolate_array(self.road_edge, x, y)[0]
+
+    def get_wall_distance_array(self, x: npt.NDArray, y: npt.NDArray) -> npt.NDArray[np.float64]:
+        """Vectorized get_wall_distance for arrays of coordinates"""
+        return self._interpolate_array(self.wall, x, y)[0]
+
+    def get_road_edge_gradient(self, x: float, y: float) -> tuple[float, float]:
+        """Returns the direction towards the middle of the road (or back onto it) at a point, scaled by how quickly
+        the distance changes, which is close to 1 near the edge and 0 where the distance is clamped"""
+        return self._interpolate(self._road_edge_values, x, y)[1:]
+
+    def get_wall_gradient(self, x: float, y: float) -> tuple[float, float]:
+        """Returns the direction away from the nearest out of bounds area at a point (see get_road_edge_gradient)"""
+        return self._interpolate(self._wall_values, x, y)[1:]
+
+    def get_road_edge_gradient_array(self, x: npt.NDArray,
+                                     y: npt.NDArray) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Vectorized get_road_edge_gradient for arrays of coordinates"""
+        return self._interpolate_array(self.road_edge, x, y)[1:]
+
+    def get_wall_gradient_array(self, x: npt.NDArray,
+                                y: npt.NDArray) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Vectorized get_wall_gradient for arrays of coordinates"""
+        return self._interpolate_array(self.wall, x, y)[1:]
+
+
+def build_all_distance_fields() -> None:
+    """Builds (or loads from the cache) every track's distance fields, printing how long each took"""
+    print(f"{'track':<20} {'grid':>9} {'kB':>6} {'seconds':>8}")
+    for track_name in constants.TRACK_NAMES:
+        track: TrackCollision = TrackCollision(track_name)
+        start: float = time.perf_counter()
+        distances: TrackDistanceField = TrackDistanceField.load(track)
+        elapsed: float = time.perf_counter() - start
+        grid: str = f"{distances.road_edge.shape[0]}x{distances.road_edge.shape[1]}"
+        size: float = (distances.road_edge.nbytes + distances.wall.nbytes) / 1024
+        print(f"{track_name:<20} {grid:>9} {size:>6.0f} {elapsed:>8.3f}")
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv[1:]:
+        for name in constants.TRACK_NAMES:
+            Path(constants.TRACK_DISTANCE_CACHE_PATH.format(track_name=name)).unlink(missing_ok=True)
+    build_all_distance_fields()
@@ -0,0 +1,436 @@
+import heapq
+import math
+from pathlib import Path
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+
+import constants
+from track import LapGate, TrackCollision, get_mask_hash, load_cached_arrays
+from track_distance import TrackDistanceField
+
+
+# Bumped whenever the layout of the cached progress field and racing line changes, so old caches are rebuilt rather
+# than misread
+PROGRESS_CACHE_FORMAT: str = "progress-2"
+CENTERLINE_SMOOTHING_POINTS: int = 5  # Centerline points averaged together to smooth out the steps of the grid
+# Strips of road narrower than this many pixels (such as the thin links between parts of the fiery furnace) are followed
+# like off-road, so they aren't taken as shortcuts round the lap
+MIN_ROAD_WIDTH: int = 56
+
+# The racing line is worked out on points this many pixels apart, each free to slide sideways within the drivable
+# corridor measured this far either side of it in steps of RACING_LINE_CORRIDOR_STEP
+RACING_LINE_SPACING: float = 32.0
+RACING_LINE_CORRIDOR_REACH: float = 160.0
+RACING_LINE_CORRIDOR_STEP: float = 4.0
+RACING_LINE_PASSES: int = 20  # Times the line is evened out along its length and smoothed again
+RACING_LINE_ITERATIONS: int = 100  # Smoothing iterations per pass
+
+# Grid neighbours as (dx, dy, step length in cells)
+NEIGHBOUR_STEPS: list[tuple[int, int, float]] = [(dx, dy, math.hypot(dx, dy)) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                                                 if dx or dy]
+
+
+def _get_wall_extent(track: TrackCollision, gate: LapGate) -> tuple[float, float]:
+    """Returns how far before the start and past the end of a gate's line (as distances along it) the drivable area
+    across the track reaches, stopping halfway to any other stretch of road
+
+    The finish line only spans the road, but the lap has to be cut right across the track."""
+    def extend(position: float, step: int) -> float:
+        start_x, start_y = gate.start
+        def get_terrain(along: float) -> int:
+            return track.get_terrain(start_x + gate.tangent[0] * along, start_y + gate.tangent[1] * along)
+        while get_terrain(position + step) == constants.TERRAIN_ROAD:
+            position += step
+        road_edge: float = position
+        while get_terrain(position + step) == constants.TERRAIN_OFF_ROAD:
+            position += step
+        if get_terrain(position + step) == constants.TERRAIN_ROAD:
+            return (road_edge + position) / 2
+        return position + step
+
+    return extend(0.0, -1), extend(gate.length, 1)
+
+
+def _get_gate_sides(gate: LapGate, wall_extent: tuple[float, float], x: npt.NDArray, y: npt.NDArray,
+                    margin: float) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.bool_]]:
+    """Returns how far in front of a gate's line each point is, and whether it is beside the line's wall (within
+    margin of its ends)"""
+    start_x, start_y = gate.start
+    ahead: npt.NDArray[np.float64] = (x - start_x) * gate.normal[0] + (y - start_y) * gate.normal[1]
+    along: npt.NDArray[np.float64] = (x - start_x) * gate.tangent[0] + (y - start_y) * gate.tangent[1]
+    return ahead, (along >= wall_extent[0] - margin) & (along < wall_extent[1] + margin)
+
+
+def _find_lap_distances(terrain: npt.NDArray[np.uint8], cell_size: int, finish_gate: LapGate,
+                        wall_extent: tuple[float, float]) -> npt.NDArray[np.float64]:
+    """Returns the driving distance of each grid cell from the finish line going forwards, or inf where the cell can't be
+    reached without crossing the line
+
+    Off-road cells cost more to cross, so the distances follow the road wherever it goes."""
+    width, height = terrain.shape
+    centre_x, centre_y = np.meshgrid((np.arange(width) + 0.5) * cell_size, (np.arange(height) + 0.5) * cell_size,
+                                     indexing="ij")
+    ahead, beside = _get_gate_sides(finish_gate, wall_extent, centre_x, centre_y, cell_size)
+    is_ahead: list[list[bool]] = (ahead >= 0).tolist()
+    is_beside: list[list[bool]] = beside.tolist()
+    step_costs: list[list[float]] = np.where(terrain == constants.TERRAIN_ROAD, 1.0,
+                                             constants.TRACK_PROGRESS_OFF_ROAD_COST).tolist()
+    is_drivable: list[list[bool]] = ((terrain & constants.TERRAIN_OUT_OF_BOUNDS) == 0).tolist()
+
+    # Start from the road just over the line, and never step across it, so the distances go the long way round the lap
+    distances: npt.NDArray[np.float64] = np.full((width, height), np.inf)
+    seeds: npt.NDArray[np.bool_] = beside & (ahead >= 0) & (ahead < cell_size) & (terrain == constants.TERRAIN_ROAD)
+    queue: list[tuple[float, int, int]] = [(0.0, int(x), int(y)) for x, y in np.argwhere(seeds)]
+    heapq.heapify(queue)
+    best: list[list[float]] = distances.tolist()
+    for _, x, y in queue:
+        best[x][y] = 0.0
+    while queue:
+        distance, x, y = heapq.heappop(queue)
+        if distance > best[x][y]:
+            continue
+        cost: float = step_costs[x][y]
+        crossing_from: bool = is_beside[x][y]
+        for dx, dy, length in NEIGHBOUR_STEPS:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < width and 0 <= ny < height) or not is_drivable[nx][ny]:
+                continue
+            if crossing_from and is_beside[nx][ny] and is_ahead[nx][ny] != is_ahead[x][y]:
+                continue
+            new_distance: float = distance + length * (cost + step_costs[nx][ny]) / 2
+            if new_distance < best[nx][ny]:
+                best[nx][ny] = new_distance
+                heapq.heappush(queue, (new_distance, nx, ny))
+    distances[:] = best
+    return distances * cell_size
+
+
+def _remove_narrow_road(terrain: npt.NDArray[np.uint8], radius: int) -> npt.NDArray[np.uint8]:
+    """Returns the terrain with any road that doesn't fit a square of road radius cells either side of its middle
+    counted as off-road (a morphological opening of the road)"""
+    def shift(values: npt.NDArray[np.bool_], offset: int, axis: int, fill: bool) -> npt.NDArray[np.bool_]:
+        shifted: npt.NDArray[np.bool_] = np.full_like(values, fill)
+        if axis == 0:
+            shifted[max(offset, 0):values.shape[0] + min(offset, 0)] = \
+                values[max(-offset, 0):values.shape[0] + min(-offset, 0)]
+        else:
+            shifted[:, max(offset, 0):values.shape[1] + min(offset, 0)] = \
+                values[:, max(-offset, 0):values.shape[1] + min(-offset, 0)]
+        return shifted
+
+    # The square is separable, so each pass spreads along one axis at a time (from that pass's input, so the reach is
+    # radius cells rather than growing with every shift)
+    is_road: npt.NDArray[np.bool_] = terrain == constants.TERRAIN_ROAD
+    eroded: npt.NDArray[np.bool_] = is_road
+    for axis in range(2):
+        source: npt.NDArray[np.bool_] = eroded
+        for offset in range(1, radius + 1):
+            eroded = eroded & shift(source, offset, axis, False) & shift(source, -offset, axis, False)
+    wide: npt.NDArray[np.bool_] = eroded
+    for axis in range(2):
+        source = wide
+        for offset in range(1, radius + 1):
+            wide = wide | shift(source, offset, axis, False) | shift(source, -offset, axis, False)
+    return np.where(is_road & ~wide, np.uint8(constants.TERRAIN_OFF_ROAD), terrain)
+
+
+def _remove_stray_road(terrain: npt.NDArray[np.uint8], seeds: npt.NDArray[np.bool_]) -> npt.NDArray[np.uint8]:
+    """Returns the terrain with any specks of road not joined to the seed cells (such as the edges of the mask around
+    the out of bounds areas) counted as off-road"""
+    width, height = terrain.shape
+    is_road: list[list[bool]] = (terrain == constants.TERRAIN_ROAD).tolist()
+    is_connected: npt.NDArray[np.bool_] = np.zeros(terrain.shape, dtype=np.bool_)
+    stack: list[tuple[int, int]] = [(int(x), int(y)) for x, y in np.argwhere(seeds)]
+    for x, y in stack:
+        is_road[x][y] = False
+    while stack:
+        x, y = stack.pop()
+        is_connected[x, y] = True
+        for dx, dy, _ in NEIGHBOUR_STEPS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and is_road[nx][ny]:
+                is_road[nx][ny] = False  # Visited
+                stack.append((nx, ny))
+    return np.where((terrain == constants.TERRAIN_ROAD) & ~is_connected, np.uint8(constants.TERRAIN_OFF_ROAD), terrain)
+
+
+def _spread_from_road(terrain: npt.NDArray[np.uint8], values: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Gives every drivable off-road cell the value of the nearest road cell, by growing the road outwards one cell at a
+    time (out of bounds cells are left as NaN)"""
+    result: npt.NDArray[np.float64] = np.where(terrain == constants.TERRAIN_ROAD, values, np.nan)
+    is_drivable: npt.NDArray[np.bool_] = (terrain & constants.TERRAIN_OUT_OF_BOUNDS) == 0
+    while True:
+        missing: npt.NDArray[np.bool_] = is_drivable & np.isnan(result)
+        if not missing.any():
+            return result
+        grown: npt.NDArray[np.float64] = result.copy()
+        for dx, dy, _ in NEIGHBOUR_STEPS:
+            neighbour: npt.NDArray[np.float64] = np.full_like(result, np.nan)
+            neighbour[max(dx, 0):result.shape[0] + min(dx, 0), max(dy, 0):result.shape[1] + min(dy, 0)] = \
+                result[max(-dx, 0):result.shape[0] + min(-dx, 0), max(-dy, 0):result.shape[1] + min(-dy, 0)]
+            fill: npt.NDArray[np.bool_] = missing & np.isnan(grown) & ~np.isnan(neighbour)
+            grown[fill] = neighbour[fill]
+        if np.array_equal(np.isnan(grown), np.isnan(result)):
+            return grown  # The rest can't be reached from the road
+        result = grown
+
+
+def _build_track_progress(track: TrackCollision, cell_size: int) -> dict[str, npt.NDArray]:
+    """Works out the lap distance of every cell of a coarse grid over the track, the centerline through the middle of
+    the road, and how far each cell is to the side of it"""
+    width: int = -(-track.width // cell_size)
+    height: int = -(-track.height // cell_size)
+    centre_x, centre_y = np.meshgrid((np.arange(width) + 0.5) * cell_size, (np.arange(height) + 0.5) * cell_size,
+                                     indexing="ij")
+    terrain: npt.NDArray[np.uint8] = track.get_terrain_array(centre_x, centre_y)
+    wall_extent: tuple[float, float] = _get_wall_extent(track, track.finish_gate)
+    ahead, beside = _get_gate_sides(track.finish_gate, wall_extent, centre_x, centre_y, 0.0)
+    terrain = _remove_narrow_road(terrain, max(1, MIN_ROAD_WIDTH // cell_size // 2))
+    terrain = _remove_stray_road(terrain, beside & (np.abs(ahead) < cell_size) & (terrain == constants.TERRAIN_ROAD))
+    distances: npt.NDArray[np.float64] = _find_lap_distances(terrain, cell_size, track.finish_gate, wall_extent)
+
+    # The lap ends at the road just behind the line, where the distances come back round to the start
+    lap_end: npt.NDArray[np.bool_] = (beside & (ahead < 0) & (ahead >= -cell_size) & (terrain == constants.TERRAIN_ROAD)
+                                      & np.isfinite(distances))
+    lap_length: float = float(distances[lap_end].min()) + cell_size / 2
+    is_on_lap: npt.NDArray[np.bool_] = (terrain == constants.TERRAIN_ROAD) & (distances < lap_length)
+    lap_distance: npt.NDArray[np.float64] = _spread_from_road(terrain, np.where(is_on_lap, distances, np.nan))
+
+    # The centerline passes through the middle of the road cells at each distance round the lap
+    num_points: int = int(lap_length // cell_size)
+    point_index: npt.NDArray[np.intp] = np.minimum(distances[is_on_lap] // cell_size, num_points - 1).astype(np.intp)
+    counts: npt.NDArray[np.float64] = np.bincount(point_index, minlength=num_points).astype(np.float64)
+    centerline: npt.NDArray[np.float64] = np.stack(
+        [np.bincount(point_index, centre_x[is_on_lap], num_points), np.bincount(point_index, centre_y[is_on_lap],
+                                                                                 num_points)], axis=1)
+    has_points: npt.NDArray[np.bool_] = counts > 0
+    centerline[has_points] /= counts[has_points, None]
+    for axis in range(2):
+        # Fill any distances that no cell centre fell on from the points either side
+        centerline[:, axis] = np.interp(np.arange(num_points), np.flatnonzero(has_points),
+                                        centerline[has_points, axis], period=num_points)
+    kernel: npt.NDArray[np.float64] = np.ones(CENTERLINE_SMOOTHING_POINTS) / CENTERLINE_SMOOTHING_POINTS
+    half: int = CENTERLINE_SMOOTHING_POINTS // 2
+    centerline = np.stack([np.convolve(np.concatenate((centerline[-half:, axis], centerline[:, axis],
+                                                       centerline[:half, axis])), kernel, mode="valid")
+                           for axis in range(2)], axis=1)
+
+    # Positive to the right of the direction of the race, negative to the left
+    nearest: npt.NDArray[np.intp] = np.minimum(np.nan_to_num(lap_distance) // cell_size,
+                                               num_points - 1).astype(np.intp)
+    tangent: npt.NDArray[np.float64] = np.roll(centerline, -1, axis=0) - np.roll(centerline, 1, axis=0)
+    tangent /= np.maximum(np.hypot(tangent[:, 0], tangent[:, 1]), 1e-9)[:, None]
+    line_offset: npt.NDArray[np.float64] = ((centre_x - centerline[nearest, 0]) * -tangent[nearest, 1]
+                                            + (centre_y - centerline[nearest, 1]) * tangent[nearest, 0])
+    line_offset[np.isnan(lap_distance)] = np.nan
+
+    return {"lap_distance": lap_distance.astype(np.float32), "line_offset": line_offset.astype(np.float32),
+            "centerline": centerline.astype(np.float32), "lap_length": np.array(lap_length)}
+
+
+class TrackProgress:
+    """How far round the lap and how far off the centerline every point of a track is, from a coarse grid worked out
+    ahead of time, so progress, wrong-way and steering checks are single array lookups"""
+
+    def __init__(self, lap_distance: npt.NDArray[np.float32], line_offset: npt.NDArray[np.float32],
+                 centerline: npt.NDArray[np.float32], lap_length: float,
+                 cell_size: int = constants.TRACK_PROGRESS_CELL_SIZE,
+                 racing_line: Optional[npt.NDArray[np.float64]] = None) -> None:
+        self.lap_distance: npt.NDArray[np.float32] = lap_distance
+        self.line_offset: npt.NDArray[np.float32] = line_offset
+        self.centerline: npt.NDArray[np.float32] = centerline  # (x, y) every cell_size px of lap distance
+        self.lap_length: float = lap_length
+        self.cell_size: int = cell_size
+        self.racing_line: Optional[npt.NDArray[np.float64]] = racing_line  # See build_racing_line
+
+    @classmethod
+    def load(cls, track: TrackCollision, distances: TrackDistanceField,
+             cell_size: int = constants.TRACK_PROGRESS_CELL_SIZE) -> "TrackProgress":
+        """Returns the track's progress field along with its racing line, from the on-disk cache when it matches the
+        mask image, finish line and racing line settings"""
+        finish_line: tuple[int, int, int, int] = tuple(track.finish_line)
+        racing_line_settings: tuple[float, ...] = (
+            constants.AI_OFF_ROAD_ALLOWANCE, constants.AI_WALL_CLEARANCE, constants.AI_GRID_COLUMN_OFFSET,
+            RACING_LINE_SPACING, RACING_LINE_CORRIDOR_REACH, RACING_LINE_CORRIDOR_STEP, RACING_LINE_PASSES,
+            RACING_LINE_ITERATIONS, distances.cell_size, distances.max_distance)
+        cache_key: str = (f"{PROGRESS_CACHE_FORMAT}:{get_mask_hash(track.name)}:{track.width}x{track.height}:"
+                          f"{cell_size}:{finish_line}:{constants.START_ROTATION[track.name]}:"
+                          f"{constants.TRACK_PROGRESS_OFF_ROAD_COST}:{racing_line_settings}")
+
+        def build() -> dict[str, npt.NDArray]:
+            fields: dict[str, npt.NDArray] = _build_track_progress(track, cell_size)
+            progress: TrackProgress = cls(fields["lap_distance"], fields["line_offset"], fields["centerline"],
+                                          float(fields["lap_length"]), cell_size)
+            fields["racing_line"] = build_racing_line(track, progress, distances)
+            return fields
+
+        fields: dict[str, npt.NDArray] = load_cached_arrays(
+            Path(constants.TRACK_PROGRESS_CACHE_PATH.format(track_name=track.name)), cache_key, build)
+        return cls(fields["lap_distance"], fields["line_offset"], fields["centerline"], float(fields["lap_length"]),
+                   cell_size, fields["racing_line"])
+
+    def _get_cell(self, x: float, y: float) -> Optional[tuple[int, int]]:
+        """Returns the grid cell containing a point, or None if it is off the map"""
+        ix, iy = int(x) // self.cell_size, int(y) // self.cell_size
+        if 0 <= ix < self.lap_distance.shape[0] and 0 <= iy < self.lap_distance.shape[1] and x >= 0 and y >= 0:
+            return ix, iy
+        return None
+
+    def get_lap_distance(self, x: float, y: float) -> float:
+        """Returns how far round the lap from the finish line a point is, from 0 up to lap_length, or NaN if it is out
+        of bounds"""
+        cell: Optional[tuple[int, int]] = self._get_cell(x, y)
+        return float(self.lap_distance[cell]) if cell is not None else math.nan
+
+    def get_line_offset(self, x: float, y: float) -> float:
+        """Returns how far a point is to the right (positive) or left (negative) of the centerline, or NaN if it is out
+        of bounds"""
+        cell: Optional[tuple[int, int]] = self._get_cell(x, y)
+        return float(self.line_offset[cell]) if cell is not None else math.nan
+
+    def _get_cells(self, x: npt.NDArray, y: npt.NDArray) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp],
+                                                                   npt.NDArray[np.bool_]]:
+        """Vectorized _get_cell, returning clamped cell indices and which points are on the map"""
+        ix: npt.NDArray[np.intp] = np.floor_divide(x, self.cell_size).astype(np.intp)
+        iy: npt.NDArray[np.intp] = np.floor_divide(y, self.cell_size).astype(np.intp)
+        inside: npt.NDArray[np.bool_] = ((ix >= 0) & (ix < self.lap_distance.shape[0])
+                                         & (iy >= 0) & (iy < self.lap_distance.shape[1]))
+        return np.where(inside, ix, 0), np.where(inside, iy, 0), inside
+
+    def get_lap_distance_array(self, x: npt.NDArray, y: npt.NDArray) -> npt.NDArray[np.float32]:
+        """Vectorized get_lap_distance for arrays of coordinates"""
+        ix, iy, inside = self._get_cells(x, y)
+        return np.where(inside, self.lap_distance[ix, iy], np.float32(np.nan))
+
+    def get_line_offset_array(self, x: npt.NDArray, y: npt.NDArray) -> npt.NDArray[np.float32]:
+        """Vectorized get_line_offset for arrays of coordinates"""
+        ix, iy, inside = self._get_cells(x, y)
+        return np.where(inside, self.line_offset[ix, iy], np.float32(np.nan))
+
+    def get_centerline_point(self, lap_distance: float) -> tuple[float, float]:
+        """Returns the point on the centerline at a distance round the lap (wrapping past the finish line)"""
+        x, y = self.centerline[int(lap_distance // self.cell_size) % self.centerline.shape[0]].tolist()
+        return x, y
+
+    def get_centerline_angle(self, lap_distance: float) -> float:
+        """Returns the direction of the race along the centerline at a distance round the lap, as a car angle"""
+        index: int = int(lap_distance // self.cell_size)
+        next_x, next_y = self.centerline[(index + 1) % self.centerline.shape[0]].tolist()
+        previous_x, previous_y = self.centerline[(index - 1) % self.centerline.shape[0]].tolist()
+        # Car angles are clockwise from straight up (see CarPhysics.update_position)
+        return math.degrees(math.atan2(next_x - previous_x, previous_y - next_y)) % 360
+
+
+def _resample_loop(points: npt.NDArray[np.float64], num_points: int, lap_length: float) -> npt.NDArray[np.float64]:
+    """Returns num_points evenly spaced along the closed loop through rows of (x, y, lap distance), with the lap
+    distance rising by lap_length on the way back round to the first point"""
+    closed: npt.NDArray[np.float64] = np.vstack([points, points[:1] + (0.0, 0.0, lap_length)])
+    along: npt.NDArray[np.float64] = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(closed[:, :2], axis=0).T))))
+    spaced: npt.NDArray[np.float64] = np.arange(num_points) * along[-1] / num_points
+    return np.stack([np.interp(spaced, along, closed[:, column]) for column in range(3)], axis=1)
+
+
+def _second_difference(points: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    return np.roll(points, 1, axis=0) - 2 * points + np.roll(points, -1, axis=0)
+
+
+def build_racing_line(track: TrackCollision, progress: TrackProgress, distances: TrackDistanceField,
+                      off_road_allowance: float = constants.AI_OFF_ROAD_ALLOWANCE,
+                      wall_clearance: float = constants.AI_WALL_CLEARANCE) -> npt.NDArray[np.float64]:
+    """Returns the (x, y, lap distance) of points every progress.cell_size px along a smooth line round the lap from the
+    finish line, that straightens the corners out as far as the road (plus off_road_allowance px of off-road either
+    side) allows. The lap distance of each point is that of the part of the centerline it was slid sideways from.
+
+    Cars turn on a fixed circle whatever their speed, so the only way round a corner tighter than that circle is a wider
+    line. The line is the centerline slid sideways to minimise the sum of its squared second differences (a discrete
+    minimum curvature line), keeping each point within the corridor and evening the points out along the line again
+    between passes, so stretching the line round the outside of a corner isn't penalised as extra curvature. The
+    corridor is cut short at the ends of each sector gate (less room for the cars either side of the line), so the line
+    can't cut across the off-road round one"""
+    lap_length: float = progress.lap_length
+    centerline: npt.NDArray[np.float64] = np.column_stack(
+        [progress.centerline, (np.arange(progress.centerline.shape[0]) + 0.5) * progress.cell_size])
+    num_points: int = max(8, int(lap_length // RACING_LINE_SPACING))
+    line: npt.NDArray[np.float64] = _resample_loop(centerline, num_points, lap_length)
+    across: npt.NDArray[np.float64] = np.arange(-RACING_LINE_CORRIDOR_REACH,
+                                                RACING_LINE_CORRIDOR_REACH + RACING_LINE_CORRIDOR_STEP,
+                                                RACING_LINE_CORRIDOR_STEP)
+    middle: int = across.shape[0] // 2
+    steps: npt.NDArray[np.intp] = np.arange(across.shape[0])
+    gates: list[LapGate] = track.sector_gates
+    gate_distances: list[float] = [progress.get_lap_distance((gate.start[0] + gate.end[0]) / 2,
+                                                             (gate.start[1] + gate.end[1]) / 2) for gate in gates]
+    gate_margin: float = 2 * constants.AI_GRID_COLUMN_OFFSET
+
+    for _ in range(RACING_LINE_PASSES):
+        line = _resample_loop(line, num_points, lap_length)
+        tangent: npt.NDArray[np.float64] = np.roll(line[:, :2], -1, axis=0) - np.roll(line[:, :2], 1, axis=0)
+        tangent /= np.maximum(np.hypot(tangent[:, 0], tangent[:, 1]), 1e-9)[:, None]
+        normal: npt.NDArray[np.float64] = np.stack([-tangent[:, 1], tangent[:, 0]], axis=1)
+
+        # How far each point can slide either way before leaving the corridor
+        corridor_x = line[:, 0, None] + normal[:, 0, None] * across
+        corridor_y = line[:, 1, None] + normal[:, 1, None] * across
+        # Nor anywhere much further round the lap than the point started from, so the line can't cut across the
+        # off-road to another part of the track
+        lap_gap = progress.get_lap_distance_array(corridor_x, corridor_y) - line[:, 2, None]
+        lap_gap = np.abs((lap_gap + lap_length / 2) % lap_length - lap_length / 2)
+        is_open = ((distances.get_road_edge_distance_array(corridor_x, corridor_y) >= -off_road_allowance)
+                   & (distances.get_wall_distance_array(corridor_x, corridor_y) >= wall_clearance)
+                   & (lap_gap <= RACING_LINE_CORRIDOR_REACH))
+        for gate, gate_distance in zip(gates, gate_distances):
+            gate_gap = np.abs((line[:, 2] - gate_distance + lap_length / 2) % lap_length - lap_length / 2)
+            near = gate_gap <= RACING_LINE_CORRIDOR_REACH
+            ahead = ((corridor_x[near] - gate.start[0]) * gate.normal[0]
+                     + (corridor_y[near] - gate.start[1]) * gate.normal[1])
+            along = ((corridor_x[near] - gate.start[0]) * gate.tangent[0]
+                     + (corridor_y[near] - gate.start[1]) * gate.tangent[1])
+            is_open[near] &= ~((np.abs(ahead) < RACING_LINE_SPACING)
+                               & ((along < gate_margin) | (along > gate.length - gate_margin)))
+        low_step = np.maximum.accumulate(np.where(is_open, -1, steps), axis=1)[:, middle] + 1
+        high_step = np.minimum.accumulate(np.where(is_open, across.shape[0], steps)[:, ::-1],
+                                          axis=1)[:, -1 - middle] - 1
+        low: npt.NDArray[np.float64] = np.where(is_open[:, middle], across[np.minimum(low_step, middle)], 0.0)
+        high: npt.NDArray[np.float64] = np.where(is_open[:, middle], across[np.maximum(high_step, middle)], 0.0)
+
+        # Projected gradient descent on the sideways offsets (with Nesterov momentum); 16 bounds the largest eigenvalue
+        # of the fourth difference, so 1 / 16 is a safe step
+        offset: npt.NDArray[np.float64] = np.zeros(num_points)
+        momentum_offset: npt.NDArray[np.float64] = offset
+        momentum: float = 1.0
+        for _ in range(RACING_LINE_ITERATIONS):
+            moved: npt.NDArray[np.float64] = line[:, :2] + normal * momentum_offset[:, None]
+            gradient = np.sum(_second_difference(_second_difference(moved)) * normal, axis=1)
+            next_offset = np.minimum(np.maximum(momentum_offset - gradient / 16, low), high)
+            next_momentum: float = (1 + math.sqrt(1 + 4 * momentum * momentum)) / 2
+            momentum_offset = next_offset + (momentum - 1) / next_momentum * (next_offset - offset)
+            offset, momentum = next_offset, next_momentum
+        line[:, :2] += normal * offset[:, None]
+
+    # Evened out at the progress field's spacing
+    length: float = float(np.hypot(*np.diff(np.vstack([line[:, :2], line[:1, :2]]), axis=0).T).sum())
+    return _resample_loop(line, max(8, int(length // progress.cell_size)), lap_length)
+
+
+def build_all_progress_fields() -> None:
+    """Builds (or loads from the cache) every track's progress field and racing line, printing how long each took"""
+    print(f"{'track':<20} {'grid':>9} {'lap px':>7} {'seconds':>8}")
+    for track_name in constants.TRACK_NAMES:
+        track: TrackCollision = TrackCollision(track_name)
+        distances: TrackDistanceField = TrackDistanceField.load(track)
+        start: float = time.perf_counter()
+        progress: TrackProgress = TrackProgress.load(track, distances)
+        elapsed: float = time.perf_counter() - start
+        grid: str = f"{progress.lap_distance.shape[0]}x{progress.lap_distance.shape[1]}"
+        print(f"{track_name:<20} {grid:>9} {progress.lap_length:>7.0f} {elapsed:>8.3f}")
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv[1:]:
+        for name in constants.TRACK_NAMES:
+            Path(constants.TRACK_PROGRESS_CACHE_PATH.format(track_name=name)).unlink(missing_ok=True)
+    build_all_progress_fields()
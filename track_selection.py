@@ -17,41 +17,41 @@ class TrackSelection:
         self.num_unlocked: int = self.save_manager.num_unlocked
 
         # Background image
-        self.background_image: pygame.Surface = pygame.image.load(constants.GENERAL_IMAGE_PATH.format(name="background")).convert()
-        self.background_image = pygame.transform.scale(self.background_image,(constants.WIDTH, constants.HEIGHT))
+        self.background_image: pygame.Surface = self.game.assets.load_image(
+            constants.GENERAL_IMAGE_PATH.format(name="background"), False, constants.WIDTH, constants.HEIGHT)
 
         # Track button rects
         button_width: int = 380
         button_height: int = 213
         
         # First track
-        self.first_default_image: pygame.Surface = utilities.load_image(
+        self.first_default_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=1, type="default"), True, button_width, button_height)
-        self.first_hover_image: pygame.Surface = utilities.load_image(
+        self.first_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=1, type="hover"), True, button_width, button_height)
 
         # Second track
-        self.second_default_image: pygame.Surface = utilities.load_image(
+        self.second_default_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=2, type="default"), True, button_width, button_height)
-        self.second_hover_image: pygame.Surface = utilities.load_image(
+        self.second_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=2, type="hover"), True, button_width, button_height)
-        self.second_locked_image: pygame.Surface = utilities.load_image(
+        self.second_locked_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=2, type="locked"), True, button_width, button_height)
 
         # Third track
-        self.third_default_image: pygame.Surface = utilities.load_image(
+        self.third_default_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=3, type="default"), True, button_width, button_height)
-        self.third_hover_image: pygame.Surface = utilities.load_image(
+        self.third_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=3, type="hover"), True, button_width, button_height)
-        self.third_locked_image: pygame.Surface = utilities.load_image(
+        self.third_locked_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=3, type="locked"), True, button_width, button_height)
 
         # Fourth track
-        self.fourth_default_image: pygame.Surface = utilities.load_image(
+        self.fourth_default_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=4, type="default"), True, button_width, button_height)
-        self.fourth_hover_image: pygame.Surface = utilities.load_image(
+        self.fourth_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=4, type="hover"), True, button_width, button_height)
-        self.fourth_locked_image: pygame.Surface = utilities.load_image(
+        self.fourth_locked_image: pygame.Surface = self.game.assets.load_image(
             constants.TRACK_SELECTION_IMAGE_PATH.format(number=4, type="locked"), True, button_width, button_height)
 
         # Back Button
@@ -59,10 +59,10 @@ class TrackSelection:
         self.back_button_width: int = 100
         self.back_button_height: int = self.back_button_width
         self.back_button_y: int = constants.HEIGHT - self.back_button_height - self.back_button_x
-        self.back_default_image: pygame.Surface = utilities.load_image(
+        self.back_default_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_left_default"), True, self.back_button_width,
             self.back_button_height)
-        self.back_hover_image: pygame.Surface = utilities.load_image(
+        self.back_hover_image: pygame.Surface = self.game.assets.load_image(
             constants.GENERAL_IMAGE_PATH.format(name="arrow_left_hover"), True, self.back_button_width,
             self.back_button_height)
         self.back_button_rect: pygame.Rect = pygame.Rect(self.back_button_x, self.back_button_y, self.back_button_width,
@@ -104,7 +104,7 @@ class TrackSelection:
             }
         ]
 
-        self.hover_sound: pygame.mixer.Sound = pygame.mixer.Sound(constants.HOVER_SOUND_PATH)
+        self.hover_sound: pygame.mixer.Sound = self.game.assets.load_sound(constants.HOVER_SOUND_PATH)
         self.hover_sound.set_volume(self.save_manager.get_volumes()["sfx"])
 
         # Transitions
@@ -119,6 +119,10 @@ class TrackSelection:
         self.transition_next_duration_ms: int = 400
         self.transition_next_pause_time: int = 400
 
+        # The images on screen last frame, to redraw only the buttons that changed (None forces a full redraw)
+        self.drawn_images: tuple[pygame.Surface, ...] | None = None
+        self.image_rects: list[pygame.Rect] = [btn["rect"] for btn in self.buttons] + [self.back_button_rect]
+
     def handle_events(self, events, mouse_pos: tuple[int, int]) -> str:
         """Handles events like button presses"""
 
@@ -185,6 +189,18 @@ class TrackSelection:
 
         self.back_current_image = self.back_default_image if hovered_index != self.back_button_index else self.back_hover_image
 
+    def get_dirty_rects(self) -> list[pygame.Rect] | None:
+        """Returns the buttons whose image changed since the last frame, or None if the whole screen has to be
+        redrawn"""
+        drawn_images: tuple[pygame.Surface, ...] | None = None if self.transitioning else (
+            self.first_image, self.second_image, self.third_image, self.fourth_image, self.back_current_image)
+        previous_images: tuple[pygame.Surface, ...] | None = self.drawn_images
+        self.drawn_images = drawn_images
+        if drawn_images is None or previous_images is None:
+            return None
+        return [rect for rect, image, previous_image in zip(self.image_rects, drawn_images, previous_images)
+                if image is not previous_image]
+
     def draw(self) -> None:
         """Draws the track selection screen"""
         self.screen.blit(self.background_image, (0, 0))
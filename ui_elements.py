@@ -1,7 +1,94 @@
+from collections import OrderedDict
+from typing import Hashable, Sequence
+
 import pygame
 import constants
 
 
+class TextCache:
+    """Keeps the most recently rendered strings, so text that doesn't change isn't rendered again every frame"""
+
+    def __init__(self, max_entries: int = constants.TEXT_CACHE_SIZE) -> None:
+        self.max_entries: int = max_entries
+        self._surfaces: OrderedDict[Hashable, pygame.Surface] = OrderedDict()
+
+    def render(self, font: pygame.font.Font, text: str, antialias: bool,
+               color: Sequence[int]) -> pygame.Surface:
+        """Same as font.render(text, antialias, color), but shared, so callers must not draw onto the result"""
+        key: Hashable = (font, text, tuple(color), antialias)
+        surface: pygame.Surface | None = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+
+        surface = font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+
+class DirtyRegions:
+    """Remembers what each area of a menu screen showed last frame, so that only the areas that changed are redrawn"""
+
+    def __init__(self) -> None:
+        self._drawn: dict[Hashable, tuple[Hashable, pygame.Rect]] | None = None
+
+    def get_dirty_rects(self, regions: dict[Hashable, tuple[Hashable, pygame.Rect]] | None) -> list[pygame.Rect] | None:
+        """Takes the state each area is drawn from and the rect it covers this frame (or None while the whole screen
+        changes, e.g. during transitions). Returns the rects of the areas whose state changed, covering where they
+        were drawn last frame as well, or None if the whole screen has to be redrawn"""
+        drawn: dict[Hashable, tuple[Hashable, pygame.Rect]] | None = self._drawn
+        self._drawn = regions
+        if regions is None or drawn is None or regions.keys() != drawn.keys():
+            return None
+        dirty_rects: list[pygame.Rect] = []
+        for key, (state, rect) in regions.items():
+            drawn_state, drawn_rect = drawn[key]
+            if state != drawn_state:
+                # An empty rect (an area with nothing drawn) has no position to cover
+                dirty_rects.append(rect.union(drawn_rect) if rect and drawn_rect else rect or drawn_rect)
+        return dirty_rects
+
+
+def get_text_button_area(font: pygame.font.Font, text: str, rect: pygame.Rect) -> pygame.Rect:
+    """Returns the area covered by a button with its text centered on it, which can spill outside the button"""
+    text_rect: pygame.Rect = pygame.Rect((0, 0), font.size(text))
+    text_rect.center = rect.center
+    return rect.union(text_rect)
+
+
+class TimerText:
+    """Draws a time as MM:SS:cc (minutes, seconds, hundredths) at a fixed position from digits rendered up front,
+    so drawing it every frame renders and allocates no surfaces"""
+
+    def __init__(self, font: pygame.font.Font, color: Sequence[int], position: tuple[int, int]) -> None:
+        self.digits: list[pygame.Surface] = [font.render(str(digit), True, color) for digit in range(10)]
+        self.separator: pygame.Surface = font.render(":", True, color)
+
+        # Place each character where font.render would put it in the whole string (bold glyphs overhang their advance)
+        x, y = position
+        self._blit_sequence: list[list] = []
+        for character in "00:00:00":
+            self._blit_sequence.append([self.separator if character == ":" else self.digits[0], (x, y)])
+            x += font.size(character * 2)[0] - font.size(character)[0]
+
+    def draw(self, surface: pygame.Surface, time_ms: int) -> None:
+        """Draws the time (times past 99:59:99 are shown as 99:59:99)"""
+        time_ms = min(time_ms, 5999990)
+        minutes: int = time_ms // 60000
+        seconds: int = time_ms // 1000 % 60
+        hundredths: int = time_ms % 1000 // 10
+        blit_sequence: list[list] = self._blit_sequence
+        blit_sequence[0][0] = self.digits[minutes // 10]
+        blit_sequence[1][0] = self.digits[minutes % 10]
+        blit_sequence[3][0] = self.digits[seconds // 10]
+        blit_sequence[4][0] = self.digits[seconds % 10]
+        blit_sequence[6][0] = self.digits[hundredths // 10]
+        blit_sequence[7][0] = self.digits[hundredths % 10]
+        surface.blits(blit_sequence, doreturn=False)
+
+
 class Slider:
     """A simple horizontal slider."""
 
@@ -1,17 +1,12 @@
 import sys
 
+import numpy as np
+import numpy.typing as npt
 import pygame
 
 import constants
 
 
-def load_image(image_path: str, is_alpha: bool, width: int, height: int) -> pygame.Surface:
-    """Load in and scale images"""
-    image: pygame.Surface = pygame.image.load(image_path)
-    image.convert_alpha() if is_alpha else image.convert()
-    image = pygame.transform.scale(image, (width, height))
-    return image
-
 def quit_game() -> None:
     """Quits the game"""
     pygame.quit()
@@ -75,4 +70,20 @@ def draw_fade_to_black_transition(screen: pygame.Surface, transition_start_time_
             overlay_opacity = max_opacity - int(percent_progress * max_opacity)
     dark_overlay.fill((0, 0, 0, overlay_opacity))
     screen.blit(dark_overlay, (0, 0))
-    return is_done
\ No newline at end of file
+    return is_done
+
+def get_difference_rect(surfaces: list[pygame.Surface]) -> pygame.Rect:
+    """Returns the smallest rect covering every pixel that differs between 32-bit surfaces of the same size"""
+    # The pixels are compared in place, which locks each surface until its view is deleted
+    first: npt.NDArray[np.uint32] = pygame.surfarray.pixels2d(surfaces[0])
+    differs: npt.NDArray[np.bool_] = np.zeros(first.shape, dtype=bool)
+    for surface in surfaces[1:]:
+        pixels: npt.NDArray[np.uint32] = pygame.surfarray.pixels2d(surface)
+        differs |= pixels != first
+        del pixels
+    del first
+    xs: npt.NDArray[np.intp] = np.flatnonzero(differs.any(axis=1))
+    ys: npt.NDArray[np.intp] = np.flatnonzero(differs.any(axis=0))
+    if xs.size == 0:
+        return pygame.Rect(0, 0, 0, 0)
+    return pygame.Rect(int(xs[0]), int(ys[0]), int(xs[-1] - xs[0]) + 1, int(ys[-1] - ys[0]) + 1)
@@ -0,0 +1,96 @@
+import queue
+import threading
+from typing import Optional
+
+import pygame
+
+import constants
+
+
+class VideoDecoder:
+    """Decodes a moviepy clip on a background thread into a small ring of preallocated frame surfaces, so a frame that
+    is slow to decode doesn't hold up drawing
+
+    The surfaces are in the display's format, so frames scale straight into the window without being converted. The
+    clip must not be used elsewhere until stop() has returned."""
+
+    def __init__(self, clip, num_buffers: int = constants.INTRO_FRAME_BUFFERS) -> None:
+        self.clip = clip
+        self.fps: float = clip.fps
+        self.dropped_frames: int = 0
+        self._surfaces: list[pygame.Surface] = [pygame.Surface(clip.size, 0, pygame.display.get_surface())
+                                                for _ in range(num_buffers)]
+
+        # Surfaces cycle from free, to decoded (with their frame's time in seconds), to shown, and back to free
+        self._free: queue.Queue[int] = queue.Queue()
+        for index in range(num_buffers):
+            self._free.put(index)
+        self._decoded: queue.Queue[tuple[int, float]] = queue.Queue()
+        self._next: Optional[tuple[int, float]] = None  # Taken off the decoded queue but not due yet
+        self._shown_index: Optional[int] = None
+        self._stopping: threading.Event = threading.Event()
+        self._done: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(target=self._decode, name="video-decoder", daemon=True)
+
+    def start(self) -> None:
+        """Starts decoding in the background"""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops decoding and waits for the background thread to finish with the clip"""
+        self._stopping.set()
+        self._thread.join()
+
+    def _decode(self) -> None:
+        """Decodes frames into free surfaces until the clip ends or stop() is called (runs on the background thread)"""
+        try:
+            for time_s, frame in self.clip.iter_frames(fps=self.fps, with_times=True, dtype="uint8"):
+                index: Optional[int] = None
+                while index is None:
+                    if self._stopping.is_set():
+                        return
+                    try:
+                        index = self._free.get(timeout=0.05)
+                    except queue.Empty:
+                        pass
+                # Wrapping the decoded array doesn't copy it, and blitting converts it to the display's format
+                self._surfaces[index].blit(pygame.image.frombuffer(frame, self.clip.size, "RGB"), (0, 0))
+                self._decoded.put((index, time_s))
+        finally:
+            self._done.set()
+
+    def is_finished(self) -> bool:
+        """Checks if every frame of the clip has been decoded and handed out"""
+        return self._done.is_set() and self._next is None and self._decoded.empty()
+
+    def get_next_frame_time(self) -> Optional[float]:
+        """Returns the time in seconds of the next decoded frame, or None if the decoder hasn't got one ready"""
+        if self._next is None:
+            try:
+                self._next = self._decoded.get_nowait()
+            except queue.Empty:
+                return None
+        return self._next[1]
+
+    def get_frame(self, time_s: float) -> Optional[pygame.Surface]:
+        """Returns the latest frame due by time_s, dropping any earlier frames that were too late to be shown, or None
+        if no new frame is due yet
+
+        The surface stays valid until get_frame next returns a frame."""
+        index: Optional[int] = None
+        while True:
+            next_frame_time_s: Optional[float] = self.get_next_frame_time()
+            if next_frame_time_s is None or next_frame_time_s > time_s:
+                break
+            if index is not None:
+                self._free.put(index)
+                self.dropped_frames += 1
+            index = self._next[0]
+            self._next = None
+        if index is None:
+            return None
+
+        if self._shown_index is not None:
+            self._free.put(self._shown_index)
+        self._shown_index = index
+        return self._surfaces[index]